@@ -3,39 +3,40 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict, Any, List
+from typing import Any, Callable, Dict
 
 
 class BlockchainSync:
-    """Very small blockchain synchroniser used in examples."""
+    """Very small blockchain synchroniser used in examples.
 
-    def __init__(self, node):
+    When ``latest_block`` is given the synchroniser also answers
+    ``block_request`` messages from other nodes with its return value.
+    """
+
+    def __init__(self, node, latest_block: Callable[[], Dict[str, Any]] | None = None):
         self.node = node
+        self.latest_block = latest_block
+        if latest_block is not None:
+            node.register_request_handler("block_request", self._handle_block_request, "block_response")
 
-    async def request_latest_block(self, peer_id: str) -> Dict[str, Any] | None:
+    async def request_latest_block(self, peer_id: str, timeout: float = 5.0) -> Dict[str, Any] | None:
         """Ask ``peer_id`` for its latest block.
 
-        The function sends a ``block_request`` message and waits for a
-        ``block_response`` reply.  It returns the block dictionary or ``None`` if
-        no response arrives within a short timeout.
+        The function sends a ``block_request`` and waits for the matching
+        ``block_response``.  Concurrent requests are independent of each other.
+        It returns the block dictionary or ``None`` if no response arrives
+        within ``timeout`` or the peer disconnects.
         """
 
-        fut: asyncio.Future | None = None
-
-        async def handler(message):
-            nonlocal fut
-            if fut is not None and not fut.done():
-                fut.set_result(message.payload)
-
-        self.node.register_message_handler("block_response", handler)
-        await self.node.send_message(peer_id, "block_request", {})
-        fut = asyncio.get_event_loop().create_future()
         try:
-            return await asyncio.wait_for(fut, timeout=5)
-        except asyncio.TimeoutError:
+            return await self.node.request(peer_id, "block_request", {}, timeout=timeout)
+        except (asyncio.TimeoutError, ConnectionError):
             return None
 
     async def broadcast_block(self, block: Dict[str, Any]) -> None:
         """Broadcast ``block`` to all connected peers."""
 
         await self.node.broadcast_message("block_announce", block)
+
+    async def _handle_block_request(self, message) -> Dict[str, Any]:
+        return self.latest_block()
@@ -1,30 +1,476 @@
-"""Very small round-robin load balancer implementation."""
+"""Load balancing strategies for choosing the node that runs a task."""
 
 from __future__ import annotations
 
-from typing import List
+import bisect
+import hashlib
+import heapq
+import itertools
+import math
+import random
+import time
+from typing import Callable, Dict, List
 
 
-class RoundRobinBalancer:
-    """Cycle through a list of node identifiers."""
+class Balancer:
+    """Common interface of all strategies.
 
-    def __init__(self, nodes: List[str] | None = None):
-        self.nodes = nodes or []
-        self._index = 0
+    ``choose`` picks a node; ``key`` identifies what the task is about and
+    only matters to affinity strategies such as
+    :class:`ConsistentHashBalancer`.  Callers that want load-aware
+    strategies to see the load report each task with ``on_dispatch`` and
+    ``on_complete``.
+    ``weight`` is a node's relative capacity, e.g. 8 for a GPU box and 1
+    for a laptop; strategies that do not use weights ignore it.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.weights: Dict[str, float] = {}
+        self.outstanding: Dict[str, int] = {}
+        # Members in a list plus their positions, for O(1) removal and random picks.
+        self._members: List[str] = []
+        self._positions: Dict[str, int] = {}
+        for node_id in nodes or []:
+            self.add_node(node_id)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._members)
 
-    def add_node(self, node_id: str) -> None:
-        self.nodes.append(node_id)
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._positions
+
+    def add_node(self, node_id: str, weight: float = 1.0) -> None:
+        if weight <= 0:
+            raise ValueError("weight must be positive")
+        self.weights[node_id] = weight
+        if node_id not in self._positions:
+            self._positions[node_id] = len(self._members)
+            self._members.append(node_id)
+            self.outstanding.setdefault(node_id, 0)
 
     def remove_node(self, node_id: str) -> None:
-        if node_id in self.nodes:
-            self.nodes.remove(node_id)
-            self._index %= max(len(self.nodes), 1)
+        position = self._positions.pop(node_id, None)
+        if position is None:
+            return
+        last = self._members.pop()
+        if last != node_id:
+            self._members[position] = last
+            self._positions[last] = position
+        self.weights.pop(node_id, None)
+        self.outstanding.pop(node_id, None)
+
+    def choose(self, key: str | None = None) -> str | None:
+        """Return the node identifier to use next."""
+        raise NotImplementedError
 
-    def choose(self) -> str | None:
-        """Return the next node identifier to use."""
+    def on_dispatch(self, node_id: str) -> None:
+        if node_id in self.outstanding:
+            self.outstanding[node_id] += 1
+
+    def on_complete(self, node_id: str, latency: float | None = None) -> None:
+        if self.outstanding.get(node_id, 0) > 0:
+            self.outstanding[node_id] -= 1
+
+
+class RoundRobinBalancer(Balancer):
+    """Cycle through the nodes; add and remove are O(1)."""
+
+    def __init__(self, nodes: List[str] | None = None, clock: Callable[[], float] = time.monotonic):
+        self._index = 0
+        super().__init__(nodes, clock)
 
-        if not self.nodes:
+    def remove_node(self, node_id: str) -> None:
+        # The last member moves into the freed slot.
+        super().remove_node(node_id)
+        self._index %= max(len(self._members), 1)
+
+    def choose(self, key: str | None = None) -> str | None:
+        if not self._members:
             return None
-        node = self.nodes[self._index]
-        self._index = (self._index + 1) % len(self.nodes)
+        node = self._members[self._index]
+        self._index = (self._index + 1) % len(self._members)
         return node
+
+
+class WeightedRoundRobinBalancer(Balancer):
+    """Weighted round robin that interleaves picks (stride scheduling).
+
+    Each node advances a virtual time by ``1 / weight`` when picked and the
+    node with the smallest virtual time goes next, so a weight 3 node gets
+    three picks out of every four against a weight 1 node, spread out the
+    way nginx's smooth WRR spreads them, at O(log n) per pick from a heap.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, clock: Callable[[], float] = time.monotonic):
+        self._heap: List[tuple] = []
+        self._pass: Dict[str, float] = {}
+        self._now = 0.0
+        self._seq = itertools.count()
+        super().__init__(nodes, clock)
+
+    def add_node(self, node_id: str, weight: float = 1.0) -> None:
+        super().add_node(node_id, weight)
+        # Joining at the current virtual time avoids a burst to new nodes.
+        self._pass[node_id] = self._now
+        heapq.heappush(self._heap, (self._now, next(self._seq), node_id))
+
+    def remove_node(self, node_id: str) -> None:
+        super().remove_node(node_id)
+        self._pass.pop(node_id, None)  # its heap entry is skipped lazily
+
+    def choose(self, key: str | None = None) -> str | None:
+        while self._heap:
+            virtual, _seq, node = heapq.heappop(self._heap)
+            if self._pass.get(node) != virtual:
+                continue  # removed, re-added or reweighted
+            self._now = virtual
+            self._pass[node] = virtual + 1.0 / self.weights[node]
+            heapq.heappush(self._heap, (self._pass[node], next(self._seq), node))
+            return node
+        return None
+
+
+class LeastOutstandingBalancer(Balancer):
+    """Send to the node with the fewest in-flight tasks per unit of weight.
+
+    A heap keyed by ``outstanding / weight`` gives O(log n) picks; entries
+    made stale by later updates are discarded when they surface.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, clock: Callable[[], float] = time.monotonic):
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        super().__init__(nodes, clock)
+
+    def _push(self, node_id: str) -> None:
+        heapq.heappush(self._heap, (self.outstanding[node_id] / self.weights[node_id], next(self._seq), node_id))
+        if len(self._heap) > 4 * len(self._members) + 64:
+            self._heap = [(self.outstanding[n] / self.weights[n], next(self._seq), n) for n in self._members]
+            heapq.heapify(self._heap)
+
+    def add_node(self, node_id: str, weight: float = 1.0) -> None:
+        super().add_node(node_id, weight)
+        self._push(node_id)
+
+    def choose(self, key: str | None = None) -> str | None:
+        while self._heap:
+            score, _seq, node = self._heap[0]
+            if node in self._positions and score == self.outstanding[node] / self.weights[node]:
+                return node
+            heapq.heappop(self._heap)
+        return None
+
+    def on_dispatch(self, node_id: str) -> None:
+        super().on_dispatch(node_id)
+        if node_id in self._positions:
+            self._push(node_id)
+
+    def on_complete(self, node_id: str, latency: float | None = None) -> None:
+        super().on_complete(node_id, latency)
+        if node_id in self._positions:
+            self._push(node_id)
+
+
+class _WeightedSampler:
+    """Fenwick tree over member weights: O(log n) update and weighted draw."""
+
+    def __init__(self):
+        self.values: List[float] = []
+        self.total = 0.0
+        self._tree = [0.0, 0.0]
+
+    def _add(self, index: int, delta: float) -> None:
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def set(self, index: int, value: float) -> None:
+        if index == len(self.values):
+            self.values.append(0.0)
+            if len(self.values) >= len(self._tree):
+                self._rebuild()
+        self._add(index, value - self.values[index])
+        self.total += value - self.values[index]
+        self.values[index] = value
+
+    def pop(self) -> None:
+        self.set(len(self.values) - 1, 0.0)
+        self.values.pop()
+
+    def _rebuild(self) -> None:
+        self._tree = [0.0] * (2 * len(self._tree))
+        for index, value in enumerate(self.values):
+            self._add(index, value)
+
+    def draw(self, rng: random.Random) -> int:
+        target = rng.random() * self.total
+        index, step = 0, 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                index = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return min(index, len(self.values) - 1)
+
+
+class PowerOfTwoBalancer(Balancer):
+    """Pick two nodes at random and use the less loaded one.
+
+    Candidates are drawn in proportion to weight (O(log n)), so a laptop is
+    not offered half the time in a mesh of GPU boxes.  Load is in-flight
+    tasks per unit of weight unless a ``load`` function reporting live load
+    (for instance from the service registry) is given.  Sampling two nodes
+    avoids the herding of always picking the global minimum from stale
+    information.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, load: Callable[[str], float] | None = None,
+                 rng: random.Random | None = None, clock: Callable[[], float] = time.monotonic):
+        self.load = load
+        self.rng = rng or random.Random()
+        self._sampler = _WeightedSampler()
+        super().__init__(nodes, clock)
+
+    def add_node(self, node_id: str, weight: float = 1.0) -> None:
+        super().add_node(node_id, weight)
+        self._sampler.set(self._positions[node_id], weight)
+
+    def remove_node(self, node_id: str) -> None:
+        position = self._positions.get(node_id)
+        if position is None:
+            return
+        super().remove_node(node_id)
+        if position < len(self._members):
+            self._sampler.set(position, self.weights[self._members[position]])
+        self._sampler.pop()
+
+    def cost(self, node_id: str) -> float:
+        if self.load is not None:
+            return self.load(node_id)
+        return self.outstanding[node_id] / self.weights[node_id]
+
+    def choose(self, key: str | None = None) -> str | None:
+        if len(self._members) < 2:
+            return self._members[0] if self._members else None
+        position = self._sampler.draw(self.rng)
+        first = second = self._members[position]
+        for _ in range(4):
+            second = self._members[self._sampler.draw(self.rng)]
+            if second != first:
+                break
+        else:
+            # One node holds most of the weight; compare it with any other.
+            count = len(self._members)
+            second = self._members[(position + 1 + self.rng.randrange(count - 1)) % count]
+        return first if self.cost(first) <= self.cost(second) else second
+
+
+class PeakEwmaBalancer(PowerOfTwoBalancer):
+    """Power of two choices over peak-sensitive EWMA latency.
+
+    A node's latency estimate jumps straight to any slower sample and decays
+    towards faster ones with time constant ``decay`` seconds; its cost is
+    that estimate times ``outstanding + 1`` over its weight, so slow or busy
+    nodes are avoided as soon as they show it.  Nodes without samples start
+    at ``default_latency``.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, decay: float = 10.0, default_latency: float = 0.1,
+                 rng: random.Random | None = None, clock: Callable[[], float] = time.monotonic):
+        self.decay = decay
+        self.default_latency = default_latency
+        self._ewma: Dict[str, float] = {}
+        self._stamp: Dict[str, float] = {}
+        super().__init__(nodes, rng=rng, clock=clock)
+
+    def remove_node(self, node_id: str) -> None:
+        super().remove_node(node_id)
+        self._ewma.pop(node_id, None)
+        self._stamp.pop(node_id, None)
+
+    def latency(self, node_id: str) -> float:
+        return self._ewma.get(node_id, self.default_latency)
+
+    def cost(self, node_id: str) -> float:
+        return self.latency(node_id) * (self.outstanding[node_id] + 1) / self.weights[node_id]
+
+    def on_complete(self, node_id: str, latency: float | None = None) -> None:
+        super().on_complete(node_id, latency)
+        if latency is None or node_id not in self._positions:
+            return
+        now = self.clock()
+        previous = self._ewma.get(node_id)
+        if previous is None or latency > previous:
+            self._ewma[node_id] = latency
+        else:
+            w = math.exp(-(now - self._stamp[node_id]) / self.decay)
+            self._ewma[node_id] = previous * w + latency * (1 - w)
+        self._stamp[node_id] = now
+
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class ConsistentHashBalancer(Balancer):
+    """Route equal keys to the same node on a hash ring.
+
+    Each node owns ``vnodes * weight`` points on a sorted ring, and a key
+    goes to the owner of the first point at or after its hash (O(log n)
+    by bisection), so adding or removing one of N nodes moves only about
+    1/N of the keys.  With ``load_factor`` set, a node may hold at most
+    ``ceil(load_factor * (in_flight + 1) * weight / total_weight)`` tasks
+    (consistent hashing with bounded loads); a hot key then spills over
+    to the next nodes on the ring instead of overloading its owner.
+    Tasks without a key are spread randomly.
+    """
+
+    def __init__(self, nodes: List[str] | None = None, vnodes: int = 100, load_factor: float | None = 1.25,
+                 rng: random.Random | None = None, clock: Callable[[], float] = time.monotonic):
+        if load_factor is not None and load_factor < 1:
+            raise ValueError("load_factor must be at least 1")
+        self.vnodes = vnodes
+        self.load_factor = load_factor
+        self.rng = rng or random.Random()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._in_flight = 0
+        self._total_weight = 0.0
+        super().__init__(nodes, clock)
+
+    def add_node(self, node_id: str, weight: float = 1.0) -> None:
+        if node_id in self._positions:
+            self.remove_node(node_id)
+        super().add_node(node_id, weight)
+        self._total_weight += weight
+        for replica in range(max(1, round(self.vnodes * weight))):
+            point = _ring_hash(f"{node_id}#{replica}")
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node_id)
+
+    def remove_node(self, node_id: str) -> None:
+        if node_id not in self._positions:
+            return
+        self._in_flight -= self.outstanding.get(node_id, 0)
+        self._total_weight -= self.weights[node_id]
+        super().remove_node(node_id)
+        keep = [i for i, owner in enumerate(self._owners) if owner != node_id]
+        self._points = [self._points[i] for i in keep]
+        self._owners = [self._owners[i] for i in keep]
+
+    def lookup(self, key: str) -> str | None:
+        """Return the owner of ``key`` on the ring, ignoring load."""
+        if not self._points:
+            return None
+        index = bisect.bisect_left(self._points, _ring_hash(key)) % len(self._points)
+        return self._owners[index]
+
+    def _capacity(self, node_id: str) -> float:
+        share = self.weights[node_id] / self._total_weight
+        return math.ceil(self.load_factor * (self._in_flight + 1) * share)
+
+    def choose(self, key: str | None = None) -> str | None:
+        if not self._points:
+            return None
+        if key is None:
+            key = str(self.rng.random())
+        start = bisect.bisect_left(self._points, _ring_hash(key))
+        if self.load_factor is None:
+            return self._owners[start % len(self._points)]
+        seen = set()
+        for offset in range(len(self._points)):
+            node = self._owners[(start + offset) % len(self._points)]
+            if node in seen:
+                continue
+            if self.outstanding[node] < self._capacity(node):
+                return node
+            seen.add(node)
+            if len(seen) == len(self._members):
+                break
+        return self._owners[start % len(self._points)]
+
+    def on_dispatch(self, node_id: str) -> None:
+        if node_id in self.outstanding:
+            self._in_flight += 1
+        super().on_dispatch(node_id)
+
+    def on_complete(self, node_id: str, latency: float | None = None) -> None:
+        if self.outstanding.get(node_id, 0) > 0:
+            self._in_flight -= 1
+        super().on_complete(node_id, latency)
+
+
+STRATEGIES: Dict[str, type] = {
+    "round_robin": RoundRobinBalancer,
+    "weighted_round_robin": WeightedRoundRobinBalancer,
+    "least_outstanding": LeastOutstandingBalancer,
+    "power_of_two": PowerOfTwoBalancer,
+    "peak_ewma": PeakEwmaBalancer,
+    "consistent_hash": ConsistentHashBalancer,
+}
+
+
+def create_balancer(strategy: str, nodes: Dict[str, float] | None = None, **options) -> Balancer:
+    """Build a balancer by strategy name over ``nodes`` (node id -> weight)."""
+    try:
+        cls = STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"unknown balancing strategy {strategy!r}") from None
+    balancer = cls(**options)
+    for node_id, weight in (nodes or {}).items():
+        balancer.add_node(node_id, weight)
+    return balancer
+
+
+def simulate_balancer(strategy: str, speeds: Dict[str, float], tasks: int = 20000, utilization: float = 0.7,
+                      seed: int = 1, **options) -> Dict[str, float]:
+    """Replay a heterogeneous task stream against ``strategy`` and report latency.
+
+    Every node is a FIFO server running tasks at its ``speed`` (also its
+    weight).  Tasks arrive as a Poisson stream at ``utilization`` of the
+    total capacity and their sizes are heavy-tailed (90% small, 10% ten
+    times larger).  Latency is queueing plus service time.
+    """
+    rng = random.Random(seed)
+    now = [0.0]
+    balancer = create_balancer(strategy, speeds, clock=lambda: now[0], **options)
+    mean_size = 0.9 * 1.0 + 0.1 * 10.0
+    rate = utilization * sum(speeds.values()) / mean_size
+    free_at = {node: 0.0 for node in speeds}
+    completions: List[tuple] = []
+    latencies = []
+    arrival = 0.0
+    for _ in range(tasks):
+        arrival += rng.expovariate(rate)
+        while completions and completions[0][0] <= arrival:
+            done, node, latency = heapq.heappop(completions)
+            now[0] = done
+            balancer.on_complete(node, latency)
+        now[0] = arrival
+        node = balancer.choose()
+        balancer.on_dispatch(node)
+        size = 10.0 if rng.random() < 0.1 else 1.0
+        finish = max(arrival, free_at[node]) + size / speeds[node]
+        free_at[node] = finish
+        heapq.heappush(completions, (finish, node, finish - arrival))
+        latencies.append(finish - arrival)
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": latencies[-1],
+    }
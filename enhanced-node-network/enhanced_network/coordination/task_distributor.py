@@ -2,29 +2,232 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Sequence, Union
 
-from .load_balancer import RoundRobinBalancer
+from .load_balancer import Balancer, RoundRobinBalancer
+
+logger = logging.getLogger("enhanced_network.task_distributor")
+
+BatchSender = Callable[[str, List[Dict[str, Any]]], Awaitable[Sequence[Any]]]
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one task sent by :meth:`TaskDistributor.distribute_many`."""
+
+    task: Dict[str, Any]
+    node_id: str | None
+    result: Any = None
+    error: BaseException | None = None
+    attempts: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class DistributionStats:
+    """Counters of the last :meth:`TaskDistributor.distribute_many` run.
+
+    ``tasks`` counts every task taken from the source and ``completed``
+    those a node returned a result for.
+    """
+
+    tasks: int = 0
+    completed: int = 0
+    batches: int = 0
+    retries: int = 0
+    failures: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Tasks completed per second."""
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+
+def task_key(task: Dict[str, Any]) -> str | None:
+    """Default routing key: an explicit ``key``, else the model, type and input class."""
+    if task.get("key") is not None:
+        return str(task["key"])
+    parts = [task.get(field) for field in ("model", "type", "input_class")]
+    return ":".join(str(part) for part in parts if part is not None) or None
 
 
 class TaskDistributor:
-    """Very small wrapper that assigns tasks using a balancer."""
+    """Very small wrapper that assigns tasks using a balancer.
 
-    def __init__(self, balancer: RoundRobinBalancer | None = None):
-        self.balancer = balancer or RoundRobinBalancer()
+    ``key`` derives a routing key from each task; affinity balancers such
+    as ``ConsistentHashBalancer`` send tasks with equal keys to the same
+    node so it keeps the model warm.
+    """
 
-    def register_node(self, node_id: str) -> None:
-        self.balancer.add_node(node_id)
+    def __init__(self, balancer: Balancer | None = None,
+                 key: Callable[[Dict[str, Any]], str | None] = task_key):
+        self.balancer = balancer if balancer is not None else RoundRobinBalancer()
+        self.key = key
+        self.stats = DistributionStats()
+
+    def register_node(self, node_id: str, weight: float = 1.0) -> None:
+        self.balancer.add_node(node_id, weight)
 
     def unregister_node(self, node_id: str) -> None:
         self.balancer.remove_node(node_id)
 
-    def next_node(self) -> str | None:
-        return self.balancer.choose()
+    def next_node(self, key: str | None = None) -> str | None:
+        return self.balancer.choose(key)
 
     async def distribute(self, task: Dict[str, Any], send_func) -> None:
-        """Distribute ``task`` using ``send_func`` which sends to a node id."""
+        """Distribute ``task`` using ``send_func`` which sends to a node id.
+
+        The balancer is told when the send starts and how long it took, so
+        load-aware strategies see each node's in-flight work and latency.
+        """
 
-        node_id = self.next_node()
+        node_id = self.next_node(self.key(task))
         if node_id:
-            await send_func(node_id, task)
+            self.balancer.on_dispatch(node_id)
+            started = time.perf_counter()
+            try:
+                await send_func(node_id, task)
+            finally:
+                self.balancer.on_complete(node_id, time.perf_counter() - started)
+
+    async def distribute_many(self, tasks: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                              send_batch: BatchSender, batch_size: int = 64, max_in_flight: int = 8,
+                              max_attempts: int = 3, linger: float = 0.05) -> AsyncIterator[TaskResult]:
+        """Send many tasks in per-node batches and yield a result for each as batches finish.
+
+        Tasks are routed one by one through the balancer and collected per
+        target node; a batch is sent by ``send_batch(node_id, tasks)``, which
+        returns one result per task, once it holds ``batch_size`` tasks, or
+        after ``linger`` seconds for slow async sources.  At most
+        ``max_in_flight`` batches are outstanding; reading the source
+        pauses until one finishes.  A batch whose send raises is retried on
+        another node, up to ``max_attempts`` sends in all, after which its
+        tasks are yielded with the error.  Counters of the run are kept in
+        :attr:`stats`.
+        """
+        stats = self.stats = DistributionStats()
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max_in_flight)
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        opened: Dict[str, float] = {}
+        sends: set = set()
+
+        async def send(node_id: str, batch: List[Dict[str, Any]]) -> None:
+            tried = []
+            try:
+                for attempt in range(1, max_attempts + 1):
+                    tried.append(node_id)
+                    for _ in batch:
+                        self.balancer.on_dispatch(node_id)
+                    started = time.perf_counter()
+                    error = None
+                    try:
+                        replies = await send_batch(node_id, batch)
+                        if len(replies) != len(batch):
+                            raise ValueError(f"{node_id} returned {len(replies)} results for {len(batch)} tasks")
+                    except Exception as exc:  # the node failed; try another one
+                        error = exc
+                    latency = time.perf_counter() - started
+                    for _ in batch:
+                        self.balancer.on_complete(node_id, latency)
+                    if error is None:
+                        stats.completed += len(batch)
+                        for task, reply in zip(batch, replies):
+                            results.put_nowait(TaskResult(task, node_id, reply, attempts=attempt))
+                        return
+                    logger.debug("Batch of %d to %s failed: %r", len(batch), node_id, error)
+                    if attempt < max_attempts:
+                        stats.retries += 1
+                        node_id = self._alternative(self.key(batch[0]), tried) or node_id
+                stats.failures += len(batch)
+                for task in batch:
+                    results.put_nowait(TaskResult(task, node_id, error=error, attempts=max_attempts))
+            finally:
+                slots.release()
+
+        async def flush(node_id: str) -> None:
+            batch = pending.pop(node_id)
+            opened.pop(node_id, None)
+            await slots.acquire()
+            stats.batches += 1
+            task = asyncio.ensure_future(send(node_id, batch))
+            sends.add(task)
+            task.add_done_callback(sends.discard)
+
+        async def flush_stale() -> None:
+            while True:
+                await asyncio.sleep(linger)
+                cutoff = time.perf_counter() - linger
+                for node_id in [n for n, t in opened.items() if t <= cutoff]:
+                    if node_id in pending:  # not flushed meanwhile
+                        await flush(node_id)
+
+        async def produce() -> None:
+            try:
+                await route()
+                for node_id in list(pending):
+                    await flush(node_id)
+                await asyncio.gather(*list(sends))
+            finally:
+                results.put_nowait(None)
+
+        async def route() -> None:
+            flusher = asyncio.ensure_future(flush_stale()) if linger > 0 else None
+            try:
+                async for task in _aiter(tasks):
+                    stats.tasks += 1
+                    node_id = self.next_node(self.key(task))
+                    if node_id is None:
+                        stats.failures += 1
+                        results.put_nowait(TaskResult(task, None, error=LookupError("no nodes available"),
+                                                      attempts=0))
+                        continue
+                    batch = pending.setdefault(node_id, [])
+                    opened.setdefault(node_id, time.perf_counter())
+                    batch.append(task)
+                    if len(batch) >= batch_size:
+                        await flush(node_id)
+            finally:
+                if flusher is not None:
+                    flusher.cancel()
+                    await asyncio.gather(flusher, return_exceptions=True)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while True:
+                item = await results.get()
+                if item is None:
+                    break
+                yield item
+            await producer  # surface errors raised by the task source
+        finally:
+            stats.elapsed = time.perf_counter() - stats.started
+            for task in [producer, *sends]:
+                task.cancel()
+
+    def _alternative(self, key: str | None, tried: List[str]) -> str | None:
+        """Pick a node for a retry, avoiding ones that already failed if possible."""
+        for _ in range(max(1, len(self.balancer))):
+            node_id = self.balancer.choose(key)
+            if node_id not in tried:
+                return node_id
+        others = [n for n in self.balancer.nodes if n not in tried]
+        return others[0] if others else None
+
+
+async def _aiter(tasks):
+    if hasattr(tasks, "__aiter__"):
+        async for task in tasks:
+            yield task
+    else:
+        for task in tasks:
+            yield task
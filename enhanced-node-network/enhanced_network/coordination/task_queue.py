@@ -0,0 +1,165 @@
+"""Admission control and priority ordering for locally executed tasks."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from ..utils.metrics import Metrics
+
+logger = logging.getLogger("enhanced_network.task_queue")
+
+Job = Callable[[], Awaitable[Any]]
+DropCallback = Callable[[str], Any]
+
+
+@dataclass
+class QueuedTask:
+    """A job waiting in :class:`PriorityTaskQueue`."""
+
+    job: Job
+    priority: float
+    deadline: float
+    enqueued: float
+    on_drop: Optional[DropCallback] = None
+
+
+class PriorityTaskQueue:
+    """Run at most ``concurrency`` jobs at once, most urgent first.
+
+    Jobs run in order of ``priority`` (higher first) and, among equal
+    priorities, earliest ``deadline`` first; ties keep submission order.
+    A job still queued when its deadline passes is dropped with reason
+    ``"expired"`` instead of being started late.
+
+    At most ``max_queued`` jobs wait.  When the queue is full, waiting jobs
+    past their deadline are dropped first; if that frees nothing a new job is
+    refused unless it outranks the least urgent waiting job, which is then
+    dropped with reason ``"shed"``.  Dropped jobs get ``on_drop(reason)``.
+
+    Time spent queued and running is recorded in the ``task_queue.wait``
+    and ``task_queue.run`` histograms of ``metrics``.
+    """
+
+    def __init__(self, concurrency: int = 4, max_queued: int = 64, metrics: Optional[Metrics] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.metrics = metrics or Metrics()
+        self.clock = clock
+        self.running = 0
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._tasks: set = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def submit(self, job: Job, priority: float = 5, deadline: Optional[float] = None,
+               on_drop: Optional[DropCallback] = None) -> bool:
+        """Queue ``job``; returns ``False`` if it was shed right away.
+
+        ``deadline`` is a time on the queue's ``clock`` by which the job
+        must have started.
+        """
+        now = self.clock()
+        entry = QueuedTask(job, priority, math.inf if deadline is None else deadline, now, on_drop)
+        if len(self._heap) >= self.max_queued and not self._make_room(entry, now):
+            self.metrics.inc("task_queue.shed")
+            return False
+        heapq.heappush(self._heap, (self._rank(entry), next(self._seq), entry))
+        self._idle.clear()
+        self._pump()
+        return True
+
+    async def join(self) -> None:
+        """Wait until nothing is queued or running."""
+        await self._idle.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        histograms = self.metrics.histograms
+        return {
+            "queued": len(self._heap),
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "shed": self.metrics.counters.get("task_queue.shed", 0),
+            "expired": self.metrics.counters.get("task_queue.expired", 0),
+            "wait": histograms["task_queue.wait"].summary() if "task_queue.wait" in histograms else None,
+            "run": histograms["task_queue.run"].summary() if "task_queue.run" in histograms else None,
+        }
+
+    @staticmethod
+    def _rank(entry: QueuedTask) -> tuple:
+        return (-entry.priority, entry.deadline)
+
+    def _make_room(self, entry: QueuedTask, now: float) -> bool:
+        # Expired jobs would only be dropped when popped; free their slots now.
+        # The heap is bounded, so these scans are cheap.
+        live = [item for item in self._heap if item[2].deadline >= now]
+        if len(live) < len(self._heap):
+            expired = [item for item in self._heap if item[2].deadline < now]
+            self._heap = live
+            heapq.heapify(self._heap)
+            for item in expired:
+                self._drop(item[2], "expired")
+            return True
+        if not self._heap:
+            return False
+        # Otherwise shed the least urgent waiting job.
+        worst = max(self._heap, key=lambda item: (item[0], item[1]))
+        if self._rank(entry) >= worst[0]:
+            return False
+        self._heap.remove(worst)
+        heapq.heapify(self._heap)
+        self._drop(worst[2], "shed")
+        return True
+
+    def _drop(self, entry: QueuedTask, reason: str) -> None:
+        self.metrics.inc(f"task_queue.{reason}")
+        if entry.on_drop is not None:
+            try:
+                result = entry.on_drop(reason)
+                if asyncio.iscoroutine(result):
+                    self._spawn(result)
+            except Exception as exc:  # a broken callback must not stall the queue
+                logger.debug("Drop callback failed: %r", exc)
+
+    def _pump(self) -> None:
+        while self.running < self.concurrency and self._heap:
+            _rank, _seq, entry = heapq.heappop(self._heap)
+            now = self.clock()
+            if entry.deadline < now:
+                self._drop(entry, "expired")
+                continue
+            self.running += 1
+            self.metrics.observe("task_queue.wait", now - entry.enqueued)
+            self._spawn(self._run(entry))
+        self.metrics.set("task_queue.depth", len(self._heap))
+        if not self._heap and not self.running:
+            self._idle.set()
+
+    async def _run(self, entry: QueuedTask) -> None:
+        started = self.clock()
+        try:
+            await entry.job()
+        except Exception as exc:  # the job reports its own failures
+            logger.debug("Queued job failed: %r", exc)
+        finally:
+            self.metrics.observe("task_queue.run", self.clock() - started)
+            self.running -= 1
+            self._pump()
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
@@ -0,0 +1,258 @@
+"""Work stealing: idle nodes pull queued tasks from busy ones."""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import random
+import uuid
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger("enhanced_network.work_stealing")
+
+VICTIM_STRATEGIES = ("random", "most_loaded")
+
+
+def choose_victim(loads: Dict[str, int], strategy: str, rng: random.Random) -> Optional[str]:
+    """Pick the peer to steal from given what is known of their queue lengths.
+
+    ``loads`` maps candidate peers to their last reported queue length, or
+    -1 if unknown.  ``most_loaded`` takes the longest queue and tries peers
+    with unknown load only when nobody is known to have work; ``random``
+    picks uniformly among peers not known to be empty.
+    """
+    if strategy not in VICTIM_STRATEGIES:
+        raise ValueError(f"unknown victim strategy {strategy!r}")
+    candidates = [p for p, load in loads.items() if load != 0]
+    if not candidates:
+        return None
+    if strategy == "most_loaded":
+        busiest = max(loads[p] for p in candidates)
+        if busiest > 0:
+            candidates = [p for p in candidates if loads[p] == busiest]
+    return rng.choice(candidates)
+
+
+class WorkStealingScheduler:
+    """Run tasks from a local deque and steal from peers when it runs dry.
+
+    :meth:`submit` appends to this node's deque and returns a future for
+    the task's result.  ``workers`` local coroutines take tasks from the
+    front of the deque and run them with ``run_task(task)``.  When the deque
+    is empty a worker sends a ``work_steal`` request to a peer chosen by
+    ``victim`` (see :func:`choose_victim`); the peer hands over up to half
+    of its queue, at most ``steal_batch`` tasks, taken from the back, where
+    they would otherwise wait longest.  Peers tell their neighbours their
+    queue length every ``load_interval`` seconds and in every steal reply.
+    A worker that finds nothing backs off up to ``max_backoff`` seconds,
+    or until new work is submitted.
+
+    Results of stolen tasks are sent back to the submitting node with
+    ``work_result`` so futures resolve where they were created.  Tasks in
+    a steal reply that never arrives are lost, so callers wanting
+    exactly-once execution should time out and resubmit.
+    """
+
+    def __init__(self, node, run_task: Callable[[Any], Awaitable[Any]], workers: int = 1, steal_batch: int = 32,
+                 victim: str = "random", load_interval: float = 1.0, max_backoff: float = 1.0,
+                 steal_timeout: float = 2.0, rng: Optional[random.Random] = None):
+        if victim not in VICTIM_STRATEGIES:
+            raise ValueError(f"unknown victim strategy {victim!r}")
+        self.node = node
+        self.run_task = run_task
+        self.workers = workers
+        self.steal_batch = steal_batch
+        self.victim = victim
+        self.load_interval = load_interval
+        self.max_backoff = max_backoff
+        self.steal_timeout = steal_timeout
+        self.rng = rng or random.Random()
+        # Entries are {"id", "origin", "task"} so results can find their way home.
+        self.queue: Deque[Dict[str, Any]] = collections.deque()
+        self.peer_loads: Dict[str, int] = {}
+        self.completed = 0
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._work = asyncio.Event()
+        self._advertised: Optional[int] = None
+        self._tasks: List[asyncio.Task] = []
+        self.running = False
+        node.register_request_handler("work_steal", self._handle_steal)
+        node.register_message_handler("work_result", self._handle_result)
+        node.register_message_handler("work_load", self._handle_load)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self.running = True
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            self._tasks.append(asyncio.create_task(self._advertise_loop()))
+
+    async def stop(self) -> None:
+        # Workers also check the flag: a wait_for finishing as it is
+        # cancelled can swallow the cancellation on older Pythons.
+        self.running = False
+        self._work.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, task: Any) -> asyncio.Future:
+        """Queue ``task`` here; the future resolves with its result wherever it runs."""
+        entry = {"id": uuid.uuid4().hex, "origin": self.node.node_id, "task": task}
+        future = asyncio.get_event_loop().create_future()
+        self._futures[entry["id"]] = future
+        self.queue.append(entry)
+        self._work.set()
+        return future
+
+    async def _worker(self) -> None:
+        backoff = 0.01
+        while self.running:
+            if not self.queue:
+                if await self._steal():
+                    backoff = 0.01
+                    continue
+                self._work.clear()
+                try:
+                    await asyncio.wait_for(self._work.wait(), backoff)
+                except asyncio.TimeoutError:
+                    backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = 0.01
+            entry = self.queue.popleft()
+            try:
+                outcome = {"result": await self.run_task(entry["task"])}
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # report it to the submitter and carry on
+                outcome = {"error": repr(exc)}
+            self.completed += 1
+            await self._finish(entry, outcome)
+
+    async def _steal(self) -> bool:
+        loads = {p: self.peer_loads.get(p, -1) for p in self.node.connections}
+        peer = choose_victim(loads, self.victim, self.rng)
+        if peer is None:
+            return False
+        self.node.metrics.inc("steal.requests")
+        try:
+            reply = await self.node.request(peer, "work_steal", {"max": self.steal_batch}, timeout=self.steal_timeout)
+        except (asyncio.TimeoutError, ConnectionError) as exc:
+            logger.debug("Steal from %s failed: %r", peer, exc)
+            self.peer_loads.pop(peer, None)
+            return False
+        entries = reply.get("tasks", [])
+        self.peer_loads[peer] = int(reply.get("remaining", 0))
+        if not entries:
+            self.node.metrics.inc("steal.empty")
+            return False
+        self.queue.extend(entries)
+        self.node.metrics.inc("steal.tasks_in", len(entries))
+        return True
+
+    async def _finish(self, entry: Dict[str, Any], outcome: Dict[str, Any]) -> None:
+        if entry["origin"] == self.node.node_id:
+            self._resolve(entry["id"], outcome)
+            return
+        try:
+            await self.node.send_message(entry["origin"], "work_result", {"id": entry["id"], **outcome})
+        except Exception as exc:  # the submitter is gone
+            logger.debug("Could not return result of %s: %r", entry["id"], exc)
+
+    def _resolve(self, task_id: str, outcome: Dict[str, Any]) -> None:
+        future = self._futures.pop(task_id, None)
+        if future is None or future.done():
+            return
+        if "error" in outcome:
+            future.set_exception(RuntimeError(outcome["error"]))
+        else:
+            future.set_result(outcome.get("result"))
+
+    async def _handle_steal(self, message) -> Dict[str, Any]:
+        count = min(int(message.payload.get("max", self.steal_batch)), (len(self.queue) + 1) // 2)
+        entries = [self.queue.pop() for _ in range(count)]
+        entries.reverse()
+        if entries:
+            self.node.metrics.inc("steal.tasks_out", len(entries))
+        return {"tasks": entries, "remaining": len(self.queue)}
+
+    async def _handle_result(self, message) -> None:
+        payload = message.payload
+        self._resolve(payload.get("id"), payload)
+
+    async def _handle_load(self, message) -> None:
+        self.peer_loads[message.sender_id] = int(message.payload.get("queued", 0))
+
+    async def _advertise_loop(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.load_interval * self.rng.uniform(0.8, 1.2))
+            queued = len(self.queue)
+            if queued == self._advertised:
+                continue
+            self._advertised = queued
+            for peer in list(self.node.connections):
+                try:
+                    await self.node.send_message(peer, "work_load", {"queued": queued})
+                except Exception as exc:  # keep advertising to the others
+                    logger.debug("Load update to %s failed: %r", peer, exc)
+
+
+def simulate_work_stealing(speeds: Dict[str, float], tasks: int = 5000, steal: bool = True,
+                           victim: str = "random", steal_batch: int = 32, steal_latency: float = 0.05,
+                           seed: int = 1) -> Dict[str, float]:
+    """Run a batch of skewed tasks on simulated nodes and report makespan.
+
+    Tasks are dealt round robin, as :class:`TaskDistributor` would push
+    them; their sizes are Pareto distributed (a few are much larger than
+    the rest) and each node runs at its ``speed``.  With ``steal`` an idle
+    node asks a peer chosen by ``victim`` for half its queue, up to
+    ``steal_batch`` tasks, and receives them ``steal_latency`` later;
+    without it every node just works through its own queue.  Queue
+    lengths are known exactly, as if load reports were instant.
+    Utilisation is busy time over ``nodes * makespan``.
+    """
+    rng = random.Random(seed)
+    nodes = list(speeds)
+    queues: Dict[str, Deque[float]] = {node: collections.deque() for node in nodes}
+    for index in range(tasks):
+        queues[nodes[index % len(nodes)]].append(min(rng.paretovariate(1.5), 100.0))
+    seq = itertools.count()
+    events: List[tuple] = [(0.0, next(seq), "idle", node, None) for node in nodes]
+    heapq.heapify(events)
+    busy = dict.fromkeys(nodes, 0.0)
+    stealing = set()
+    makespan = 0.0
+    steals = migrated = 0
+    while events:
+        now, _seq, kind, node, data = heapq.heappop(events)
+        if kind == "request":
+            # The request reached the victim ``node``; it answers with half its queue.
+            count = min(steal_batch, (len(queues[node]) + 1) // 2)
+            batch = [queues[node].pop() for _ in range(count)]
+            heapq.heappush(events, (now + steal_latency / 2, next(seq), "reply", data, batch))
+            continue
+        if kind == "reply":
+            stealing.discard(node)
+            queues[node].extend(reversed(data))
+            migrated += len(data)
+        if queues[node]:
+            size = queues[node].popleft()
+            busy[node] += size / speeds[node]
+            makespan = max(makespan, now + size / speeds[node])
+            heapq.heappush(events, (now + size / speeds[node], next(seq), "idle", node, None))
+        elif steal and node not in stealing:
+            loads = {p: len(queues[p]) for p in nodes if p != node}
+            target = choose_victim(loads, victim, rng)
+            if target is not None:
+                steals += 1
+                stealing.add(node)
+                heapq.heappush(events, (now + steal_latency / 2, next(seq), "request", target, node))
+    return {
+        "makespan": makespan,
+        "utilization": sum(busy.values()) / (len(nodes) * makespan) if makespan else 0.0,
+        "steals": steals,
+        "migrated": migrated,
+    }
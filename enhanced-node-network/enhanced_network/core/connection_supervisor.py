@@ -0,0 +1,162 @@
+"""Keep outbound peer connections alive and measure their round-trip time."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger("enhanced_network.supervisor")
+
+
+@dataclass
+class PeerTarget:
+    """Reconnect state for one configured peer address."""
+
+    address: str
+    node_id: Optional[str] = None
+    failures: int = 0
+    next_attempt: float = 0.0
+    connecting: bool = False
+
+
+class ConnectionSupervisor:
+    """Maintain connections to a target set of peers.
+
+    Targets that are not connected are redialled with full-jitter exponential
+    backoff (a random delay between zero and ``base_delay * 2**failures``,
+    capped at ``max_delay``) so that many nodes losing the same peer do not
+    reconnect in lockstep.  Every ``heartbeat_interval`` seconds each
+    connection whose peer advertised the ``heartbeat`` feature in the
+    handshake is sent a ``heartbeat`` request; replies update an EWMA of its
+    round-trip time and ``max_missed`` consecutive misses close the
+    connection so it can be redialled.  Legacy peers are never evicted.
+    """
+
+    def __init__(
+        self,
+        node,
+        targets: Iterable[str] = (),
+        base_delay: float = 0.5,
+        max_delay: float = 60.0,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 2.0,
+        max_missed: int = 3,
+        check_interval: float = 0.25,
+        rng: Optional[random.Random] = None,
+    ):
+        self.node = node
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_missed = max_missed
+        self.check_interval = check_interval
+        self.rng = rng or random.Random()
+        self.targets: Dict[str, PeerTarget] = {}
+        self.rtt: Dict[str, float] = {}
+        self.missed: Dict[str, int] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._dials: set[asyncio.Task] = set()
+        for address in targets:
+            self.add_target(address)
+
+    def add_target(self, address: str) -> None:
+        if address not in self.targets:
+            self.targets[address] = PeerTarget(address)
+
+    def remove_target(self, address: str) -> None:
+        self.targets.pop(address, None)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._reconnect_loop()),
+                asyncio.create_task(self._heartbeat_loop()),
+            ]
+
+    async def stop(self) -> None:
+        # In-flight dials too, or they could connect after shutdown.
+        tasks = self._tasks + list(self._dials)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    def backoff(self, failures: int) -> float:
+        """Return the delay before the next attempt after ``failures`` failures."""
+        # Cap the exponent: max_delay is reached long before, and 2.0 ** 1024 overflows.
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** min(failures, 32))))
+
+    def supports_heartbeat(self, peer_id: str) -> bool:
+        return "heartbeat" in self.node.peer_features.get(peer_id, ())
+
+    def is_connected(self, target: PeerTarget) -> bool:
+        return target.node_id is not None and target.node_id in self.node.connections
+
+    async def ensure_connected(self) -> None:
+        """Start a connection attempt for every due, disconnected target."""
+        now = time.monotonic()
+        for target in list(self.targets.values()):
+            if target.connecting or self.is_connected(target) or now < target.next_attempt:
+                continue
+            target.connecting = True
+            task = asyncio.ensure_future(self._attempt(target))
+            self._dials.add(task)
+            task.add_done_callback(self._dials.discard)
+
+    async def _attempt(self, target: PeerTarget) -> None:
+        try:
+            target.node_id = await self.node.connect_to_peer(target.address)
+            target.failures = 0
+            self.node.metrics.inc("supervisor.connects")
+        except Exception as exc:  # refused, unreachable, handshake timeout...
+            target.failures += 1
+            delay = self.backoff(target.failures)
+            target.next_attempt = time.monotonic() + delay
+            self.node.metrics.inc("supervisor.failures")
+            logger.debug("Connecting to %s failed (%r), retrying in %.2fs", target.address, exc, delay)
+        finally:
+            target.connecting = False
+
+    async def heartbeat(self, peer_id: str) -> Optional[float]:
+        """Ping ``peer_id`` once and return the RTT, or ``None`` on a miss."""
+        started = time.perf_counter()
+        try:
+            await self.node.request(peer_id, "heartbeat", {}, timeout=self.heartbeat_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            missed = self.missed.get(peer_id, 0) + 1
+            self.missed[peer_id] = missed
+            self.node.metrics.inc("supervisor.missed_heartbeats")
+            if missed >= self.max_missed and self.supports_heartbeat(peer_id):
+                logger.info("Evicting %s after %d missed heartbeats", peer_id, missed)
+                self.node.metrics.inc("supervisor.evictions")
+                await self.node.close_connection(peer_id)
+                self.missed.pop(peer_id, None)
+                self.rtt.pop(peer_id, None)
+            return None
+        rtt = time.perf_counter() - started
+        self.missed[peer_id] = 0
+        previous = self.rtt.get(peer_id)
+        self.rtt[peer_id] = rtt if previous is None else 0.8 * previous + 0.2 * rtt
+        self.node.topology.update_link(self.node.node_id, peer_id, rtt=self.rtt[peer_id])
+        self.node.metrics.observe("supervisor.rtt", rtt)
+        return rtt
+
+    async def _reconnect_loop(self) -> None:
+        while True:
+            await self.ensure_connected()
+            await asyncio.sleep(self.check_interval)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            peers = [p for p in self.node.connections if self.supports_heartbeat(p)]
+            for peer_id in set(self.missed) | set(self.rtt):
+                if peer_id not in self.node.connections:
+                    self.missed.pop(peer_id, None)
+                    self.rtt.pop(peer_id, None)
+            await asyncio.gather(*(self.heartbeat(p) for p in peers))
@@ -3,7 +3,30 @@
 from __future__ import annotations
 
 import os
+import struct
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Union
+
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.exceptions import InvalidTag
+
+NONCE_SIZE = 12
+TAG_SIZE = 16
+# Messages sealed under one key before a session rekeys.  Well inside the
+# 2**32 invocation limit recommended for a single AES-GCM key.
+REKEY_AFTER = 2 ** 31
+# How many epochs a receiver will ratchet forward in one go.
+MAX_EPOCH_SKIP = 16
+
+_NONCE = struct.Struct("!IQ")
+# encrypt_into/decrypt_into only exist in recent cryptography releases;
+# older ones seal into a new buffer and the result is copied instead.
+_AEAD_INTO = hasattr(AESGCM, "encrypt_into")
+
+Buffer = Union[bytearray, memoryview]
 
 
 def generate_key() -> bytes:
@@ -11,16 +34,186 @@ def generate_key() -> bytes:
     return AESGCM.generate_key(bit_length=128)
 
 
+@lru_cache(maxsize=256)
+def _aesgcm(key: bytes) -> AESGCM:
+    return AESGCM(key)
+
+
 def encrypt(key: bytes, data: bytes, associated_data: bytes | None = None) -> bytes:
     """Encrypt ``data`` and return nonce + ciphertext."""
-    aes = AESGCM(key)
-    nonce = os.urandom(12)
-    ct = aes.encrypt(nonce, data, associated_data)
+    nonce = os.urandom(NONCE_SIZE)
+    ct = _aesgcm(key).encrypt(nonce, data, associated_data)
     return nonce + ct
 
 
 def decrypt(key: bytes, token: bytes, associated_data: bytes | None = None) -> bytes:
     """Decrypt ``token`` produced by :func:`encrypt`."""
-    aes = AESGCM(key)
-    nonce, ct = token[:12], token[12:]
-    return aes.decrypt(nonce, ct, associated_data)
+    nonce, ct = token[:NONCE_SIZE], token[NONCE_SIZE:]
+    return _aesgcm(key).decrypt(nonce, ct, associated_data)
+
+
+def derive_key(secret: bytes, info: bytes, length: int = 16, salt: Optional[bytes] = None) -> bytes:
+    """Derive a ``length`` byte key from ``secret`` with HKDF-SHA256."""
+    return HKDF(algorithm=hashes.SHA256(), length=length, salt=salt, info=info).derive(secret)
+
+
+def _next_key(key: bytes, epoch: int) -> bytes:
+    return derive_key(key, b"enhanced-network rekey" + epoch.to_bytes(4, "big"), len(key))
+
+
+class _Direction:
+    """Key, epoch and cached AES-GCM context for one direction of a session."""
+
+    __slots__ = ("key", "epoch", "aead")
+
+    def __init__(self, key: bytes):
+        self.key = key
+        self.epoch = 0
+        self.aead = AESGCM(key)
+
+    def ratchet(self) -> None:
+        if self.epoch == 0xFFFFFFFF:
+            raise OverflowError("session key epochs exhausted")
+        self.epoch += 1
+        self.key = _next_key(self.key, self.epoch)
+        self.aead = AESGCM(self.key)
+
+
+class SessionCipher:
+    """AES-GCM for a long-lived session with one peer.
+
+    The AES key schedule is built once per key instead of per message.
+    Nonces are a 4-byte key epoch followed by an 8-byte message counter, so
+    they never repeat under a key.  After ``rekey_after`` messages the sender
+    derives the next key from the current one with HKDF and bumps the epoch;
+    the receiver follows when it sees the new epoch in a nonce.  Sealed
+    messages have the same ``nonce + ciphertext`` layout as :func:`encrypt`.
+
+    The two sides of a link must use different ``send_key`` values, or both
+    directions would reuse the same nonces under one key; pass the peer's
+    ``send_key`` as ``recv_key``.  Received counters must increase, which
+    rejects replayed and reordered messages.
+    """
+
+    overhead = NONCE_SIZE + TAG_SIZE
+
+    def __init__(self, send_key: bytes, recv_key: bytes, rekey_after: int = REKEY_AFTER):
+        if send_key == recv_key:
+            raise ValueError("send and receive keys must differ")
+        self._send = _Direction(send_key)
+        self._recv = _Direction(recv_key)
+        self.rekey_after = rekey_after
+        self._counter = 0
+        self._last_received = -1
+
+    @property
+    def send_epoch(self) -> int:
+        return self._send.epoch
+
+    @property
+    def recv_epoch(self) -> int:
+        return self._recv.epoch
+
+    def _next_nonce(self) -> bytes:
+        if self._counter >= self.rekey_after:
+            self._send.ratchet()
+            self._counter = 0
+        nonce = _NONCE.pack(self._send.epoch, self._counter)
+        self._counter += 1
+        return nonce
+
+    def encrypt(self, data: bytes, associated_data: Optional[bytes] = None) -> bytes:
+        """Return ``nonce + ciphertext`` for ``data``."""
+        nonce = self._next_nonce()
+        return nonce + self._send.aead.encrypt(nonce, data, associated_data)
+
+    def encrypt_into(self, data: bytes, out: Buffer, associated_data: Optional[bytes] = None) -> int:
+        """Seal ``data`` into ``out`` and return the number of bytes written.
+
+        ``out`` needs room for ``len(data) + SessionCipher.overhead`` bytes.
+        """
+        size = len(data) + self.overhead
+        if len(out) < size:
+            raise ValueError(f"output buffer too small: need {size} bytes")
+        view = memoryview(out)
+        nonce = self._next_nonce()
+        view[:NONCE_SIZE] = nonce
+        if _AEAD_INTO:
+            self._send.aead.encrypt_into(nonce, data, associated_data, view[NONCE_SIZE:size])
+        else:
+            view[NONCE_SIZE:size] = self._send.aead.encrypt(nonce, data, associated_data)
+        return size
+
+    def _open(self, token, associated_data, out: Optional[memoryview] = None):
+        if len(token) < self.overhead:
+            raise ValueError("token too short")
+        nonce = bytes(token[:NONCE_SIZE])
+        epoch, counter = _NONCE.unpack(nonce)
+        recv = self._recv
+        if epoch == recv.epoch:
+            if counter <= self._last_received:
+                raise InvalidTag()
+        elif epoch < recv.epoch or epoch - recv.epoch > MAX_EPOCH_SKIP:
+            raise InvalidTag()
+        else:
+            # Ratchet a copy so a forged epoch cannot move the real state.
+            ahead = _Direction(recv.key)
+            ahead.epoch = recv.epoch
+            while ahead.epoch < epoch:
+                ahead.ratchet()
+            recv = ahead
+        body = memoryview(token)[NONCE_SIZE:]
+        if out is None:
+            result = recv.aead.decrypt(nonce, body, associated_data)
+        elif _AEAD_INTO:
+            result = recv.aead.decrypt_into(nonce, body, associated_data, out)
+        else:
+            plain = recv.aead.decrypt(nonce, body, associated_data)
+            out[:len(plain)] = plain
+            result = len(plain)
+        self._recv = recv
+        self._last_received = counter
+        return result
+
+    def decrypt(self, token: bytes, associated_data: Optional[bytes] = None) -> bytes:
+        """Open a token produced by the peer's :meth:`encrypt`."""
+        return self._open(token, associated_data)
+
+    def decrypt_into(self, token: bytes, out: Buffer, associated_data: Optional[bytes] = None) -> int:
+        """Open ``token`` into ``out`` and return the plaintext length."""
+        size = len(token) - self.overhead
+        if size < 0:
+            raise ValueError("token too short")
+        if len(out) < size:
+            raise ValueError(f"output buffer too small: need {size} bytes")
+        self._open(token, associated_data, memoryview(out)[:size])
+        return size
+
+
+class SessionCipherCache:
+    """Per-peer :class:`SessionCipher` objects, least recently used evicted."""
+
+    def __init__(self, max_peers: int = 1024):
+        self.max_peers = max_peers
+        self._ciphers: "OrderedDict[str, SessionCipher]" = OrderedDict()
+
+    def get(self, peer_id: str) -> Optional[SessionCipher]:
+        cipher = self._ciphers.get(peer_id)
+        if cipher is not None:
+            self._ciphers.move_to_end(peer_id)
+        return cipher
+
+    def set(self, peer_id: str, cipher: SessionCipher) -> None:
+        self._ciphers[peer_id] = cipher
+        self._ciphers.move_to_end(peer_id)
+        while len(self._ciphers) > self.max_peers:
+            self._ciphers.popitem(last=False)
+
+    def pop(self, peer_id: str) -> Optional[SessionCipher]:
+        return self._ciphers.pop(peer_id, None)
+
+    def __contains__(self, peer_id: str) -> bool:
+        return peer_id in self._ciphers
+
+    def __len__(self) -> int:
+        return len(self._ciphers)
@@ -0,0 +1,158 @@
+"""Inbound message dispatch with per-type execution policies."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional, Set
+
+from ..utils.metrics import Metrics
+
+INLINE = "inline"
+TASK = "task"
+THREAD = "thread"
+PROCESS = "process"
+MODES = (INLINE, TASK, THREAD, PROCESS)
+
+# Ordering guarantees for pooled modes.
+ORDER_SENDER = "sender"
+ORDER_TYPE = "type"
+
+logger = logging.getLogger("enhanced_network.dispatcher")
+
+
+@dataclass
+class DispatchPolicy:
+    """How handlers for one message type are executed.
+
+    ``inline`` awaits the handler in the reading coroutine, ``task`` runs it
+    as an asyncio task, ``thread`` and ``process`` run synchronous handlers
+    in an executor.  Pooled modes run at most ``concurrency`` handlers at a
+    time.  ``ordering`` may be ``"sender"`` or ``"type"`` to make messages
+    sharing that key complete in arrival order.
+    """
+
+    mode: str = INLINE
+    concurrency: int = 16
+    ordering: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.mode not in MODES:
+            raise ValueError(f"unknown dispatch mode {self.mode!r}")
+        if self.ordering not in (None, ORDER_SENDER, ORDER_TYPE):
+            raise ValueError(f"unknown ordering {self.ordering!r}")
+        if self.concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+
+class MessageDispatcher:
+    """Run message handlers according to their :class:`DispatchPolicy`.
+
+    :meth:`dispatch` only waits while a type's pool is full, so a slow
+    handler holds up its own message type instead of the whole connection.
+    Handler latency, measured from arrival to completion, is recorded in the
+    ``dispatch.latency.<type>`` histogram of ``metrics``.
+    """
+
+    def __init__(
+        self,
+        metrics: Optional[Metrics] = None,
+        default_policy: Optional[DispatchPolicy] = None,
+        max_workers: Optional[int] = None,
+    ):
+        self.metrics = metrics or Metrics()
+        self.default_policy = default_policy or DispatchPolicy()
+        self.max_workers = max_workers
+        self.policies: Dict[str, DispatchPolicy] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._tails: Dict[Hashable, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def configure(self, message_type: str, policy: DispatchPolicy) -> None:
+        self.policies[message_type] = policy
+        self._semaphores.pop(message_type, None)
+
+    def policy_for(self, message_type: str) -> DispatchPolicy:
+        return self.policies.get(message_type, self.default_policy)
+
+    async def dispatch(self, message_type: str, handler: Callable, args: tuple, sender_id: str = "") -> None:
+        received = time.perf_counter()
+        policy = self.policy_for(message_type)
+        if policy.mode == INLINE:
+            await self._run(message_type, policy, handler, args, received)
+            return
+
+        semaphore = self._semaphores.get(message_type)
+        if semaphore is None:
+            semaphore = self._semaphores[message_type] = asyncio.Semaphore(policy.concurrency)
+        await semaphore.acquire()
+
+        key: Optional[Hashable] = None
+        if policy.ordering == ORDER_SENDER:
+            key = (message_type, sender_id)
+        elif policy.ordering == ORDER_TYPE:
+            key = message_type
+        previous = self._tails.get(key) if key is not None else None
+
+        task = asyncio.create_task(
+            self._run_pooled(message_type, policy, handler, args, received, semaphore, previous, key)
+        )
+        if key is not None:
+            self._tails[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Cancel pending handlers and shut the executors down."""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tails.clear()
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        self._thread_pool = self._process_pool = None
+
+    async def _run_pooled(self, message_type, policy, handler, args, received, semaphore, previous, key):
+        try:
+            if previous is not None and not previous.done():
+                await asyncio.wait({previous})
+            await self._run(message_type, policy, handler, args, received)
+        finally:
+            semaphore.release()
+            if key is not None and self._tails.get(key) is asyncio.current_task():
+                del self._tails[key]
+
+    async def _run(self, message_type, policy, handler, args, received) -> None:
+        try:
+            if policy.mode in (THREAD, PROCESS):
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor(policy.mode), functools.partial(handler, *args))
+            else:
+                result = handler(*args)
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.metrics.inc(f"dispatch.errors.{message_type}")
+            logger.exception("Handler for %s failed", message_type)
+        finally:
+            self.metrics.observe(f"dispatch.latency.{message_type}", time.perf_counter() - received)
+
+    def _executor(self, mode: str) -> Executor:
+        if mode == THREAD:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="mesh-dispatch")
+            return self._thread_pool
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(self.max_workers)
+        return self._process_pool
@@ -1,13 +1,44 @@
 """Core mesh networking node with WebSocket support."""
 import asyncio
-import json
+import functools
+import time
 import uuid
 import socket
 import logging
 from datetime import datetime
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Any, Optional, Callable
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Callable, Iterable, Set, Tuple
 import websockets
+from cryptography.exceptions import InvalidTag
+
+from .connection_supervisor import ConnectionSupervisor
+from .crypto_utils import SessionCipher
+from .dispatcher import DispatchPolicy, MessageDispatcher
+from .gossip import GossipProtocol
+from .peer_discovery import PeerDiscovery
+from .secure_link import KeyExchange, LinkSecurity
+from .send_queue import PeerSendQueue
+from .streaming import Source, StreamManager
+from ..discovery.bootstrap import Bootstrapper
+from ..discovery.dht import MeshDHT
+from ..discovery.multicast import MulticastDiscovery
+from ..discovery.overlay import OverlayManager
+from ..discovery.service_registry import ServiceRegistry, ServiceRegistrySync
+from ..discovery.topology_manager import TopologyManager
+from ..storage.chunk_exchange import ChunkExchange
+from ..storage.chunk_store import ChunkStore
+from ..utils.compression import CompressionPolicy, create_compressor
+from ..utils.metrics import Metrics
+from ..utils.seen_cache import SeenCache
+from ..utils.serialization import (
+    Codec, Frame, available_codecs, decode_frame, encode_frame, encode_record, get_codec, negotiate_codec,
+)
+
+# Recipient used for messages addressed to every connected peer.
+BROADCAST = '*'
+
+# Optional protocol features advertised in the handshake.
+FEATURES = ('heartbeat',)
 
 @dataclass
 class NodeInfo:
@@ -29,6 +60,71 @@ class NetworkMessage:
     payload: Dict[str, Any]
     timestamp: datetime
     ttl: int = 300
+    # ``message_id`` of the request this message answers.
+    correlation_id: Optional[str] = None
+    # Connection the message arrived on; local only, never sent.
+    received_from: Optional[str] = field(default=None, compare=False, repr=False)
+
+def message_to_dict(msg: NetworkMessage) -> Dict[str, Any]:
+    """Return the wire representation of ``msg``."""
+    data = {
+        'message_id': msg.message_id,
+        'sender_id': msg.sender_id,
+        'recipient_id': msg.recipient_id,
+        'message_type': msg.message_type,
+        'payload': msg.payload,
+        'timestamp': msg.timestamp.timestamp(),
+        'ttl': msg.ttl,
+    }
+    if msg.correlation_id is not None:
+        data['correlation_id'] = msg.correlation_id
+    return data
+
+def message_from_dict(data: Dict[str, Any]) -> NetworkMessage:
+    """Build a :class:`NetworkMessage` from its wire representation."""
+    timestamp = data.get('timestamp')
+    if isinstance(timestamp, (int, float)):
+        timestamp = datetime.fromtimestamp(timestamp)
+    elif isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    else:
+        timestamp = datetime.now()
+    return NetworkMessage(
+        message_id=data['message_id'],
+        sender_id=data['sender_id'],
+        recipient_id=data['recipient_id'],
+        message_type=data['message_type'],
+        payload=data.get('payload') or {},
+        timestamp=timestamp,
+        ttl=data.get('ttl', 300),
+        correlation_id=data.get('correlation_id'),
+    )
+
+def node_info_to_dict(info: NodeInfo) -> Dict[str, Any]:
+    """Return the wire representation of ``info``."""
+    return {
+        'node_id': info.node_id,
+        'node_type': info.node_type,
+        'public_key': info.public_key,
+        'endpoints': list(info.endpoints),
+        'capabilities': list(info.capabilities),
+        'metadata': info.metadata,
+        'last_seen': info.last_seen.timestamp(),
+        'status': info.status,
+    }
+
+def node_info_from_dict(data: Dict[str, Any]) -> NodeInfo:
+    """Build a :class:`NodeInfo` from its wire representation."""
+    return NodeInfo(
+        node_id=data['node_id'],
+        node_type=data.get('node_type', 'enhanced_node'),
+        public_key=data.get('public_key', ''),
+        endpoints=list(data.get('endpoints', [])),
+        capabilities=list(data.get('capabilities', [])),
+        metadata=data.get('metadata') or {},
+        last_seen=datetime.now(),
+        status=data.get('status', 'online'),
+    )
 
 class MeshNode:
     def __init__(self, config: Dict[str, Any]):
@@ -39,85 +135,776 @@ class MeshNode:
         self.peers: Dict[str, NodeInfo] = {}
         self.connections: Dict[str, websockets.WebSocketServerProtocol] = {}
         self.message_handlers: Dict[str, Callable] = {}
+        # Codecs offered during the handshake, most preferred first.
+        self.codecs: List[str] = list(config.get('codecs') or available_codecs())
+        self.peer_codecs: Dict[str, Codec] = {}
+        # Whether we dialed the current connection to a peer (used for dedup).
+        self._outbound: Dict[str, bool] = {}
+        self.handshake_timeout = config.get('handshake_timeout', 5.0)
+        self.send_timeout = config.get('send_timeout', 5.0)
+        self.broadcast_concurrency = config.get('broadcast_concurrency', 64)
+        self.send_queue_size = config.get('send_queue_size', 1024)
+        self.send_queue_overflow = config.get('send_queue_overflow', 'block')
+        self.coalesce_bytes = config.get('coalesce_bytes', 64 * 1024)
+        self.send_queues: Dict[str, PeerSendQueue] = {}
+        self.metrics = Metrics()
+        # Optional record compression, used with peers that offer the same
+        # method and dictionary.  permessage-deflate is left on only when
+        # neither this nor encryption is configured.
+        self.compression: Optional[CompressionPolicy] = None
+        compression = config.get('compression')
+        if compression:
+            dictionary = compression.get('dictionary')
+            if isinstance(dictionary, str):
+                with open(dictionary, 'rb') as fh:
+                    dictionary = fh.read()
+            self.compression = CompressionPolicy(
+                create_compressor(compression.get('method', 'zlib'), compression.get('level'), dictionary),
+                threshold=compression.get('threshold', 256),
+                metrics=self.metrics,
+            )
+        self.peer_compression: Dict[str, CompressionPolicy] = {}
+        # Opt-in authenticated encryption of every link, see LinkSecurity.
+        self.link_security: Optional[LinkSecurity] = None
+        if config.get('encryption'):
+            self.link_security = LinkSecurity(self.node_id, metrics=self.metrics, **config['encryption'])
+        self.peer_ciphers: Dict[str, SessionCipher] = {}
+        # Features each handshaken peer advertised; legacy links have none.
+        self.peer_features: Dict[str, Set[str]] = {}
+        # Sealed frames do not compress, so deflating them only costs CPU.
+        # With record compression, deflate is still offered for peers that
+        # do not agree on it and dropped per link once they do.
+        self.websocket_compression = config.get(
+            'websocket_compression', None if self.link_security else 'deflate')
+        self.request_timeout = config.get('request_timeout', 10.0)
+        # In-flight requests: correlation id -> (future, peer id, message type, start time).
+        self._pending: Dict[str, Tuple[asyncio.Future, str, str, float]] = {}
+        self._pending_by_peer: Dict[str, Set[str]] = {}
+        # Multi-hop routing: hop limit for new messages, duplicate suppression
+        # and the link-state view of the mesh used to pick next hops.
+        self.max_hops = config.get('max_hops', 16)
+        self.seen_messages = SeenCache(config.get('seen_cache_size', 65536), config.get('seen_cache_ttl', 300.0))
+        self.topology = TopologyManager()
+        self.topology.add_node(self.node_id)
+        self._link_states: Dict[str, Tuple[int, List[str]]] = {}
+        self._link_state_seq = 0
+        self.dispatcher = MessageDispatcher(
+            self.metrics,
+            DispatchPolicy(**config.get('dispatch_default', {})),
+            max_workers=config.get('dispatch_workers'),
+        )
+        for message_type, policy in config.get('dispatch', {}).items():
+            self.dispatcher.configure(message_type, DispatchPolicy(**policy))
         self.running = False
         self.server: Optional[websockets.server.Serve] = None
         self.logger = logging.getLogger(f"MeshNode-{self.node_id}")
         self.logger.setLevel(logging.INFO)
         self._register_default_handlers()
+        # ``direct`` broadcasts reach connected peers only; ``gossip`` spreads
+        # them epidemically through the whole mesh.
+        self.broadcast_mode = config.get('broadcast_mode', 'direct')
+        self.gossip: Optional[GossipProtocol] = None
+        if self.broadcast_mode == 'gossip':
+            self.gossip = GossipProtocol(self, **config.get('gossip', {}))
+        # Keeps the configured ``peers`` connected and heartbeats every link.
+        self.supervisor = ConnectionSupervisor(self, config.get('peers', []), **config.get('supervisor', {}))
+        # Optional bootstrap stage run by start(): peer book first, then probing.
+        self.bootstrapper: Optional[Bootstrapper] = None
+        if config.get('bootstrap'):
+            self.bootstrapper = Bootstrapper(self, **config['bootstrap'])
+        self._bootstrap_task: Optional[asyncio.Task] = None
+        # Static bootstrap nodes plus, with ``multicast``, peers on the LAN.
+        local = None
+        if config.get('multicast') is not None:
+            local = MulticastDiscovery(self.node_id, self.node_info().endpoints[0], **config['multicast'])
+        self.discovery = PeerDiscovery(config, local)
+        # Optional degree-bounded overlay fed by PeerDiscovery.
+        self.overlay: Optional[OverlayManager] = None
+        if 'overlay' in config:
+            self.overlay = OverlayManager(self, self.discovery, **config['overlay'])
+        # Chunked transfer of large payloads to neighbours.
+        self.streams = StreamManager(self, **config.get('streams', {}))
+        # Optional Kademlia DHT for locating nodes and services mesh-wide.
+        self.dht: Optional[MeshDHT] = MeshDHT(self, **config['dht']) if 'dht' in config else None
+        # Optional content-addressed chunk cache shared with neighbours.
+        self.chunks: Optional[ChunkExchange] = None
+        if config.get('chunk_store'):
+            store = ChunkStore(metrics=self.metrics, **config['chunk_store'])
+            self.chunks = ChunkExchange(self, store, **config.get('chunk_exchange', {}))
+        # Optional leased service registry replicated across the mesh.
+        self.services: Optional[ServiceRegistry] = None
+        self.service_sync: Optional[ServiceRegistrySync] = None
+        if 'service_registry' in config:
+            options = dict(config['service_registry'])
+            interval = options.pop('sync_interval', 0.5)
+            self.services = ServiceRegistry(**options)
+            self.service_sync = ServiceRegistrySync(self, self.services, interval)
 
     def _register_default_handlers(self):
         self.message_handlers['peer_discovery'] = self._handle_peer_discovery
+        self.message_handlers['link_state'] = self._handle_link_state
+        self.register_request_handler('heartbeat', self._handle_heartbeat)
 
     async def start(self):
         self.running = True
         await self._start_websocket_server()
+        if self.gossip:
+            self.gossip.start()
+        if self.dht:
+            self.dht.start()
+        if self.service_sync:
+            self.service_sync.start()
+        try:
+            await self.discovery.start()
+        except OSError as exc:
+            self.logger.warning(f"LAN discovery unavailable: {exc}")
+        if self.overlay:
+            self.overlay.start()
+        if self.bootstrapper:
+            self._bootstrap_task = asyncio.ensure_future(self.bootstrapper.run())
+        self.supervisor.start()
         self.logger.info("Mesh node started")
 
     async def stop(self):
         self.running = False
+        if self._bootstrap_task:
+            self._bootstrap_task.cancel()
+            await asyncio.gather(self._bootstrap_task, return_exceptions=True)
+        await self.supervisor.stop()
+        if self.gossip:
+            await self.gossip.stop()
+        if self.dht:
+            await self.dht.stop()
+        if self.service_sync:
+            await self.service_sync.stop()
+        if self.overlay:
+            await self.overlay.stop()
+        await self.discovery.stop()
+        for correlation_id in list(self._pending):
+            self._fail_request(correlation_id, ConnectionError("node stopped"))
+        for queue in list(self.send_queues.values()):
+            await queue.close()
         for ws in list(self.connections.values()):
             await ws.close()
+        await self.dispatcher.close()
+        if self.link_security:
+            self.link_security.close()
         if self.server:
             self.server.close()
             await self.server.wait_closed()
         self.logger.info("Mesh node stopped")
 
+    def node_info(self) -> NodeInfo:
+        """Describe this node for the connection handshake."""
+        endpoints = self.config.get('endpoints') or [f"{socket.gethostname()}:{self.listen_port}"]
+        return NodeInfo(
+            node_id=self.node_id,
+            node_type=self.node_type,
+            public_key=self.config.get('public_key') or (self.link_security.public_key if self.link_security else ''),
+            endpoints=list(endpoints),
+            capabilities=list(self.config.get('capabilities', [])),
+            metadata=dict(self.config.get('metadata', {})),
+            last_seen=datetime.now(),
+        )
+
     async def _start_websocket_server(self):
         async def handler(websocket, path):
-            peer_id = f"peer-{uuid.uuid4().hex[:8]}"
-            self.connections[peer_id] = websocket
+            peer_id = await self._accept_handshake(websocket)
+            if peer_id is None:
+                return
             try:
-                async for msg in websocket:
-                    await self._handle_message(json.loads(msg), peer_id)
+                await self._read_frames(websocket, peer_id)
             finally:
-                self.connections.pop(peer_id, None)
-        self.server = await websockets.serve(handler, "0.0.0.0", self.listen_port)
+                self._drop_connection(peer_id, websocket)
+        self.server = await websockets.serve(handler, "0.0.0.0", self.listen_port,
+                                             compression=self.websocket_compression)
+
+    async def _accept_handshake(self, websocket) -> Optional[str]:
+        """Answer the handshake of an inbound connection and register it.
+
+        Returns the connection key, or ``None`` if the link was closed because
+        it duplicates an existing one or failed authentication.  Peers that do
+        not start with a handshake are accepted under a random ``peer-`` key
+        and spoken to in JSON, unless encryption is required.
+        """
+        required = self.link_security is not None and self.link_security.required
+        try:
+            frame = await asyncio.wait_for(websocket.recv(), self.handshake_timeout)
+            first = next(decode_frame(frame))
+        except (asyncio.TimeoutError, StopIteration, ValueError, websockets.ConnectionClosed):
+            await websocket.close()
+            return None
+        if first.get('type') != 'handshake' or 'node' not in first:
+            if required:
+                self.metrics.inc('encryption.refused')
+                await websocket.close()
+                return None
+            peer_id = f"peer-{uuid.uuid4().hex[:8]}"
+            self._add_connection(peer_id, websocket, outbound=False)
+            await self._handle_message(first, peer_id)
+            return peer_id
+
+        info = node_info_from_dict(first['node'])
+        codec = negotiate_codec(first.get('codecs', []), self.codecs)
+        # The handshake itself always travels as JSON so any peer can read it.
+        compression = self._negotiate_compression(first.get('compression'))
+        ack = {
+            'type': 'handshake_ack',
+            'node': node_info_to_dict(self.node_info()),
+            'codec': codec,
+            'compression': compression,
+            'features': list(FEATURES),
+        }
+        kex = None
+        if self.link_security is not None and first.get('encryption'):
+            kex = self.link_security.exchange(initiator=False)
+            try:
+                kex.complete(info.node_id, first['encryption']['public'])
+            except (KeyError, TypeError, ValueError):
+                kex = None
+            else:
+                ack['encryption'] = dict(kex.offer(), proof=kex.proof())
+        if kex is None and required:
+            self.metrics.inc('encryption.refused')
+            await websocket.close()
+            return None
+        await websocket.send(encode_frame(get_codec('json'), ack))
+        if compression:
+            self._drop_deflate(websocket)
+        cipher = None
+        if kex is not None:
+            cipher = await self._await_key_proof(websocket, kex, info)
+            if cipher is None:
+                await websocket.close()
+                return None
+        if not self._register_peer(info, websocket, outbound=False, codec=codec, compression=compression,
+                                   cipher=cipher, features=first.get('features', [])):
+            await websocket.close()
+            return None
+        return info.node_id
+
+    async def _await_key_proof(self, websocket, kex: KeyExchange, info: NodeInfo) -> Optional[SessionCipher]:
+        """Wait for the dialing peer to prove its identity; ``None`` if it fails."""
+        try:
+            frame = await asyncio.wait_for(websocket.recv(), self.handshake_timeout)
+            auth = next(decode_frame(frame))
+        except (asyncio.TimeoutError, StopIteration, ValueError, websockets.ConnectionClosed):
+            return None
+        if auth.get('type') != 'handshake_auth' or not kex.verify(info.node_id, info.public_key, auth.get('proof')):
+            self.logger.warning(f"Rejecting {info.node_id}: link authentication failed")
+            return None
+        return kex.session()
 
     async def connect_to_peer(self, address: str):
-        ws = await websockets.connect(f"ws://{address}")
-        peer_id = f"peer-{uuid.uuid4().hex[:8]}"
-        self.connections[peer_id] = ws
-        asyncio.create_task(self._handle_peer_messages(ws, peer_id))
-        return peer_id
+        """Connect to ``address`` and return the remote node's ``node_id``.
+
+        Raises :class:`ConnectionError` if encryption is required and the peer
+        does not support it, or if the peer fails link authentication.
+        """
+        ws = await websockets.connect(f"ws://{address}", compression=self.websocket_compression)
+        kex = self.link_security.exchange(initiator=True) if self.link_security else None
+        required = kex is not None and self.link_security.required
+        await ws.send(encode_frame(get_codec('json'), {
+            'type': 'handshake',
+            'node': node_info_to_dict(self.node_info()),
+            'codecs': self.codecs,
+            'compression': self.compression.compressor.descriptor() if self.compression else None,
+            'encryption': kex.offer() if kex else None,
+            'features': list(FEATURES),
+        }))
+        try:
+            ack = next(decode_frame(await asyncio.wait_for(ws.recv(), self.handshake_timeout)))
+        except asyncio.TimeoutError:
+            ack = {}
+        except websockets.ConnectionClosed:
+            raise ConnectionError(f"{address} closed the connection during the handshake") from None
+        except Exception:  # empty or undecodable reply
+            ack = None
+        if not isinstance(ack, dict):
+            await ws.close()
+            raise ConnectionError(f"{address} sent a malformed handshake reply")
+        if ack.get('type') != 'handshake_ack':
+            if required:
+                await ws.close()
+                raise ConnectionError(f"{address} does not support encrypted links")
+            self.logger.warning(f"No handshake reply from {address}, using JSON")
+            peer_id = f"peer-{uuid.uuid4().hex[:8]}"
+            self._add_connection(peer_id, ws, outbound=True)
+            asyncio.create_task(self._handle_peer_messages(ws, peer_id))
+            if ack:
+                await self._handle_message(ack, peer_id)
+            return peer_id
+
+        try:
+            info = node_info_from_dict(ack['node'])
+        except (KeyError, TypeError, ValueError):
+            await ws.close()
+            raise ConnectionError(f"{address} sent a malformed handshake reply") from None
+        codec = ack.get('codec', 'json')
+        compression = self._negotiate_compression(ack.get('compression'))
+        if compression:
+            self._drop_deflate(ws)
+        cipher = None
+        answer = ack.get('encryption')
+        if kex is not None and answer:
+            try:
+                kex.complete(info.node_id, answer['public'])
+                authenticated = kex.verify(info.node_id, info.public_key, answer.get('proof'))
+            except (KeyError, TypeError, ValueError):
+                authenticated = False
+            if not authenticated:
+                await ws.close()
+                raise ConnectionError(f"{address} failed link authentication")
+            await ws.send(encode_frame(get_codec('json'), {'type': 'handshake_auth', 'proof': kex.proof()}))
+            cipher = kex.session()
+        elif required:
+            await ws.close()
+            raise ConnectionError(f"{address} does not support encrypted links")
+        if self._register_peer(info, ws, outbound=True, codec=codec if codec in self.codecs else 'json',
+                               compression=compression, cipher=cipher, features=ack.get('features', [])):
+            asyncio.create_task(self._handle_peer_messages(ws, info.node_id))
+        else:
+            await ws.close()
+        return info.node_id
+
+    @staticmethod
+    def _drop_deflate(websocket):
+        """Stop permessage-deflate on a link whose records are compressed already.
+
+        Both ends call this right after the handshake ack (the acceptor once
+        it is sent, the dialer once it is read), so no later frame is
+        deflated by one side and read as plain by the other.
+        """
+        websocket.extensions = [e for e in websocket.extensions if e.name != 'permessage-deflate']
+
+    def _negotiate_compression(self, offered: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """Return our compression descriptor if the peer offered the same one."""
+        if self.compression is None or not offered:
+            return None
+        mine = self.compression.compressor.descriptor()
+        return mine if offered == mine else None
+
+    def _register_peer(self, info: NodeInfo, websocket, outbound: bool, codec: str,
+                       compression: Optional[Dict[str, str]] = None,
+                       cipher: Optional[SessionCipher] = None, features: Iterable[str] = ()) -> bool:
+        """Index a handshaken connection by node id, resolving duplicate links.
+
+        When two links to the same node exist, both ends keep the one dialed
+        by the node with the smaller ``node_id`` so they agree without any
+        further messages.  Returns ``False`` if ``websocket`` should be closed.
+        """
+        peer_id = info.node_id
+        if peer_id == self.node_id:
+            return False
+        existing = self.connections.get(peer_id)
+        if existing is not None and existing is not websocket:
+            preferred_outbound = self.node_id < peer_id
+            if self._outbound.get(peer_id) == preferred_outbound or outbound != preferred_outbound:
+                self.metrics.inc('connections.duplicates')
+                return False
+            self.metrics.inc('connections.duplicates')
+            self._drop_connection(peer_id, existing)
+            asyncio.ensure_future(existing.close())
+        self.peers[peer_id] = info
+        self.peer_features[peer_id] = set(features)
+        if cipher is not None:
+            self.peer_ciphers[peer_id] = cipher
+        self._add_connection(peer_id, websocket, outbound)
+        self.peer_codecs[peer_id] = get_codec(codec)
+        if compression:
+            self.peer_compression[peer_id] = self.compression
+        self.topology.add_node(peer_id, {'node_type': info.node_type})
+        asyncio.ensure_future(self._on_neighbor_added(peer_id))
+        return True
 
     async def _handle_peer_messages(self, websocket, peer_id):
         try:
-            async for msg in websocket:
-                await self._handle_message(json.loads(msg), peer_id)
+            await self._read_frames(websocket, peer_id)
         finally:
-            self.connections.pop(peer_id, None)
+            self._drop_connection(peer_id, websocket)
 
-    async def send_message(self, recipient_id: str, message_type: str, payload: Dict[str, Any]):
+    async def _read_frames(self, websocket, peer_id):
+        compression = self.peer_compression.get(peer_id)
+        cipher = self.peer_ciphers.get(peer_id)
+        async for frame in websocket:
+            if cipher is not None:
+                try:
+                    if isinstance(frame, str):
+                        raise ValueError("plaintext frame on an encrypted link")
+                    frame = await self.link_security.open(cipher, frame)
+                except (InvalidTag, ValueError) as exc:
+                    self.metrics.inc('encryption.rejected')
+                    self.logger.warning(f"Closing link to {peer_id}: {exc!r}")
+                    await websocket.close()
+                    return
+            try:
+                messages = list(decode_frame(frame, compression))
+            except Exception as exc:  # corrupt record, bad compressed data, unknown codec...
+                self.metrics.inc('frames.rejected')
+                self.logger.warning(f"Dropping undecodable frame from {peer_id}: {exc!r}")
+                continue
+            for data in messages:
+                await self._handle_message(data, peer_id)
+
+    def _add_connection(self, peer_id: str, websocket, outbound: bool):
+        cipher = self.peer_ciphers.get(peer_id)
+        queue = PeerSendQueue(
+            peer_id,
+            websocket,
+            max_size=self.send_queue_size,
+            overflow=self.send_queue_overflow,
+            max_batch_bytes=self.coalesce_bytes,
+            metrics=self.metrics,
+            seal=functools.partial(self.link_security.seal, cipher) if cipher is not None else None,
+        )
+        self.connections[peer_id] = websocket
+        self._outbound[peer_id] = outbound
+        self.send_queues[peer_id] = queue
+        queue.start()
+
+    def _drop_connection(self, peer_id: str, websocket=None):
+        if websocket is not None and self.connections.get(peer_id) is not websocket:
+            return  # an older, already replaced link closed
+        self.connections.pop(peer_id, None)
+        self._outbound.pop(peer_id, None)
+        self.peer_codecs.pop(peer_id, None)
+        self.peer_compression.pop(peer_id, None)
+        self.peer_ciphers.pop(peer_id, None)
+        self.peer_features.pop(peer_id, None)
+        info = self.peers.get(peer_id)
+        if info is not None:
+            info.status = 'offline'
+            if self.running:
+                asyncio.ensure_future(self._announce_link_state())
+        queue = self.send_queues.pop(peer_id, None)
+        if queue is not None:
+            asyncio.ensure_future(queue.close())
+        for correlation_id in list(self._pending_by_peer.get(peer_id, ())):
+            self.metrics.inc('rpc.disconnects')
+            self._fail_request(correlation_id, ConnectionError(f"{peer_id} disconnected"))
+
+    async def close_connection(self, peer_id: str):
+        """Close the link to ``peer_id``; its reader then unregisters it."""
+        ws = self.connections.get(peer_id)
+        if ws is None:
+            return
+        self._drop_connection(peer_id, ws)
+        await ws.close()
+
+    async def _enqueue(self, peer_id: str, frame: Frame) -> bool:
+        """Hand ``frame`` to the writer of ``peer_id``; ``False`` if rejected."""
+        queue = self.send_queues.get(peer_id)
+        if queue is None:
+            return False
+        return await queue.put(frame)
+
+    def send_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return depth, drop and batching counters for every peer queue."""
+        return {peer_id: queue.stats() for peer_id, queue in self.send_queues.items()}
+
+    def _codec_for(self, peer_id: str) -> Codec:
+        return self.peer_codecs.get(peer_id) or get_codec('json')
+
+    def _encode_for(self, peer_id: str, data: Dict[str, Any]) -> Frame:
+        codec = self._codec_for(peer_id)
+        compression = self.peer_compression.get(peer_id)
+        if peer_id in self.peer_ciphers:
+            # Sealed frames are opaque bytes, so even JSON travels as records.
+            return encode_record(codec, data, compression=compression)
+        return encode_frame(codec, data, compression)
+
+    async def _send_data(self, peer_id: str, data: Dict[str, Any]) -> bool:
+        return await self._enqueue(peer_id, self._encode_for(peer_id, data))
+
+    def compression_stats(self) -> Dict[str, int]:
+        """Return bytes saved and CPU time spent on record compression."""
+        return {name[len('compression.'):]: value for name, value in self.metrics.counters.items()
+                if name.startswith('compression.')}
+
+    def _new_message(self, recipient_id: str, message_type: str, payload: Dict[str, Any],
+                     correlation_id: Optional[str] = None) -> NetworkMessage:
+        return NetworkMessage(
+            message_id=str(uuid.uuid4()),
+            sender_id=self.node_id,
+            recipient_id=recipient_id,
+            message_type=message_type,
+            payload=payload,
+            timestamp=datetime.now(),
+            ttl=self.max_hops,
+            correlation_id=correlation_id,
+        )
+
+    def _route(self, recipient_id: str) -> Optional[str]:
+        """Return the connection to use for reaching ``recipient_id``."""
         if recipient_id in self.connections:
-            msg = NetworkMessage(
-                message_id=str(uuid.uuid4()),
-                sender_id=self.node_id,
-                recipient_id=recipient_id,
-                message_type=message_type,
-                payload=payload,
-                timestamp=datetime.now(),
-            )
-            await self.connections[recipient_id].send(json.dumps({'type': 'network_message', 'message': asdict(msg)}))
+            return recipient_id
+        next_hop = self.topology.next_hop(self.node_id, recipient_id)
+        if next_hop in self.connections:
+            return next_hop
+        return None
+
+    async def _send_network_message(self, peer_id: str, msg: NetworkMessage) -> bool:
+        """Send ``msg`` towards ``peer_id``, via other nodes if not a neighbour."""
+        route = self._route(peer_id)
+        if route is None:
+            self.metrics.inc('routing.unroutable')
+            return False
+        self.seen_messages.add(msg.message_id)
+        return await self._send_data(route, {'type': 'network_message', 'message': message_to_dict(msg)})
+
+    async def send_message(self, recipient_id: str, message_type: str, payload: Dict[str, Any]):
+        """Send a message to ``recipient_id``, routing through the mesh if needed."""
+        await self._send_network_message(recipient_id, self._new_message(recipient_id, message_type, payload))
+
+    async def request(self, peer_id: str, message_type: str, payload: Dict[str, Any],
+                      timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Send a request to ``peer_id`` and return the payload of its reply.
+
+        Replies are matched by correlation id, so any number of requests can
+        be outstanding at once.  Raises :class:`asyncio.TimeoutError` when no
+        reply arrives within ``timeout`` (default ``request_timeout``) and
+        :class:`ConnectionError` if the peer is or becomes unreachable.
+        """
+        msg = self._new_message(peer_id, message_type, payload)
+        future = asyncio.get_event_loop().create_future()
+        self._pending[msg.message_id] = (future, peer_id, message_type, time.perf_counter())
+        self._pending_by_peer.setdefault(peer_id, set()).add(msg.message_id)
+        try:
+            if not await self._send_network_message(peer_id, msg):
+                raise ConnectionError(f"{peer_id} is not connected")
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.request_timeout)
+        except asyncio.TimeoutError:
+            self.metrics.inc('rpc.timeouts')
+            raise
+        finally:
+            self._forget_request(msg.message_id)
+
+    async def reply(self, message: NetworkMessage, message_type: str, payload: Dict[str, Any]) -> bool:
+        """Answer ``message``, falling back to the link it arrived on."""
+        response = self._new_message(message.sender_id, message_type, payload, correlation_id=message.message_id)
+        if self._route(message.sender_id) is None and message.received_from in self.connections:
+            return await self._send_data(message.received_from,
+                                         {'type': 'network_message', 'message': message_to_dict(response)})
+        return await self._send_network_message(message.sender_id, response)
+
+    def register_request_handler(self, message_type: str, handler: Callable,
+                                 response_type: Optional[str] = None, **dispatch):
+        """Register ``handler`` whose return value is sent back as the reply.
+
+        The reply type defaults to ``<message_type>_response``; ``dispatch``
+        options are passed to :meth:`register_message_handler`.
+        """
+        response_type = response_type or f"{message_type}_response"
+
+        async def respond(message: NetworkMessage):
+            result = handler(message)
+            if asyncio.iscoroutine(result):
+                result = await result
+            await self.reply(message, response_type, result if result is not None else {})
+
+        self.register_message_handler(message_type, respond, **dispatch)
 
-    async def broadcast_message(self, message_type: str, payload: Dict[str, Any]):
-        for peer in list(self.connections.keys()):
-            await self.send_message(peer, message_type, payload)
+    async def send_stream(self, peer_id: str, source: Source, metadata: Optional[Dict[str, Any]] = None,
+                          stream_id: Optional[str] = None) -> str:
+        """Send a large payload or file to a neighbour in flow-controlled chunks.
+
+        See :class:`~enhanced_network.core.streaming.StreamManager`; calling
+        again with the same source after a reconnect resumes the transfer.
+        """
+        return await self.streams.send(peer_id, source, metadata, stream_id)
+
+    def register_stream_handler(self, handler: Callable):
+        """Call ``handler(stream)`` for every stream received in full."""
+        self.streams.on_complete(handler)
+
+    def rpc_stats(self) -> Dict[str, Any]:
+        """Return in-flight count and latency percentiles per request type."""
+        return {
+            'in_flight': len(self._pending),
+            'timeouts': self.metrics.counters.get('rpc.timeouts', 0),
+            'disconnects': self.metrics.counters.get('rpc.disconnects', 0),
+            'latency': {
+                name[len('rpc.latency.'):]: histogram.summary()
+                for name, histogram in self.metrics.histograms.items()
+                if name.startswith('rpc.latency.')
+            },
+        }
+
+    def _resolve_request(self, message: NetworkMessage) -> bool:
+        entry = self._pending.get(message.correlation_id)
+        if entry is None:
+            return False
+        future, _peer_id, message_type, started = entry
+        if not future.done():
+            future.set_result(message.payload)
+        self.metrics.observe(f"rpc.latency.{message_type}", time.perf_counter() - started)
+        self._forget_request(message.correlation_id)
+        return True
+
+    def _fail_request(self, correlation_id: str, exc: Exception):
+        entry = self._pending.get(correlation_id)
+        if entry is not None and not entry[0].done():
+            entry[0].set_exception(exc)
+        self._forget_request(correlation_id)
+
+    def _forget_request(self, correlation_id: str):
+        entry = self._pending.pop(correlation_id, None)
+        if entry is not None:
+            waiting = self._pending_by_peer.get(entry[1])
+            if waiting is not None:
+                waiting.discard(correlation_id)
+                if not waiting:
+                    del self._pending_by_peer[entry[1]]
+
+    async def broadcast_message(self, message_type: str, payload: Dict[str, Any]) -> int:
+        """Send one message to every connected peer and return the delivery count.
+
+        In ``gossip`` broadcast mode the message reaches every node in the
+        mesh instead, and the count is the number of peers pushed to.
+        """
+        if self.gossip:
+            return await self.gossip.publish(message_type, payload)
+        msg = self._new_message(BROADCAST, message_type, payload)
+        self.seen_messages.add(msg.message_id)
+        return await self._fan_out(msg, list(self.connections.keys()))
+
+    async def _fan_out(self, msg: NetworkMessage, peers: List[str]) -> int:
+        """Hand ``msg`` to the send queues of ``peers`` concurrently.
+
+        The message is encoded once per codec and compression setting in use
+        and the resulting frame is shared by all recipients.  At most
+        ``broadcast_concurrency`` hand-offs run at a time and each is bounded
+        by ``send_timeout`` so a peer whose queue is full cannot hold up the
+        others.
+        """
+        if not peers:
+            return 0
+        data = {'type': 'network_message', 'message': message_to_dict(msg)}
+        frames: Dict[Tuple[str, bool, bool], Frame] = {}
+        semaphore = asyncio.Semaphore(self.broadcast_concurrency)
+
+        async def deliver(peer_id: str):
+            key = (self._codec_for(peer_id).name, peer_id in self.peer_compression, peer_id in self.peer_ciphers)
+            frame = frames.get(key)
+            if frame is None:
+                frame = frames[key] = self._encode_for(peer_id, data)
+            async with semaphore:
+                if not await asyncio.wait_for(self._enqueue(peer_id, frame), self.send_timeout):
+                    raise ConnectionError(f"{peer_id} is not accepting messages")
+
+        results = await asyncio.gather(*(deliver(p) for p in peers), return_exceptions=True)
+        delivered = 0
+        for peer_id, result in zip(peers, results):
+            if isinstance(result, BaseException):
+                self.logger.warning(f"Sending {msg.message_type} to {peer_id} failed: {result!r}")
+            else:
+                delivered += 1
+        return delivered
+
+    async def _forward(self, msg: NetworkMessage) -> None:
+        """Relay ``msg`` one hop closer to its recipient."""
+        msg.ttl -= 1
+        if msg.ttl <= 0:
+            self.metrics.inc('routing.ttl_expired')
+            return
+        route = self._route(msg.recipient_id)
+        if route is None or route == msg.received_from:
+            self.metrics.inc('routing.unroutable')
+            return
+        self.metrics.inc('routing.forwarded')
+        await self._send_data(route, {'type': 'network_message', 'message': message_to_dict(msg)})
 
     async def _handle_message(self, data: Dict[str, Any], sender_id: str):
+        info = self.peers.get(sender_id)
+        if info is not None:
+            info.last_seen = datetime.now()
         m_type = data.get('type')
         if m_type == 'network_message':
-            nm = NetworkMessage(**data['message'])
+            nm = message_from_dict(data['message'])
+            nm.received_from = sender_id
+            if not self.seen_messages.add(nm.message_id):
+                self.metrics.inc('routing.duplicates')
+                return
+            # Only messages addressed to this node are handled here; one for a
+            # node not yet in the topology (link state may still be spreading)
+            # must not be answered by us.  Legacy peers cannot address by node
+            # id, so what they send is ours unless it names a known node.
+            recipient = nm.recipient_id
+            legacy = sender_id not in self.peers and recipient not in self.topology.links
+            if recipient not in (self.node_id, BROADCAST) and not legacy:
+                await self._forward(nm)
+                return
+            if nm.correlation_id is not None and self._resolve_request(nm):
+                return
             handler = self.message_handlers.get(nm.message_type)
             if handler:
-                await handler(nm)
+                await self.dispatcher.dispatch(nm.message_type, handler, (nm,), sender_id)
         elif m_type in self.message_handlers:
             await self.message_handlers[m_type](data, sender_id)
 
+    async def _on_neighbor_added(self, peer_id: str):
+        # Bring the new neighbour up to date, then tell everyone about the link.
+        for origin, (seq, neighbors) in list(self._link_states.items()):
+            msg = self._new_message(BROADCAST, 'link_state', {'origin': origin, 'seq': seq, 'neighbors': neighbors})
+            self.seen_messages.add(msg.message_id)
+            await self._fan_out(msg, [peer_id])
+        await self._announce_link_state()
+        if self.dht:
+            await self.dht.add_contact(peer_id)
+        if self.service_sync:
+            await self.service_sync.send_snapshot(peer_id)
+
+    async def _announce_link_state(self):
+        """Flood this node's current neighbour set through the mesh."""
+        self._link_state_seq += 1
+        neighbors = list(self.connections.keys())
+        self.topology.set_neighbors(self.node_id, neighbors)
+        msg = self._new_message(BROADCAST, 'link_state', {
+            'origin': self.node_id,
+            'seq': self._link_state_seq,
+            'neighbors': neighbors,
+            'rtt': {peer: self.supervisor.rtt[peer] for peer in neighbors if peer in self.supervisor.rtt},
+        })
+        self.seen_messages.add(msg.message_id)
+        await self._fan_out(msg, neighbors)
+
+    async def _handle_link_state(self, message: NetworkMessage):
+        origin = message.payload['origin']
+        seq = message.payload['seq']
+        if origin == self.node_id:
+            return
+        known = self._link_states.get(origin)
+        if known is not None and known[0] >= seq:
+            return
+        self._link_states[origin] = (seq, list(message.payload['neighbors']))
+        self.topology.add_node(origin)
+        self.topology.set_neighbors(origin, message.payload['neighbors'])
+        for peer, rtt in message.payload.get('rtt', {}).items():
+            self.topology.update_link(origin, peer, rtt=rtt)
+        # Only this node's own announcements describe its links.
+        self.topology.set_neighbors(self.node_id, self.connections.keys())
+        message.ttl -= 1
+        if message.ttl > 0:
+            peers = [p for p in self.connections if p not in (message.received_from, origin)]
+            await self._fan_out(message, peers)
+
+    async def _handle_heartbeat(self, message: NetworkMessage) -> Dict[str, Any]:
+        return {'time': time.time()}
+
     async def _handle_peer_discovery(self, message: NetworkMessage):
-        await self.send_message(message.sender_id, 'peer_discovery_response', {
+        await self.reply(message, 'peer_discovery_response', {
             'node_id': self.node_id,
             'endpoints': [f"{socket.gethostname()}:{self.listen_port}"]
         })
 
-    def register_message_handler(self, message_type: str, handler: Callable):
+    def register_message_handler(self, message_type: str, handler: Callable, mode: Optional[str] = None,
+                                 concurrency: int = 16, ordering: Optional[str] = None):
+        """Register ``handler`` for ``message_type``.
+
+        Passing ``mode`` (``inline``, ``task``, ``thread`` or ``process``)
+        also sets the :class:`DispatchPolicy` for that type; ``thread`` and
+        ``process`` handlers must be plain functions.
+        """
         self.message_handlers[message_type] = handler
+        if mode is not None:
+            self.dispatcher.configure(message_type, DispatchPolicy(mode, concurrency, ordering))
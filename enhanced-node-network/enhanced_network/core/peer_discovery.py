@@ -1,10 +1,32 @@
 """Utility for locating other nodes on the network."""
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from ..discovery.multicast import MulticastDiscovery
+
 
 class PeerDiscovery:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], local: Optional[MulticastDiscovery] = None):
         self.config = config
+        # Optional LAN backend whose peers are merged into discover().
+        self.local = local
 
-    async def discover(self) -> list[str]:
-        """Return peers from the configured ``bootstrap_nodes`` list."""
+    async def start(self) -> None:
+        if self.local is not None:
+            await self.local.start()
+
+    async def stop(self) -> None:
+        if self.local is not None:
+            await self.local.stop()
+
+    def bootstrap_nodes(self) -> List[str]:
         return list(self.config.get("bootstrap_nodes", []))
+
+    def local_peers(self) -> List[Dict[str, str]]:
+        """Return peers found on the LAN as ``{"node_id", "address"}`` dicts."""
+        return self.local.discovered() if self.local is not None else []
+
+    async def discover(self) -> list[str]:
+        """Return peers from the configured ``bootstrap_nodes`` list and the LAN."""
+        peers = self.bootstrap_nodes()
+        peers.extend(peer["address"] for peer in self.local_peers())
+        return list(dict.fromkeys(peers))
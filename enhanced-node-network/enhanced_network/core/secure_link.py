@@ -0,0 +1,175 @@
+"""Authenticated key exchange and frame sealing for encrypted mesh links."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+
+from .crypto_utils import REKEY_AFTER, SessionCipher, derive_key
+from ..security.authentication import Authenticator
+from ..utils.metrics import Metrics
+
+_RAW = dict(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
+
+
+class LinkSecurity:
+    """Key agreement and AES-GCM sealing for the links of one node.
+
+    Each connection runs an ephemeral X25519 exchange inside the MeshNode
+    handshake.  Both sides then prove their identity over a hash of the
+    exchange: with an HMAC keyed by their token in ``authenticator``, or with
+    a signature by ``signing_key`` that the peer checks against our Ed25519
+    key pinned in its ``trusted_keys``.  The key a peer advertises in
+    ``NodeInfo.public_key`` is only believed with ``trust_on_first_use``,
+    which pins it on the first successful handshake (in memory) and rejects
+    a different key for that node id afterwards.  Every frame on the link is
+    then sealed with a :class:`~enhanced_network.core.crypto_utils.SessionCipher`.
+
+    Frames of ``offload_threshold`` bytes or more are sealed and opened on a
+    thread pool so the event loop can keep serving other links.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        authenticator: Optional[Authenticator] = None,
+        signing_key: Optional[str] = None,
+        trusted_keys: Optional[Dict[str, str]] = None,
+        trust_on_first_use: bool = False,
+        required: bool = False,
+        offload_threshold: int = 64 * 1024,
+        workers: Optional[int] = None,
+        rekey_after: int = REKEY_AFTER,
+        metrics: Optional[Metrics] = None,
+    ):
+        if authenticator is None and signing_key is None:
+            raise ValueError("encrypted links need an authenticator or a signing key")
+        if authenticator is None and not trusted_keys and not trust_on_first_use:
+            # A self-advertised key proves nothing: anyone can claim a node id.
+            raise ValueError("signed links need trusted_keys or trust_on_first_use")
+        if isinstance(authenticator, dict):
+            authenticator = Authenticator(authenticator)
+        self.node_id = node_id
+        self.authenticator = authenticator
+        self.signing_key = Ed25519PrivateKey.from_private_bytes(bytes.fromhex(signing_key)) if signing_key else None
+        self.trusted_keys = dict(trusted_keys or {})
+        self.trust_on_first_use = trust_on_first_use
+        self.required = required
+        self.offload_threshold = offload_threshold
+        self.rekey_after = rekey_after
+        self.metrics = metrics or Metrics()
+        self._workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def public_key(self) -> str:
+        """Hex Ed25519 public key to advertise, or ``""`` without a signing key."""
+        if self.signing_key is None:
+            return ""
+        return self.signing_key.public_key().public_bytes(**_RAW).hex()
+
+    def exchange(self, initiator: bool) -> "KeyExchange":
+        return KeyExchange(self, initiator)
+
+    def _prove(self, message: bytes) -> Dict[str, str]:
+        if self.authenticator is not None:
+            mac = self.authenticator.sign(self.node_id, message)
+            if mac is not None:
+                return {"method": "token", "mac": mac}
+        if self.signing_key is not None:
+            return {"method": "ed25519", "signature": self.signing_key.sign(message).hex()}
+        raise ValueError(f"no token for {self.node_id} and no signing key")
+
+    def _check(self, peer_id: str, peer_key: str, message: bytes, proof: Dict[str, str]) -> bool:
+        method = proof.get("method")
+        if method == "token" and self.authenticator is not None:
+            return self.authenticator.verify(peer_id, message, proof.get("mac", ""))
+        if method == "ed25519":
+            key = self.trusted_keys.get(peer_id)
+            first_use = key is None and self.trust_on_first_use
+            if first_use:
+                key = peer_key
+            if not key:
+                return False
+            try:
+                Ed25519PublicKey.from_public_bytes(bytes.fromhex(key)).verify(
+                    bytes.fromhex(proof.get("signature", "")), message)
+            except (InvalidSignature, ValueError):
+                return False
+            if first_use:
+                self.trusted_keys[peer_id] = key
+                self.metrics.inc("encryption.keys_pinned")
+            return True
+        return False
+
+    async def _run(self, func, data: bytes) -> bytes:
+        if len(data) < self.offload_threshold:
+            return func(data)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix="link-crypto")
+        self.metrics.inc("encryption.offloaded")
+        return await asyncio.get_event_loop().run_in_executor(self._executor, func, data)
+
+    async def seal(self, cipher: SessionCipher, frame: bytes) -> bytes:
+        self.metrics.inc("encryption.sealed_bytes", len(frame))
+        return await self._run(cipher.encrypt, frame)
+
+    async def open(self, cipher: SessionCipher, frame: bytes) -> bytes:
+        return await self._run(cipher.decrypt, frame)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+class KeyExchange:
+    """One side of the handshake key agreement for a single connection."""
+
+    def __init__(self, security: LinkSecurity, initiator: bool):
+        self.security = security
+        self.initiator = initiator
+        self._private = X25519PrivateKey.generate()
+        self.public = self._private.public_key().public_bytes(**_RAW)
+        self._transcript = b""
+        self._shared = b""
+
+    def offer(self) -> Dict[str, Any]:
+        return {"kex": "x25519", "public": self.public.hex()}
+
+    def complete(self, peer_id: str, peer_public: str) -> None:
+        """Derive the shared secret once the peer's ephemeral key is known."""
+        theirs = bytes.fromhex(peer_public)
+        self._shared = self._private.exchange(X25519PublicKey.from_public_bytes(theirs))
+        local = self.security.node_id
+        ids = (local, peer_id) if self.initiator else (peer_id, local)
+        keys = (self.public, theirs) if self.initiator else (theirs, self.public)
+        self._transcript = hashlib.sha256(b"|".join([
+            b"enhanced-network link v1", ids[0].encode(), ids[1].encode(), keys[0], keys[1],
+        ])).digest()
+
+    def _role_message(self, initiator: bool) -> bytes:
+        return self._transcript + (b"initiator" if initiator else b"responder")
+
+    def proof(self) -> Dict[str, str]:
+        return self.security._prove(self._role_message(self.initiator))
+
+    def verify(self, peer_id: str, peer_key: str, proof: Optional[Dict[str, str]]) -> bool:
+        ok = bool(proof) and self.security._check(peer_id, peer_key, self._role_message(not self.initiator), proof)
+        if not ok:
+            self.security.metrics.inc("encryption.auth_failures")
+        return ok
+
+    def session(self) -> SessionCipher:
+        outbound = derive_key(self._shared, b"initiator to responder", salt=self._transcript)
+        inbound = derive_key(self._shared, b"responder to initiator", salt=self._transcript)
+        if not self.initiator:
+            outbound, inbound = inbound, outbound
+        return SessionCipher(outbound, inbound, rekey_after=self.security.rekey_after)
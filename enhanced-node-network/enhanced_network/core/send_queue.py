@@ -0,0 +1,158 @@
+"""Bounded per-peer outbound queues with a dedicated writer task."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from ..utils.metrics import Metrics
+from ..utils.serialization import Frame
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+OVERFLOW_POLICIES = (BLOCK, DROP_OLDEST, DISCONNECT)
+
+logger = logging.getLogger("enhanced_network.send_queue")
+
+
+class PeerSendQueue:
+    """Queue frames for one websocket and write them from a background task.
+
+    Callers only wait for room in the queue, never for the network.  When the
+    queue is full ``overflow`` decides what happens: ``block`` waits for the
+    writer to catch up, ``drop_oldest`` discards the oldest queued frame and
+    ``disconnect`` closes the connection.  Consecutive binary frames are
+    coalesced into one websocket frame of at most ``max_batch_bytes``; this is
+    safe because binary frames are sequences of length-prefixed records.
+    If ``seal`` is given every outgoing frame, after coalescing, is passed
+    through it first (used to encrypt a whole batch at once).
+    """
+
+    def __init__(
+        self,
+        peer_id: str,
+        websocket,
+        max_size: int = 1024,
+        overflow: str = BLOCK,
+        max_batch_bytes: int = 64 * 1024,
+        metrics: Optional[Metrics] = None,
+        seal: Optional[Callable[[bytes], Awaitable[bytes]]] = None,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy {overflow!r}")
+        self.peer_id = peer_id
+        self.websocket = websocket
+        self.max_size = max_size
+        self.overflow = overflow
+        self.max_batch_bytes = max_batch_bytes
+        self.metrics = metrics or Metrics()
+        self.seal = seal
+        self.dropped = 0
+        self.frames_sent = 0
+        self.batches_sent = 0
+        self.closed = False
+        self._queue: Deque[Frame] = deque()
+        self._has_items = asyncio.Event()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def put(self, frame: Frame) -> bool:
+        """Queue ``frame`` and return ``False`` if it was not accepted."""
+        while not self.closed and len(self._queue) >= self.max_size:
+            if self.overflow == DROP_OLDEST:
+                self._queue.popleft()
+                self._record_drop()
+            elif self.overflow == DISCONNECT:
+                self._record_drop()
+                self.metrics.inc("send_queue.disconnects")
+                logger.warning("Send queue for %s overflowed, disconnecting", self.peer_id)
+                await self.close(close_websocket=True)
+            else:
+                self._has_space.clear()
+                await self._has_space.wait()
+        if self.closed:
+            return False
+        self._queue.append(frame)
+        self._has_items.set()
+        self._update_depth()
+        return True
+
+    async def close(self, close_websocket: bool = False) -> None:
+        """Stop the writer and discard queued frames."""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._has_space.set()
+        self.metrics.discard(f"send_queue.depth.{self.peer_id}")
+        writer = self._writer
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        if close_websocket:
+            await self.websocket.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "dropped": self.dropped,
+            "frames_sent": self.frames_sent,
+            "batches_sent": self.batches_sent,
+        }
+
+    def _record_drop(self) -> None:
+        self.dropped += 1
+        self.metrics.inc("send_queue.dropped")
+
+    def _update_depth(self) -> None:
+        self.metrics.set(f"send_queue.depth.{self.peer_id}", len(self._queue))
+
+    def _next_batch(self) -> Frame:
+        frame = self._queue.popleft()
+        if not isinstance(frame, bytes) or len(frame) >= self.max_batch_bytes:
+            return frame
+        parts = [frame]
+        size = len(frame)
+        while self._queue:
+            candidate = self._queue[0]
+            if not isinstance(candidate, bytes) or size + len(candidate) > self.max_batch_bytes:
+                break
+            parts.append(self._queue.popleft())
+            size += len(candidate)
+        self.frames_sent += len(parts) - 1
+        if len(parts) > 1:
+            self.metrics.inc("send_queue.coalesced", len(parts) - 1)
+            return b"".join(parts)
+        return frame
+
+    async def _write_loop(self) -> None:
+        try:
+            while not self.closed:
+                if not self._queue:
+                    self._has_items.clear()
+                    await self._has_items.wait()
+                    continue
+                frame = self._next_batch()
+                self._has_space.set()
+                self._update_depth()
+                if self.seal is not None:
+                    frame = await self.seal(frame)
+                await self.websocket.send(frame)
+                self.frames_sent += 1
+                self.batches_sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as exc:  # connection errors end the writer
+            logger.info("Writer for %s stopped: %r", self.peer_id, exc)
+            await self.close(close_websocket=True)
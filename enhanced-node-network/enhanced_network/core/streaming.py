@@ -0,0 +1,360 @@
+"""Chunked, flow-controlled transfer of large payloads between neighbours."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from ..utils.serialization import RECORD_HEADER, Codec, register_codec
+
+logger = logging.getLogger("enhanced_network.streaming")
+
+# stream id (16 bytes), chunk index, sha256 of the chunk.
+CHUNK_HEADER = struct.Struct("!16sI32s")
+# Stream ids name files in the receiver's directory, so only this form is allowed.
+STREAM_ID = re.compile(r"[0-9a-f]{32}")
+
+Source = Union[bytes, bytearray, memoryview, str, os.PathLike]
+
+
+class StreamChunkCodec(Codec):
+    """Binary record holding one chunk of a stream.
+
+    Decoding returns a ``stream_chunk`` message whose ``data`` is a
+    :class:`memoryview` into the received frame, so chunks are not copied
+    before they reach the sink.
+    """
+
+    name = "stream_chunk"
+    codec_id = 16
+
+    def encode(self, obj: Dict[str, Any]) -> bytes:
+        return encode_chunk(obj["stream_id"], obj["index"], obj["data"])[RECORD_HEADER.size:]
+
+    def decode(self, data) -> Dict[str, Any]:
+        view = memoryview(data)
+        stream_id, index, digest = CHUNK_HEADER.unpack_from(view)
+        return {
+            "type": "stream_chunk",
+            "stream_id": stream_id.hex(),
+            "index": index,
+            "digest": digest,
+            "data": view[CHUNK_HEADER.size:],
+        }
+
+
+register_codec(StreamChunkCodec(), negotiable=False)
+
+
+def encode_chunk(stream_id: str, index: int, data) -> bytes:
+    """Build the record for one chunk with a single copy of ``data``."""
+    header = CHUNK_HEADER.pack(bytes.fromhex(stream_id), index, hashlib.sha256(data).digest())
+    record = RECORD_HEADER.pack(StreamChunkCodec.codec_id, 0, len(header) + len(data))
+    return b"".join((record, header, data))
+
+
+def _create_part(path: str, size: int):
+    fh = open(path, "wb")
+    fh.truncate(size)
+    return fh
+
+
+def _write_at(fh, offset: int, data) -> None:
+    fh.seek(offset)
+    fh.write(data)
+
+
+def _open_source(source: Source) -> Tuple[memoryview, Callable[[], None]]:
+    """Return a read-only view of ``source`` and a function releasing it."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                return memoryview(b""), lambda: None
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+
+        def release():
+            view.release()
+            mapped.close()
+
+        return view, release
+    view = memoryview(source).cast("B")
+    return view, view.release
+
+
+@dataclass
+class IncomingStream:
+    """Receiver-side state of a stream, kept across reconnects for resume."""
+
+    stream_id: str
+    sender_id: str
+    size: int
+    chunk_size: int
+    digest: str
+    metadata: Dict[str, Any]
+    window: int = 16
+    path: Optional[str] = None
+    data: Optional[bytearray] = None
+    next_index: int = 0
+    complete: bool = False
+    last_activity: float = field(default_factory=time.monotonic)
+    _file: Any = field(default=None, repr=False)
+    _hasher: Any = field(default_factory=hashlib.sha256, repr=False)
+
+    @property
+    def chunks(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    @property
+    def received(self) -> int:
+        return min(self.size, self.next_index * self.chunk_size)
+
+
+class _OutgoingStream:
+    def __init__(self, window: int):
+        self.acked = 0
+        self.window = window
+        self.resend_from: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.changed = asyncio.Event()
+
+
+class StreamManager:
+    """Send and receive large blobs as a sequence of chunk records.
+
+    A transfer starts with a ``stream_open`` request that tells the receiver
+    the size and whole-payload SHA-256 and returns how many chunks it already
+    has, so repeating :meth:`send` with the same ``stream_id`` after a
+    reconnect resumes where the last attempt stopped.  Chunks are sliced from
+    a :class:`memoryview` of the source (memory-mapped for files), carry their
+    own SHA-256 and travel as binary records on the direct link to the peer.
+    The sender keeps at most ``window`` unacknowledged chunks in flight and
+    the receiver acknowledges every ``window // 2`` chunks, so memory use on
+    both sides is bounded by ``window * chunk_size`` when the receiver writes
+    to ``directory``.  Without a directory payloads are assembled in memory
+    and limited to ``max_memory_size`` bytes; files are limited to
+    ``max_stream_size`` bytes.  File I/O runs in the default executor.
+    """
+
+    def __init__(self, node, chunk_size: int = 256 * 1024, window: int = 16, directory: Optional[str] = None,
+                 max_memory_size: int = 64 * 1024 * 1024, max_stream_size: int = 16 * 1024 ** 3,
+                 ack_timeout: float = 10.0, resume_timeout: float = 300.0):
+        self.node = node
+        self.chunk_size = chunk_size
+        self.window = window
+        self.directory = directory
+        self.max_memory_size = max_memory_size
+        self.max_stream_size = max_stream_size
+        self.ack_timeout = ack_timeout
+        self.resume_timeout = resume_timeout
+        self.incoming: Dict[str, IncomingStream] = {}
+        self._outgoing: Dict[str, _OutgoingStream] = {}
+        self._handlers: List[Callable] = []
+        node.message_handlers["stream_chunk"] = self._handle_chunk
+        node.register_message_handler("stream_ack", self._handle_ack)
+        node.register_request_handler("stream_open", self._handle_open)
+
+    def on_complete(self, handler: Callable) -> None:
+        """Call ``handler(stream)`` for every stream received in full."""
+        self._handlers.append(handler)
+
+    async def send(self, peer_id: str, source: Source, metadata: Optional[Dict[str, Any]] = None,
+                   stream_id: Optional[str] = None) -> str:
+        """Stream ``source`` to the neighbour ``peer_id`` and return the stream id.
+
+        ``source`` is a bytes-like object or a file path.  The default stream
+        id is derived from the content, so resending the same payload resumes
+        an interrupted transfer; an explicit ``stream_id`` must be 32
+        lowercase hex digits.  Raises :class:`ConnectionError` if the link
+        drops, :class:`asyncio.TimeoutError` if the peer stops acknowledging
+        and :class:`ValueError` if the peer refuses or fails verification.
+        """
+        if stream_id is not None and not STREAM_ID.fullmatch(stream_id):
+            raise ValueError(f"stream id must be 32 lowercase hex digits, not {stream_id!r}")
+        view, release = _open_source(source)
+        try:
+            hasher = hashlib.sha256()
+            for offset in range(0, len(view), self.chunk_size):
+                hasher.update(view[offset:offset + self.chunk_size])
+            digest = hasher.hexdigest()
+            stream_id = stream_id or digest[:32]
+            return await self._send(peer_id, view, digest, stream_id, metadata or {})
+        finally:
+            release()
+
+    async def _send(self, peer_id: str, view: memoryview, digest: str, stream_id: str,
+                    metadata: Dict[str, Any]) -> str:
+        reply = await self.node.request(peer_id, "stream_open", {
+            "stream_id": stream_id,
+            "size": len(view),
+            "chunk_size": self.chunk_size,
+            "digest": digest,
+            "metadata": metadata,
+            "window": self.window,
+        })
+        if "error" in reply:
+            raise ValueError(f"{peer_id} refused stream: {reply['error']}")
+        chunks = -(-len(view) // self.chunk_size)
+        state = self._outgoing[stream_id] = _OutgoingStream(reply.get("window", self.window))
+        state.acked = reply.get("next_index", 0)
+        if reply.get("complete"):
+            state.result = {"ok": True}
+        sent = state.acked
+        if state.acked:
+            self.node.metrics.inc("streams.resumed")
+        try:
+            while state.result is None:
+                if state.resend_from is not None:
+                    sent, state.resend_from = state.resend_from, None
+                while sent < chunks and sent < state.acked + state.window:
+                    start = sent * self.chunk_size
+                    frame = encode_chunk(stream_id, sent, view[start:start + self.chunk_size])
+                    if not await self.node._enqueue(peer_id, frame):
+                        raise ConnectionError(f"{peer_id} is not connected")
+                    self.node.metrics.inc("streams.bytes_sent", len(frame))
+                    sent += 1
+                state.changed.clear()
+                try:
+                    await asyncio.wait_for(state.changed.wait(), self.ack_timeout)
+                except asyncio.TimeoutError:
+                    if peer_id not in self.node.connections:
+                        raise ConnectionError(f"{peer_id} disconnected") from None
+                    raise
+        finally:
+            self._outgoing.pop(stream_id, None)
+        if not state.result.get("ok"):
+            raise ValueError(f"{peer_id} rejected stream {stream_id}: {state.result.get('error')}")
+        return stream_id
+
+    async def _handle_ack(self, message) -> None:
+        payload = message.payload
+        state = self._outgoing.get(payload.get("stream_id"))
+        if state is None:
+            return
+        state.acked = max(state.acked, payload["next_index"])
+        if payload.get("resend"):
+            state.acked = payload["next_index"]
+            state.resend_from = payload["next_index"]
+        if "ok" in payload:
+            state.result = payload
+        state.changed.set()
+
+    def forget(self, stream_id: str) -> None:
+        """Drop the receiver state of ``stream_id``, e.g. once its data is consumed."""
+        self._discard(stream_id)
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.resume_timeout
+        for stream_id, stream in list(self.incoming.items()):
+            if stream.last_activity < deadline:
+                self._discard(stream_id)
+
+    def _discard(self, stream_id: str) -> None:
+        stream = self.incoming.pop(stream_id, None)
+        if stream is None:
+            return
+        if stream._file is not None:
+            stream._file.close()
+        if stream.path and not stream.complete and os.path.exists(stream.path + ".part"):
+            os.remove(stream.path + ".part")
+
+    async def _handle_open(self, message) -> Dict[str, Any]:
+        self._expire()
+        payload = message.payload
+        stream_id = payload.get("stream_id")
+        if not isinstance(stream_id, str) or not STREAM_ID.fullmatch(stream_id):
+            return {"error": "invalid stream id"}
+        size, chunk_size = payload.get("size"), payload.get("chunk_size")
+        if not isinstance(size, int) or not isinstance(chunk_size, int) or size < 0 or chunk_size < 1:
+            return {"error": "invalid stream size"}
+        stream = self.incoming.get(stream_id)
+        if stream is not None and (stream.size, stream.digest, stream.chunk_size) != (
+                size, payload["digest"], chunk_size):
+            self._discard(stream_id)
+            stream = None
+        if stream is None:
+            if self.directory is None and size > self.max_memory_size:
+                return {"error": "stream too large for an in-memory sink"}
+            if size > self.max_stream_size:
+                return {"error": "stream too large"}
+            stream = IncomingStream(
+                stream_id=stream_id,
+                sender_id=message.sender_id,
+                size=size,
+                chunk_size=chunk_size,
+                digest=payload["digest"],
+                metadata=payload.get("metadata") or {},
+                window=min(self.window, payload.get("window", self.window)),
+            )
+            if self.directory is not None:
+                stream.path = os.path.join(self.directory, stream_id)
+                stream._file = await asyncio.get_event_loop().run_in_executor(
+                    None, _create_part, stream.path + ".part", stream.size)
+            else:
+                stream.data = bytearray(stream.size)
+            self.incoming[stream_id] = stream
+        elif stream.sender_id != message.sender_id:
+            # Same content from another peer: it takes over where the last one stopped.
+            stream.sender_id = message.sender_id
+            stream.window = min(self.window, payload.get("window", self.window))
+            self.node.metrics.inc("streams.handed_over")
+        stream.last_activity = time.monotonic()
+        if not stream.complete and stream.size == 0:
+            await self._finish(stream)
+        return {"next_index": stream.next_index, "window": stream.window, "complete": stream.complete}
+
+    async def _handle_chunk(self, data: Dict[str, Any], sender_id: str) -> None:
+        stream = self.incoming.get(data["stream_id"])
+        if stream is None or stream.complete or sender_id != stream.sender_id or data["index"] != stream.next_index:
+            return  # unknown, finished, not from its sender, or in flight before a resend
+        chunk = data["data"]
+        stream.last_activity = time.monotonic()
+        if hashlib.sha256(chunk).digest() != data["digest"]:
+            self.node.metrics.inc("streams.corrupt_chunks")
+            await self._ack(stream, resend=True)
+            return
+        offset = stream.next_index * stream.chunk_size
+        if stream._file is not None:
+            await asyncio.get_event_loop().run_in_executor(None, _write_at, stream._file, offset, chunk)
+            if self.incoming.get(stream.stream_id) is not stream:
+                return  # forgotten while the write was in flight
+        else:
+            stream.data[offset:offset + len(chunk)] = chunk
+        stream._hasher.update(chunk)
+        stream.next_index += 1
+        self.node.metrics.inc("streams.bytes_received", len(chunk))
+        if stream.next_index == stream.chunks:
+            await self._finish(stream)
+        elif stream.next_index % max(1, stream.window // 2) == 0:
+            await self._ack(stream)
+
+    async def _finish(self, stream: IncomingStream) -> None:
+        if stream._hasher.hexdigest() != stream.digest:
+            self.node.metrics.inc("streams.failed")
+            self._discard(stream.stream_id)
+            await self._ack(stream, ok=False, error="digest mismatch")
+            return
+        stream.complete = True
+        if stream._file is not None:
+            stream._file.close()
+            stream._file = None
+            os.replace(stream.path + ".part", stream.path)
+        self.node.metrics.inc("streams.completed")
+        await self._ack(stream, ok=True)
+        for handler in self._handlers:
+            result = handler(stream)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def _ack(self, stream: IncomingStream, resend: bool = False, **result) -> None:
+        payload = {"stream_id": stream.stream_id, "next_index": stream.next_index, "resend": resend}
+        payload.update(result)
+        await self.node.send_message(stream.sender_id, "stream_ack", payload)
@@ -2,25 +2,270 @@
 
 from __future__ import annotations
 
-from typing import Iterable, List
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - optional dependency
+    websockets = None
+
+logger = logging.getLogger("enhanced_network.bootstrap")
+
+_HOSTNAME = re.compile(r"^(?=.{1,253}$)[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+                       r"(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*$")
+
+Probe = Callable[[str, float], Awaitable[float]]
+
+
+def normalize_address(text: str) -> Optional[str]:
+    """Return ``text`` as a canonical ``host:port``, or ``None`` if it is not one.
+
+    Accepts an optional ``ws://`` prefix and bracketed IPv6 hosts.
+    """
+    text = text.strip()
+    if text.startswith("ws://"):
+        text = text[len("ws://"):].rstrip("/")
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit() or not 0 < int(port) < 65536:
+        return None
+    if host.startswith("[") and host.endswith("]"):
+        try:
+            ipaddress.IPv6Address(host[1:-1])
+        except ValueError:
+            return None
+    elif not _HOSTNAME.match(host):
+        return None
+    return f"{host.lower()}:{int(port)}"
 
 
 def load_bootstrap_peers(sources: Iterable[str]) -> List[str]:
     """Return a list of peer addresses from ``sources``.
 
-    ``sources`` may contain file paths or raw ``host:port`` strings.  The
-    implementation merely returns the items that look like addresses and ignores
-    missing files.  It is intentionally minimal.
+    ``sources`` may contain file paths or raw ``host:port`` strings.  Files
+    list one address per line; blank lines and ``#`` comments are skipped.
+    Invalid addresses are dropped with a warning, missing files are
+    ignored and duplicates are removed, keeping the first occurrence.
     """
 
     peers: List[str] = []
     for item in sources:
-        if ":" in item and "\n" not in item:
-            peers.append(item)
+        address = normalize_address(item) if "\n" not in item else None
+        if address is not None:
+            peers.append(address)
+            continue
+        try:
+            with open(item, "r", encoding="utf-8") as f:
+                lines = [line.split("#", 1)[0].strip() for line in f]
+        except OSError:
+            continue
+        for line in filter(None, lines):
+            address = normalize_address(line)
+            if address is None:
+                logger.warning("Ignoring invalid bootstrap address %r in %s", line, item)
+            else:
+                peers.append(address)
+    return list(dict.fromkeys(peers))
+
+
+@dataclass
+class PeerRecord:
+    """What the peer book remembers about one address."""
+
+    address: str
+    node_id: Optional[str] = None
+    latency: Optional[float] = None
+    failures: int = 0
+    last_seen: float = 0.0
+
+    @property
+    def score(self) -> float:
+        """Lower is better: smoothed latency, doubled for every recent failure."""
+        latency = self.latency if self.latency is not None else 1.0
+        return latency * 2 ** min(self.failures, 16)
+
+
+class PeerBook:
+    """Peers that worked before, persisted as JSON at ``path``.
+
+    Successful connections update an EWMA of the handshake latency and
+    reset the failure count; entries unseen for ``max_age`` seconds are
+    forgotten and at most ``max_entries`` of the best are kept.
+    """
+
+    def __init__(self, path: str, max_entries: int = 256, max_age: float = 7 * 24 * 3600.0,
+                 clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.clock = clock
+        self.records: Dict[str, PeerRecord] = {}
+        self.load()
+
+    def load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable peer book %s: %r", self.path, exc)
+            return
+        for entry in data.get("peers", []):
+            address = normalize_address(str(entry.get("address", "")))
+            if address is None:
+                continue
+            self.records[address] = PeerRecord(
+                address=address,
+                node_id=entry.get("node_id"),
+                latency=entry.get("latency"),
+                failures=int(entry.get("failures", 0)),
+                last_seen=float(entry.get("last_seen", 0.0)),
+            )
+        self.prune()
+
+    def save(self) -> None:
+        """Write the book atomically."""
+        self.prune()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".peers-", dir=directory)
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump({"version": 1, "peers": [asdict(r) for r in self.best()]}, fh, indent=1)
+        os.replace(tmp, self.path)
+
+    def prune(self) -> None:
+        cutoff = self.clock() - self.max_age
+        for address, record in list(self.records.items()):
+            if record.last_seen < cutoff:
+                del self.records[address]
+        for record in self.best()[self.max_entries:]:
+            del self.records[record.address]
+
+    def best(self, count: Optional[int] = None) -> List[PeerRecord]:
+        ranked = sorted(self.records.values(), key=lambda r: (r.score, -r.last_seen))
+        return ranked if count is None else ranked[:count]
+
+    def record_success(self, address: str, latency: float, node_id: Optional[str] = None) -> None:
+        record = self.records.setdefault(address, PeerRecord(address))
+        record.latency = latency if record.latency is None else 0.7 * record.latency + 0.3 * latency
+        record.failures = 0
+        record.last_seen = self.clock()
+        if node_id is not None:
+            record.node_id = node_id
+
+    def record_failure(self, address: str) -> None:
+        record = self.records.get(address)
+        if record is not None:
+            record.failures += 1
+
+
+async def websocket_probe(address: str, timeout: float) -> float:
+    """Open and close a WebSocket to ``address``; return the handshake latency."""
+    if websockets is None:
+        raise RuntimeError("websockets is required to probe peers")
+    started = time.perf_counter()
+    ws = await asyncio.wait_for(websockets.connect(f"ws://{address}", compression=None), timeout)
+    latency = time.perf_counter() - started
+    await ws.close()
+    return latency
+
+
+async def probe_peers(addresses: Iterable[str], deadline: float = 2.0,
+                      probe: Probe = websocket_probe) -> Tuple[List[Tuple[str, float]], List[str]]:
+    """Probe ``addresses`` concurrently for at most ``deadline`` seconds.
+
+    Returns the peers that answered as ``(address, latency)`` pairs, fastest
+    first, and the addresses that failed or did not answer in time.
+    """
+    addresses = list(dict.fromkeys(addresses))
+    if not addresses:
+        return [], []
+    tasks = {asyncio.ensure_future(probe(a, deadline)): a for a in addresses}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    reachable, failed = [], [tasks[t] for t in pending]
+    for task in done:
+        if task.exception() is None:
+            reachable.append((tasks[task], task.result()))
         else:
-            try:
-                with open(item, "r", encoding="utf-8") as f:
-                    peers.extend(line.strip() for line in f if ":" in line)
-            except OSError:
+            failed.append(tasks[task])
+    reachable.sort(key=lambda item: item[1])
+    return reachable, failed
+
+
+class Bootstrapper:
+    """Connect a node to its first peers.
+
+    With a peer book, the ``want`` best known peers are dialled at once, so
+    a warm restart needs a single round of handshakes.  If that leaves the
+    node short, the remaining candidates from ``sources`` (see
+    :func:`load_bootstrap_peers`) and the book are probed concurrently
+    within ``deadline`` and the fastest are dialled.  Outcomes are written
+    back to the book.
+    """
+
+    def __init__(self, node, sources: Iterable[str] = (), peer_book: Optional[str] = None, want: int = 4,
+                 deadline: float = 3.0, probe: Probe = websocket_probe):
+        self.node = node
+        self.sources = list(sources)
+        self.book = PeerBook(peer_book) if peer_book else None
+        self.want = want
+        self.deadline = deadline
+        self.probe = probe
+
+    async def run(self) -> List[str]:
+        """Bootstrap and return the node ids connected to."""
+        loop = asyncio.get_event_loop()
+        connected: List[str] = []
+        tried = set()
+        if self.book is not None:
+            warm = [r.address for r in self.book.best(self.want)]
+            tried.update(warm)
+            connected += await self._dial(warm)
+            self.node.metrics.inc("bootstrap.warm_connects", len(connected))
+        if len(connected) < self.want:
+            candidates = await loop.run_in_executor(None, load_bootstrap_peers, self.sources)
+            if self.book is not None:
+                candidates += [r.address for r in self.book.best()]
+            candidates = [a for a in dict.fromkeys(candidates) if a not in tried]
+            reachable, failed = await probe_peers(candidates, self.deadline, self.probe)
+            self.node.metrics.inc("bootstrap.probe_failures", len(failed))
+            if self.book is not None:
+                for address in failed:
+                    self.book.record_failure(address)
+            fastest = [a for a, _latency in reachable[:self.want - len(connected)]]
+            connected += await self._dial(fastest)
+        if self.book is not None:
+            await loop.run_in_executor(None, self.book.save)
+        return connected
+
+    async def _dial(self, addresses: List[str]) -> List[str]:
+        async def dial(address):
+            started = time.perf_counter()
+            node_id = await asyncio.wait_for(self.node.connect_to_peer(address), self.deadline)
+            return node_id, time.perf_counter() - started
+
+        results = await asyncio.gather(*(dial(a) for a in addresses), return_exceptions=True)
+        connected = []
+        for address, result in zip(addresses, results):
+            if isinstance(result, BaseException):
+                logger.debug("Bootstrap dial of %s failed: %r", address, result)
+                if self.book is not None:
+                    self.book.record_failure(address)
                 continue
-    return peers
+            node_id, latency = result
+            connected.append(node_id)
+            if self.book is not None:
+                self.book.record_success(address, latency, node_id)
+        return connected
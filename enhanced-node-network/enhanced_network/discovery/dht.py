@@ -1,8 +1,34 @@
-"""Minimal DHT interface for peer lookup."""
+"""Distributed hash tables for peer and service lookup.
+
+:class:`SimpleDHT` is a local dictionary kept for callers that only need the
+interface.  :class:`KademliaNode` implements the Kademlia XOR-metric DHT
+independently of the transport, :class:`MeshDHT` runs it over a
+:class:`~enhanced_network.core.mesh_node.MeshNode`, and
+:func:`simulate_lookups` runs it over an in-process network of virtual
+nodes.
+"""
 
 from __future__ import annotations
 
-from typing import Dict, Any
+import asyncio
+import bisect
+import hashlib
+import logging
+import math
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("enhanced_network.dht")
+
+ID_BITS = 160
+# Keys under which nodes publish their own NodeInfo.
+NODE_PREFIX = "node:"
+
+# transport(target_node_id, method, payload) -> reply payload
+Transport = Callable[[str, str, Dict[str, Any]], Awaitable[Dict[str, Any]]]
 
 
 class SimpleDHT:
@@ -16,3 +42,422 @@ class SimpleDHT:
 
     def get(self, key: str) -> Any | None:
         return self._store.get(key)
+
+
+def dht_id(name: str) -> int:
+    """Map a node id or key to a point in the 160-bit id space."""
+    return int.from_bytes(hashlib.sha1(name.encode()).digest(), "big")
+
+
+class RoutingTable:
+    """k-buckets of contacts ordered by XOR distance from ``own_id``.
+
+    Bucket ``i`` holds contacts whose distance has its highest set bit at
+    ``i``.  A full bucket keeps its long-lived contacts and parks newcomers in
+    a replacement cache of the same size, which refills the bucket when a
+    contact fails, so the table never holds more than ``2 * k * ID_BITS``
+    entries.
+    """
+
+    def __init__(self, own_name: str, k: int = 20):
+        self.own_name = own_name
+        self.own_id = dht_id(own_name)
+        self.k = k
+        self.buckets: List["OrderedDict[str, int]"] = [OrderedDict() for _ in range(ID_BITS)]
+        self.replacements: List["OrderedDict[str, int]"] = [OrderedDict() for _ in range(ID_BITS)]
+
+    def _bucket_index(self, contact_id: int) -> int:
+        return (self.own_id ^ contact_id).bit_length() - 1
+
+    def update(self, name: str, contact_id: Optional[int] = None) -> None:
+        """Record that ``name`` was heard from."""
+        if name == self.own_name:
+            return
+        contact_id = dht_id(name) if contact_id is None else contact_id
+        index = self._bucket_index(contact_id)
+        bucket = self.buckets[index]
+        if name in bucket:
+            bucket.move_to_end(name)
+        elif len(bucket) < self.k:
+            bucket[name] = contact_id
+        else:
+            cache = self.replacements[index]
+            cache[name] = contact_id
+            cache.move_to_end(name)
+            if len(cache) > self.k:
+                cache.popitem(last=False)
+
+    def remove(self, name: str) -> None:
+        """Drop an unresponsive contact, promoting a replacement if any."""
+        index = self._bucket_index(dht_id(name))
+        if self.buckets[index].pop(name, None) is not None and self.replacements[index]:
+            promoted, promoted_id = self.replacements[index].popitem()
+            self.buckets[index][promoted] = promoted_id
+        self.replacements[index].pop(name, None)
+
+    def closest(self, target: int, count: Optional[int] = None) -> List[str]:
+        """Return up to ``count`` (default ``k``) contacts closest to ``target``."""
+        contacts = [(cid ^ target, name) for bucket in self.buckets for name, cid in bucket.items()]
+        contacts.sort()
+        return [name for _distance, name in contacts[:count or self.k]]
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.buckets)
+
+    def __contains__(self, name: str) -> bool:
+        if name == self.own_name:
+            return False
+        return name in self.buckets[self._bucket_index(dht_id(name))]
+
+
+@dataclass
+class LookupResult:
+    """Outcome of an iterative lookup."""
+
+    contacts: List[str]
+    value: Any = None
+    found: bool = False
+    hops: int = 0
+    queries: int = 0
+
+
+@dataclass
+class _StoredValue:
+    value: Any
+    expires: float
+    refreshed: float
+    original: bool = False
+    ttl: float = field(default=0.0)
+
+
+class KademliaNode:
+    """Kademlia DHT logic for one node, independent of the transport.
+
+    Lookups are iterative: each hop queries the ``alpha`` closest contacts not
+    yet asked, in parallel, and merges the contacts they return, until the
+    ``k`` closest known contacts have all answered.  With populated tables
+    this converges in ``O(log N)`` hops.  Values are stored on the ``k``
+    nodes closest to the key, expire after their TTL, and are pushed to the
+    current closest nodes again every ``republish_interval`` seconds by their
+    publisher and by replicas that have not been refreshed since.  At most
+    ``max_values`` values are held; the ones closest to expiry go first.
+
+    Remote stores are kept for at most ``ttl`` seconds whatever they ask
+    for.  A ``node:<id>`` record is only accepted from ``<id>`` itself, so
+    it is refreshed by its publisher and never republished by replicas.
+
+    ``transport(node_id, method, payload)`` must deliver a call to the
+    remote node's :meth:`handle` and return its reply.
+    """
+
+    def __init__(self, name: str, transport: Transport, k: int = 20, alpha: int = 3,
+                 ttl: float = 3600.0, republish_interval: float = 3600.0, max_values: int = 65536,
+                 rpc_timeout: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.id = dht_id(name)
+        self.transport = transport
+        self.k = k
+        self.alpha = alpha
+        self.ttl = ttl
+        self.republish_interval = republish_interval
+        self.max_values = max_values
+        self.rpc_timeout = rpc_timeout
+        self.clock = clock
+        self.table = RoutingTable(name, k)
+        self.values: Dict[str, _StoredValue] = {}
+
+    # -- remote side -----------------------------------------------------
+
+    def handle(self, sender: str, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Answer a DHT call from ``sender``."""
+        self.table.update(sender)
+        if method == "ping":
+            return {}
+        if method == "find_node":
+            return {"nodes": self.table.closest(int(payload["target"], 16))}
+        if method == "find_value":
+            stored = self._lookup_local(payload["key"])
+            if stored is not None:
+                return {"value": stored.value}
+            return {"nodes": self.table.closest(dht_id(payload["key"]))}
+        if method == "store":
+            key = payload["key"]
+            if key.startswith(NODE_PREFIX) and key != NODE_PREFIX + sender:
+                logger.debug("Refusing %s's store of %s", sender, key)
+                return {"stored": False}
+            ttl = float(payload["ttl"])
+            if not ttl > 0:  # also rejects NaN
+                return {"stored": False}
+            self._store(key, payload["value"], min(ttl, self.ttl))
+            return {"stored": True}
+        raise ValueError(f"unknown DHT method {method!r}")
+
+    def _lookup_local(self, key: str) -> Optional[_StoredValue]:
+        stored = self.values.get(key)
+        if stored is not None and stored.expires <= self.clock():
+            del self.values[key]
+            return None
+        return stored
+
+    def _store(self, key: str, value: Any, ttl: float, original: bool = False) -> None:
+        now = self.clock()
+        existing = self.values.get(key)
+        self.values[key] = _StoredValue(value, now + ttl, now, original or bool(existing and existing.original), ttl)
+        if len(self.values) > self.max_values:
+            self.expire()
+        while len(self.values) > self.max_values:
+            victim = min((k for k in self.values if k != key), key=lambda k: self.values[k].expires)
+            del self.values[victim]
+
+    def expire(self) -> int:
+        """Drop expired values and return how many were removed."""
+        now = self.clock()
+        expired = [key for key, stored in self.values.items() if stored.expires <= now]
+        for key in expired:
+            del self.values[key]
+        return len(expired)
+
+    # -- local side ------------------------------------------------------
+
+    async def _call(self, contact: str, method: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        try:
+            reply = await asyncio.wait_for(self.transport(contact, method, payload), self.rpc_timeout)
+        except (asyncio.TimeoutError, ConnectionError, ValueError) as exc:
+            logger.debug("DHT %s to %s failed: %r", method, contact, exc)
+            self.table.remove(contact)
+            return None
+        self.table.update(contact)
+        return reply
+
+    async def lookup(self, target: int, key: Optional[str] = None) -> LookupResult:
+        """Find the ``k`` nodes closest to ``target``, or the value of ``key``."""
+        shortlist = {name: dht_id(name) ^ target for name in self.table.closest(target, self.k)}
+        queried = {self.name}
+        result = LookupResult(contacts=[])
+        method, payload = ("find_value", {"key": key}) if key is not None else (
+            "find_node", {"target": format(target, "x")})
+        best = min(shortlist.values(), default=None)
+        query_all = False
+        while True:
+            ranked = sorted(shortlist, key=shortlist.__getitem__)[:self.k]
+            pending = [name for name in ranked if name not in queried]
+            if not pending:
+                break
+            batch = pending if query_all else pending[:self.alpha]
+            queried.update(batch)
+            result.hops += 1
+            result.queries += len(batch)
+            replies = await asyncio.gather(*(self._call(name, method, payload) for name in batch))
+            for name, reply in zip(batch, replies):
+                if reply is None:
+                    shortlist.pop(name, None)
+                    continue
+                if "value" in reply:
+                    result.value, result.found = reply["value"], True
+                    result.contacts = sorted(shortlist, key=shortlist.__getitem__)[:self.k]
+                    return result
+                for contact in reply.get("nodes", []):
+                    if contact not in shortlist and contact != self.name:
+                        shortlist[contact] = dht_id(contact) ^ target
+            closest = min(shortlist.values(), default=None)
+            if query_all:
+                break
+            if best is not None and (closest is None or closest >= best):
+                # No progress: finish by asking every unqueried top-k contact.
+                query_all = True
+            best = closest
+        result.contacts = sorted(shortlist, key=shortlist.__getitem__)[:self.k]
+        return result
+
+    async def bootstrap(self, seeds: List[str]) -> int:
+        """Join the DHT through ``seeds`` and return the routing table size."""
+        for seed in seeds:
+            self.table.update(seed)
+        await self.lookup(self.id)
+        # Refresh the farther buckets so the table spans the whole id space.
+        for index in range(ID_BITS - 1, ID_BITS - 1 - min(ID_BITS, 8), -1):
+            if not self.table.buckets[index]:
+                await self.lookup(self.id ^ (1 << index))
+        return len(self.table)
+
+    async def put(self, key: str, value: Any, ttl: Optional[float] = None) -> int:
+        """Store ``value`` under ``key`` on the closest nodes; returns replica count."""
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl, original=True)
+        return await self._replicate(key, value, ttl)
+
+    async def _replicate(self, key: str, value: Any, ttl: float) -> int:
+        target = dht_id(key)
+        result = await self.lookup(target)
+        payload = {"key": key, "value": value, "ttl": ttl}
+        replies = await asyncio.gather(*(self._call(name, "store", payload) for name in result.contacts))
+        return sum(1 for reply in replies if reply is not None and reply.get("stored"))
+
+    async def get(self, key: str) -> Any:
+        """Return the value stored under ``key`` anywhere in the DHT, or ``None``."""
+        stored = self._lookup_local(key)
+        if stored is not None:
+            return stored.value
+        result = await self.lookup(dht_id(key), key=key)
+        return result.value if result.found else None
+
+    async def republish(self) -> int:
+        """Push values not refreshed for ``republish_interval`` to the closest nodes."""
+        self.expire()
+        now = self.clock()
+        count = 0
+        for key, stored in list(self.values.items()):
+            if stored.original:
+                if now - stored.refreshed < self.republish_interval:
+                    continue
+                stored.refreshed = now
+                stored.expires = now + stored.ttl
+                ttl = stored.ttl
+            else:
+                if now - stored.refreshed < self.republish_interval or key.startswith(NODE_PREFIX):
+                    continue
+                stored.refreshed = now
+                ttl = stored.expires - now
+            await self._replicate(key, stored.value, ttl)
+            count += 1
+        return count
+
+
+class MeshDHT(KademliaNode):
+    """:class:`KademliaNode` whose calls travel as MeshNode requests.
+
+    Calls are routed through the mesh, so contacts need not be neighbours.
+    Every new neighbour is added to the routing table; the first one makes
+    the node join the DHT and publish its ``NodeInfo`` under
+    ``node:<node_id>`` so other nodes can locate it.
+    """
+
+    def __init__(self, node, **options):
+        super().__init__(node.node_id, self._send, **options)
+        self.node = node
+        self.joined = False
+        self._task: Optional[asyncio.Task] = None
+        node.register_request_handler("dht", self._handle_request)
+
+    async def _send(self, contact: str, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.node.request(contact, "dht", {"method": method, "payload": payload},
+                                       timeout=self.rpc_timeout)
+
+    async def _handle_request(self, message) -> Dict[str, Any]:
+        return self.handle(message.sender_id, message.payload["method"], message.payload.get("payload", {}))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._maintenance_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def add_contact(self, peer_id: str) -> None:
+        """Learn about a neighbour, joining the DHT through the first one."""
+        self.table.update(peer_id)
+        if not self.joined:
+            self.joined = True
+            await self.join()
+
+    async def join(self) -> None:
+        from ..core.mesh_node import node_info_to_dict
+
+        await self.bootstrap(list(self.node.connections))
+        await self.put(NODE_PREFIX + self.name, node_info_to_dict(self.node.node_info()))
+
+    async def locate_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        """Return the published ``NodeInfo`` dictionary of ``node_id``."""
+        return await self.get(NODE_PREFIX + node_id)
+
+    async def _maintenance_loop(self) -> None:
+        interval = max(1.0, min(self.republish_interval, self.ttl) / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.republish()
+            except Exception as exc:  # keep maintaining on transient errors
+                logger.debug("DHT republish failed: %r", exc)
+
+
+def _populate_tables(nodes: Dict[str, KademliaNode], rng: random.Random) -> None:
+    """Fill every routing table as if the network had fully converged."""
+    ordered = sorted((node.id, name) for name, node in nodes.items())
+    ids = [node_id for node_id, _name in ordered]
+    for node in nodes.values():
+        for index in range(ID_BITS):
+            # Ids at distance [2**index, 2**(index+1)) share every bit above
+            # ``index`` with ours and differ at ``index``: one contiguous range.
+            low = ((node.id >> (index + 1)) << (index + 1)) | ((~node.id >> index & 1) << index)
+            start = bisect.bisect_left(ids, low)
+            end = bisect.bisect_left(ids, low + (1 << index))
+            if start == end:
+                continue
+            picks = range(start, end) if end - start <= node.k else rng.sample(range(start, end), node.k)
+            for pick in picks:
+                node.table.update(ordered[pick][1], ids[pick])
+
+
+def simulate_lookups(num_nodes: int = 1000, lookups: int = 100, k: int = 20, alpha: int = 3,
+                     max_latency: float = 0.02, seed: int = 0) -> Dict[str, Any]:
+    """Measure lookup hops and latency on an in-process network of virtual nodes.
+
+    Every virtual node gets a position in a unit square and one-way latency
+    is proportional to distance, up to ``max_latency`` seconds.  Routing
+    tables are filled as they would be after the network converged, a value
+    is stored under each of ``lookups`` random keys and then looked up from a
+    different random node, all lookups running concurrently.  Returns hop and
+    latency statistics and the success rate.
+    """
+
+    rng = random.Random(seed)
+    nodes: Dict[str, KademliaNode] = {}
+    positions: Dict[str, Tuple[float, float]] = {}
+
+    def transport_for(origin: str) -> Transport:
+        async def transport(target: str, method: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+            (x1, y1), (x2, y2) = positions[origin], positions[target]
+            await asyncio.sleep(2 * max_latency * math.hypot(x1 - x2, y1 - y2) / math.sqrt(2))
+            return nodes[target].handle(origin, method, payload)
+        return transport
+
+    for index in range(num_nodes):
+        name = f"sim-{index}"
+        positions[name] = (rng.random(), rng.random())
+        nodes[name] = KademliaNode(name, transport_for(name), k=k, alpha=alpha)
+    _populate_tables(nodes, rng)
+    names = list(nodes)
+
+    for index in range(lookups):
+        key = f"key-{index}"
+        target = dht_id(key)
+        closest = sorted(names, key=lambda name: nodes[name].id ^ target)[:k]
+        for name in closest:
+            nodes[name]._store(key, index, 3600.0)
+
+    async def timed_get(origin: str, key: str) -> Tuple[LookupResult, float]:
+        start = time.perf_counter()
+        result = await nodes[origin].lookup(dht_id(key), key=key)
+        return result, time.perf_counter() - start
+
+    async def run() -> List[Tuple[LookupResult, float]]:
+        return await asyncio.gather(*(timed_get(rng.choice(names), f"key-{i}") for i in range(lookups)))
+
+    results = asyncio.run(run())
+    hops = sorted(result.hops for result, _ in results)
+    latencies = sorted(elapsed for _, elapsed in results)
+    return {
+        "nodes": num_nodes,
+        "lookups": lookups,
+        "success_rate": sum(1 for result, _ in results if result.found) / lookups,
+        "mean_hops": sum(hops) / lookups,
+        "max_hops": hops[-1],
+        "mean_queries": sum(result.queries for result, _ in results) / lookups,
+        "p50_latency": latencies[lookups // 2],
+        "p99_latency": latencies[min(lookups - 1, int(lookups * 0.99))],
+        "log2_nodes": math.log2(num_nodes),
+    }
+
@@ -0,0 +1,150 @@
+"""Find peers on the local network with UDP multicast beacons."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import socket
+import struct
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("enhanced_network.multicast")
+
+DEFAULT_GROUP = "239.255.77.77"
+DEFAULT_PORT = 47777
+
+
+class _BeaconProtocol(asyncio.DatagramProtocol):
+    def __init__(self, owner: "MulticastDiscovery"):
+        self.owner = owner
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]) -> None:
+        self.owner._on_beacon(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        logger.debug("Multicast socket error: %r", exc)
+
+
+class MulticastDiscovery:
+    """Announce this node and collect announcements from the same LAN.
+
+    Every ``interval`` seconds (with jitter) a small JSON beacon carrying the
+    node id and its dialable ``address`` is sent to ``group:port``.  Hearing
+    a node for the first time triggers an early beacon so it learns about
+    this node without waiting a full interval, but beacons are never sent
+    more than once per ``min_interval`` seconds however many nodes join.
+    Peers that stay silent for ``expiry`` seconds (three intervals by
+    default) are forgotten.
+
+    ``interface`` is the local address multicast is sent and received on;
+    ``127.0.0.1`` keeps discovery on one host.
+    """
+
+    def __init__(self, node_id: str, address: str, group: str = DEFAULT_GROUP, port: int = DEFAULT_PORT,
+                 interface: str = "0.0.0.0", interval: float = 5.0, min_interval: float = 1.0,
+                 expiry: Optional[float] = None, hops: int = 1, clock: Callable[[], float] = time.monotonic):
+        self.node_id = node_id
+        self.address = address
+        self.group = group
+        self.port = port
+        self.interface = interface
+        self.interval = interval
+        self.min_interval = min_interval
+        self.expiry = expiry if expiry is not None else 3 * interval
+        self.hops = hops
+        self.clock = clock
+        # node id -> (address, last heard)
+        self.peers: Dict[str, Tuple[str, float]] = {}
+        self.beacons_sent = 0
+        self._last_beacon = float("-inf")
+        self._early_beacon: Optional[asyncio.TimerHandle] = None
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, "SO_REUSEPORT"):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(("", self.port))
+        interface = socket.inet_aton(self.interface)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, socket.inet_aton(self.group) + interface)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, interface)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, struct.pack("b", self.hops))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        sock.setblocking(False)
+        return sock
+
+    async def start(self) -> None:
+        """Join the group and start beaconing; raises :class:`OSError` if multicast is unavailable."""
+        if self._transport is not None:
+            return
+        loop = asyncio.get_event_loop()
+        self._transport, _protocol = await loop.create_datagram_endpoint(
+            lambda: _BeaconProtocol(self), sock=self._socket())
+        self._task = asyncio.create_task(self._beacon_loop())
+
+    async def stop(self) -> None:
+        if self._early_beacon is not None:
+            self._early_beacon.cancel()
+            self._early_beacon = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    def beacon(self) -> bool:
+        """Send a beacon now unless one went out less than ``min_interval`` ago."""
+        now = self.clock()
+        if self._transport is None or now - self._last_beacon < self.min_interval:
+            return False
+        self._last_beacon = now
+        payload = json.dumps({"v": 1, "node_id": self.node_id, "address": self.address}).encode()
+        self._transport.sendto(payload, (self.group, self.port))
+        self.beacons_sent += 1
+        return True
+
+    def discovered(self) -> List[Dict[str, str]]:
+        """Return live peers as ``{"node_id", "address"}`` dicts."""
+        self.expire()
+        return [{"node_id": node_id, "address": address} for node_id, (address, _heard) in self.peers.items()]
+
+    def expire(self) -> None:
+        cutoff = self.clock() - self.expiry
+        for node_id, (_address, heard) in list(self.peers.items()):
+            if heard < cutoff:
+                del self.peers[node_id]
+
+    def _on_beacon(self, data: bytes, addr: Tuple[str, int]) -> None:
+        try:
+            beacon = json.loads(data)
+            node_id, address = str(beacon["node_id"]), str(beacon["address"])
+        except (ValueError, KeyError, TypeError):
+            logger.debug("Ignoring malformed beacon from %s", addr)
+            return
+        if node_id == self.node_id:
+            return
+        new = node_id not in self.peers
+        self.peers[node_id] = (address, self.clock())
+        if new and self._early_beacon is None:
+            # Answer newcomers soon, at the rate limit, with a little jitter
+            # so a whole LAN does not reply in the same instant.
+            wait = max(0.0, self._last_beacon + self.min_interval - self.clock())
+            self._early_beacon = asyncio.get_event_loop().call_later(
+                wait + random.uniform(0, 0.1 * self.min_interval), self._send_early_beacon)
+
+    def _send_early_beacon(self) -> None:
+        self._early_beacon = None
+        self.beacon()
+
+    async def _beacon_loop(self) -> None:
+        while True:
+            self.beacon()
+            self.expire()
+            await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
@@ -0,0 +1,229 @@
+"""Keep a node's overlay links within a degree band."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger("enhanced_network.overlay")
+
+
+class OverlayManager:
+    """Choose which peers a node keeps links to.
+
+    Every ``interval`` seconds the node learns candidate peers from
+    :class:`~enhanced_network.core.peer_discovery.PeerDiscovery` and from a
+    neighbour's peer list (``overlay_peers``), then:
+
+    * below ``min_degree`` it dials the closest candidates by the
+      topology's latency estimate, reserving ``random_links`` slots for
+      uniformly random peers so the overlay keeps short paths
+      (a small-world graph);
+    * once it has ``min_degree`` links to non-bootstrap peers it drops its
+      links to bootstrap nodes, so they only serve joins;
+    * if the topology shows a known peer as unreachable it dials it, which
+      joins two partitions;
+    * above ``max_degree`` it drops the slowest links, preferring peers
+      that have links to spare and never orphaning a peer.
+
+    Dropped peers are told with ``overlay_drop``, which also carries
+    referrals, and neither side redials the other for ``cooldown``
+    seconds.  Peers the connection supervisor is told to keep are never
+    dropped.
+    """
+
+    def __init__(self, node, discovery=None, min_degree: int = 4, max_degree: int = 8, random_links: int = 1,
+                 interval: float = 5.0, cooldown: float = 30.0, rng: Optional[random.Random] = None):
+        if not 0 < min_degree <= max_degree:
+            raise ValueError("need 0 < min_degree <= max_degree")
+        self.node = node
+        self.discovery = discovery
+        self.min_degree = min_degree
+        self.max_degree = max_degree
+        self.random_links = min(random_links, min_degree)
+        self.interval = interval
+        self.cooldown = cooldown
+        self.rng = rng or random.Random()
+        # Candidate peers: node id -> address.
+        self.known: Dict[str, str] = {}
+        self.bootstrap: Set[str] = set()
+        self.bootstrap_ids: Set[str] = set()
+        self.long_links: Set[str] = set()
+        self._cooling: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        node.register_request_handler("overlay_peers", self._handle_peers)
+        node.register_request_handler("overlay_drop", self._handle_drop)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.rebalance()
+            except Exception as exc:  # keep maintaining on transient errors
+                logger.debug("Overlay maintenance failed: %r", exc)
+            await asyncio.sleep(self.interval * self.rng.uniform(0.8, 1.2))
+
+    async def rebalance(self) -> Dict[str, int]:
+        """Run one maintenance round; returns how many links were added and dropped."""
+        await self._refresh()
+        added = dropped = 0
+        degree = len(self.node.connections)
+        if degree < self.min_degree:
+            added = await self._grow(self.min_degree - degree)
+        joined = [p for p in self.node.connections if p not in self.bootstrap_ids]
+        if len(joined) >= self.min_degree:
+            for peer in [p for p in self.node.connections if p in self.bootstrap_ids and p not in self._pinned()]:
+                await self._drop(peer)
+                dropped += 1
+                self.node.metrics.inc("overlay.bootstrap_drained")
+        if len(self.node.connections) < self.max_degree:
+            added += await self._bridge_partition()
+        excess = len(self.node.connections) - self.max_degree
+        if excess > 0:
+            dropped += await self._shed(excess)
+        self.node.metrics.inc("overlay.added", added)
+        self.node.metrics.inc("overlay.dropped", dropped)
+        return {"added": added, "dropped": dropped}
+
+    def _pinned(self) -> Set[str]:
+        supervisor = getattr(self.node, "supervisor", None)
+        if supervisor is None:
+            return set()
+        return {t.node_id for t in supervisor.targets.values() if t.node_id}
+
+    def _cooling_down(self, key: str) -> bool:
+        until = self._cooling.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            del self._cooling[key]
+            return False
+        return True
+
+    def _learn(self, peers: List[Dict[str, Any]]) -> None:
+        for peer in peers:
+            node_id, address = peer.get("node_id"), peer.get("address")
+            if node_id and address and node_id != self.node.node_id:
+                self.known[node_id] = address
+
+    def _referrals(self, exclude: str) -> List[Dict[str, Any]]:
+        return [{"node_id": p, "address": self.known[p]}
+                for p in self.node.connections if p != exclude and p in self.known]
+
+    async def _refresh(self) -> None:
+        if self.discovery is not None:
+            if not self.bootstrap:
+                self.bootstrap = set(self.discovery.bootstrap_nodes())
+            # LAN peers come with node ids, so they are ordinary candidates.
+            self._learn(self.discovery.local_peers())
+        for peer in self.node.connections:
+            info = self.node.peers.get(peer)
+            if info is not None and info.endpoints:
+                self.known[peer] = info.endpoints[0]
+                if info.endpoints[0] in self.bootstrap:
+                    self.bootstrap_ids.add(peer)
+        peers = list(self.node.connections)
+        if not peers:
+            return
+        # Below the band every neighbour is asked; otherwise one, to keep the exchange cheap.
+        asked = peers if len(peers) < self.min_degree else [self.rng.choice(peers)]
+        replies = await asyncio.gather(
+            *(self.node.request(p, "overlay_peers", {}, timeout=2.0) for p in asked), return_exceptions=True)
+        for reply in replies:
+            if isinstance(reply, dict):
+                self._learn(reply.get("peers", []))
+
+    async def _grow(self, count: int) -> int:
+        connected = set(self.node.connections)
+        candidates = [p for p in self.known
+                      if p not in connected and p not in self.bootstrap_ids and not self._cooling_down(p)]
+        picks: List[str] = []
+        long_wanted = self.random_links - len(self.long_links & connected)
+        for peer in self.rng.sample(candidates, min(max(0, long_wanted), count, len(candidates))):
+            picks.append(peer)
+            self.long_links.add(peer)
+        rest = [p for p in candidates if p not in picks]
+        self.rng.shuffle(rest)  # unknown distances tie; do not always pick the same ones
+        rest.sort(key=lambda p: self.node.topology.distance(self.node.node_id, p))
+        picks.extend(rest[:count - len(picks)])
+        addresses = [self.known[p] for p in picks]
+        if not addresses:
+            # Nobody known yet: join through the bootstrap nodes.
+            skip = {self.known.get(p) for p in connected} | set(self.node.node_info().endpoints)
+            addresses = [a for a in self.bootstrap if a not in skip and not self._cooling_down(a)]
+        results = await asyncio.gather(*(self.node.connect_to_peer(a) for a in addresses), return_exceptions=True)
+        added = 0
+        for peer, address, result in zip(picks or [None] * len(addresses), addresses, results):
+            if isinstance(result, BaseException):
+                logger.debug("Overlay dial of %s failed: %r", address, result)
+                self._cooling[peer or address] = time.monotonic() + self.cooldown
+                self.known.pop(peer, None)
+                self.long_links.discard(peer)
+            else:
+                added += 1
+        return added
+
+    async def _bridge_partition(self) -> int:
+        """Dial one known peer the topology says is unreachable, healing a split."""
+        component = self.node.topology.component_of(self.node.node_id)
+        outside = [p for p in self.known if p not in component and p not in self.bootstrap_ids
+                   and not self._cooling_down(p)]
+        if not outside:
+            return 0
+        peer = self.rng.choice(outside)
+        try:
+            await self.node.connect_to_peer(self.known[peer])
+        except Exception as exc:  # refused, unreachable, handshake timeout...
+            logger.debug("Overlay dial of %s failed: %r", peer, exc)
+            self._cooling[peer] = time.monotonic() + self.cooldown
+            self.known.pop(peer, None)
+            return 0
+        self.node.metrics.inc("overlay.partitions_bridged")
+        return 1
+
+    async def _shed(self, excess: int) -> int:
+        pinned = self._pinned()
+        topology = self.node.topology
+        rtt = getattr(getattr(self.node, "supervisor", None), "rtt", {})
+
+        def score(peer):
+            spare = len(topology.neighbors(peer)) > self.min_degree
+            return (peer in self.bootstrap_ids, spare, rtt.get(peer, 0.0))
+
+        removable = [p for p in self.node.connections
+                     if p not in pinned and p not in self.long_links
+                     # Only drop peers that keep another link to the mesh.
+                     and len(topology.neighbors(p)) > 1]
+        removable.sort(key=score, reverse=True)
+        for peer in removable[:excess]:
+            await self._drop(peer)
+        return min(excess, len(removable))
+
+    async def _drop(self, peer: str) -> None:
+        self._cooling[peer] = time.monotonic() + self.cooldown
+        try:
+            await self.node.request(peer, "overlay_drop", {"peers": self._referrals(peer)}, timeout=1.0)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        await self.node.close_connection(peer)
+
+    async def _handle_peers(self, message) -> Dict[str, Any]:
+        return {"peers": self._referrals(message.sender_id)}
+
+    async def _handle_drop(self, message) -> Dict[str, Any]:
+        self._cooling[message.sender_id] = time.monotonic() + self.cooldown
+        self.long_links.discard(message.sender_id)
+        self._learn(message.payload.get("peers", []))
+        return {}
@@ -2,17 +2,421 @@
 
 from __future__ import annotations
 
-from typing import Dict, List
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
+logger = logging.getLogger("enhanced_network.service_registry")
 
-class ServiceRegistry:
-    """Keep track of services provided by mesh nodes."""
+Key = Tuple[str, str]  # (service, node_id)
+Version = Tuple[int, int]  # (incarnation, revision)
+
+
+@dataclass
+class ServiceEntry:
+    """One service offered by one node, valid until ``expires``."""
+
+    service: str
+    node_id: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    expires: float = 0.0
+    revision: int = 0
+    incarnation: int = 0
+
+    @property
+    def key(self) -> Key:
+        return (self.service, self.node_id)
+
+    @property
+    def version(self) -> Version:
+        return (self.incarnation, self.revision)
+
+    @property
+    def load(self) -> float:
+        return float(self.attributes.get("load", 0.0))
+
+
+def attributes_from_capability(capability: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an Ultimate Agent capability announcement to indexed attributes."""
+    resources = capability.get("compute_resources") or {}
+    return {
+        "models": list(capability.get("models_available") or []),
+        "gpu": bool(resources.get("gpu_available", False)),
+        "memory_gb": float(resources.get("memory_gb", 0.0)),
+        "reputation": float(capability.get("reputation_score", 0.0)),
+        "load": float(resources.get("load", 0.0)),
+    }
+
+
+class _SortedIndex:
+    """``(value, key)`` pairs kept sorted for range queries."""
 
     def __init__(self):
-        self._services: Dict[str, List[str]] = {}
+        self._items: List[Tuple[float, Key]] = []
+
+    def add(self, value: float, key: Key) -> None:
+        bisect.insort(self._items, (value, key))
+
+    def remove(self, value: float, key: Key) -> None:
+        index = bisect.bisect_left(self._items, (value, key))
+        if index < len(self._items) and self._items[index] == (value, key):
+            del self._items[index]
+
+    def at_least(self, value: float) -> Set[Key]:
+        return {key for _value, key in self._items[bisect.bisect_left(self._items, (value,)):]}
 
-    def register(self, service: str, node_id: str) -> None:
-        self._services.setdefault(service, []).append(node_id)
+
+class ServiceRegistry:
+    """Leased service entries with secondary indexes.
+
+    Each ``(service, node_id)`` pair has at most one entry.  Entries carry a
+    lease of ``lease`` seconds that :meth:`renew` or :meth:`heartbeat`
+    extends; expired entries are dropped through a heap of expiry times, so
+    churned nodes disappear without scanning.  The ``models``, ``gpu``,
+    ``memory_gb`` and ``reputation`` attributes are indexed and :meth:`query`
+    intersects the matching index sets before ranking the few candidates
+    left by ``load``.
+
+    Every change is also appended to a bounded log of operations with a
+    registry-wide version number; :meth:`changes_since` and :meth:`apply`
+    let :class:`ServiceRegistrySync` propagate changes incrementally.
+    Operations carry the ``(incarnation, revision)`` of the registry that
+    made them.  The incarnation defaults to the wall-clock start time, so a
+    restarted node, whose revisions begin again at 1, still supersedes what
+    its peers remember from before the restart.  Revisions come from one
+    counter per registry, so they keep increasing across an unregister and
+    a later register of the same service.
+    """
+
+    def __init__(self, lease: float = 30.0, log_size: int = 4096, clock: Callable[[], float] = time.monotonic,
+                 incarnation: Optional[int] = None):
+        self.lease = lease
+        self.incarnation = time.time_ns() if incarnation is None else incarnation
+        self.log_size = log_size
+        self.clock = clock
+        self.version = 0
+        self._entries: Dict[Key, ServiceEntry] = {}
+        self._by_service: Dict[str, Dict[str, ServiceEntry]] = {}
+        self._by_node: Dict[str, Set[str]] = {}
+        self._by_model: Dict[str, Set[Key]] = {}
+        self._gpu: Set[Key] = set()
+        self._memory = _SortedIndex()
+        self._reputation = _SortedIndex()
+        self._expiry: List[Tuple[float, Key]] = []
+        self._log: List[Tuple[int, Dict[str, Any]]] = []
+        self._node_revisions: Dict[str, Version] = {}
+        self._revision = 0
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+
+    # -- compatibility API ----------------------------------------------
+
+    def register(self, service: str, node_id: str, attributes: Optional[Dict[str, Any]] = None,
+                 lease: Optional[float] = None) -> ServiceEntry:
+        """Add or update the entry for ``node_id`` offering ``service``."""
+        existing = self._entries.get((service, node_id))
+        version = self._next_version(existing.version if existing else None)
+        lease = self.lease if lease is None else lease
+        entry = self._upsert(service, node_id, dict(attributes or {}), lease, version)
+        self._record({"op": "upsert", "service": service, "node_id": node_id, "attributes": entry.attributes,
+                      "lease": lease, "incarnation": version[0], "revision": version[1]})
+        return entry
 
     def lookup(self, service: str) -> List[str]:
-        return list(self._services.get(service, []))
+        """Return the ids of live nodes offering ``service``."""
+        self.expire()
+        return list(self._by_service.get(service, ()))
+
+    # -- leases ------------------------------------------------------------
+
+    def renew(self, service: str, node_id: str, lease: Optional[float] = None) -> bool:
+        """Extend one entry's lease; ``False`` if it is unknown or expired."""
+        entry = self._entries.get((service, node_id))
+        if entry is None or entry.expires <= self.clock():
+            return False
+        lease = self.lease if lease is None else lease
+        self._extend(entry, lease)
+        self._record({"op": "renew", "service": service, "node_id": node_id, "lease": lease,
+                      "incarnation": entry.incarnation, "revision": entry.revision})
+        return True
+
+    def heartbeat(self, node_id: str, load: Optional[float] = None, lease: Optional[float] = None) -> int:
+        """Renew every entry of ``node_id``, optionally updating its load."""
+        lease = self.lease if lease is None else lease
+        version = self._next_version(self._node_revisions.get(node_id))
+        count = self._heartbeat(node_id, load, lease, version)
+        if count:
+            op = {"op": "heartbeat", "node_id": node_id, "lease": lease, "incarnation": version[0],
+                  "revision": version[1]}
+            if load is not None:
+                op["load"] = load
+            self._record(op)
+        return count
+
+    def unregister(self, service: str, node_id: str) -> bool:
+        entry = self._entries.get((service, node_id))
+        if entry is None:
+            return False
+        self._remove(entry)
+        version = self._next_version(entry.version)
+        self._record({"op": "remove", "service": service, "node_id": node_id, "incarnation": version[0],
+                      "revision": version[1]})
+        return True
+
+    def expire(self) -> List[ServiceEntry]:
+        """Drop entries whose lease ran out and return them."""
+        now = self.clock()
+        expired = []
+        while self._expiry and self._expiry[0][0] <= now:
+            expires, key = heapq.heappop(self._expiry)
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires == expires:
+                self._remove(entry)
+                expired.append(entry)
+        return expired
+
+    # -- queries -----------------------------------------------------------
+
+    def get(self, service: str, node_id: str) -> Optional[ServiceEntry]:
+        self.expire()
+        return self._entries.get((service, node_id))
+
+    def query(self, service: Optional[str] = None, model: Optional[str] = None, gpu: Optional[bool] = None,
+              min_memory_gb: Optional[float] = None, min_reputation: Optional[float] = None,
+              limit: Optional[int] = None) -> List[ServiceEntry]:
+        """Return live entries matching every given filter, least loaded first."""
+        self.expire()
+        candidates: List[Set[Key]] = []
+        if service is not None:
+            candidates.append({(service, node_id) for node_id in self._by_service.get(service, ())})
+        if model is not None:
+            candidates.append(self._by_model.get(model, set()))
+        if gpu is True:
+            candidates.append(self._gpu)
+        if min_memory_gb is not None:
+            candidates.append(self._memory.at_least(min_memory_gb))
+        if min_reputation is not None:
+            candidates.append(self._reputation.at_least(min_reputation))
+        if candidates:
+            candidates.sort(key=len)
+            keys = set(candidates[0]).intersection(*candidates[1:])
+        else:
+            keys = set(self._entries)
+        if gpu is False:
+            keys -= self._gpu
+        entries = sorted((self._entries[key] for key in keys), key=lambda e: (e.load, e.node_id))
+        return entries[:limit] if limit is not None else entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # -- replication ---------------------------------------------------------
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Call ``listener(op)`` for every local change."""
+        self._listeners.append(listener)
+
+    def changes_since(self, version: int) -> Optional[List[Dict[str, Any]]]:
+        """Return operations after ``version``, or ``None`` if the log no longer reaches back that far."""
+        if version >= self.version:
+            return []
+        if not self._log or self._log[0][0] > version + 1:
+            return None
+        # Versions in the log are consecutive, so the start is a subtraction.
+        start = max(0, version + 1 - self._log[0][0])
+        return [op for _version, op in self._log[start:]]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return every live entry as an ``upsert`` operation."""
+        self.expire()
+        now = self.clock()
+        return [{"op": "upsert", "service": e.service, "node_id": e.node_id, "attributes": e.attributes,
+                 "lease": e.expires - now, "incarnation": e.incarnation, "revision": e.revision}
+                for e in self._entries.values()]
+
+    def apply(self, op: Dict[str, Any]) -> bool:
+        """Apply an operation from another node; ``True`` if it changed anything.
+
+        Operations that are not newer than the local state are ignored, which
+        makes applying the same operation twice harmless.  Operations without
+        an incarnation, from older peers, rank below every incarnation.
+        """
+        kind = op.get("op")
+        if kind not in ("heartbeat", "upsert", "renew", "remove"):
+            raise ValueError(f"unknown registry operation {kind!r}")
+        version = (op.get("incarnation", 0), op["revision"])
+        if kind == "heartbeat":
+            if version <= self._node_revisions.get(op["node_id"], (0, 0)):
+                return False
+            return self._heartbeat(op["node_id"], op.get("load"), op["lease"], version) > 0
+        key = (op["service"], op["node_id"])
+        entry = self._entries.get(key)
+        if kind == "upsert":
+            if entry is not None and entry.version >= version:
+                return False
+            self._upsert(op["service"], op["node_id"], dict(op.get("attributes") or {}), op["lease"], version)
+            return True
+        if kind == "renew":
+            if entry is None or entry.version != version:
+                return False
+            new_expiry = self.clock() + op["lease"]
+            if new_expiry <= entry.expires:
+                return False
+            self._extend(entry, op["lease"])
+            return True
+        # kind == "remove"
+        if entry is None or entry.version >= version:
+            return False
+        self._remove(entry)
+        return True
+
+    # -- internals -----------------------------------------------------------
+
+    def _next_version(self, after: Optional[Version]) -> Version:
+        """A fresh local version, newer than ``after`` even if that came from a later incarnation."""
+        self._revision += 1
+        version = (self.incarnation, self._revision)
+        if after is not None and after >= version:
+            version = (after[0], after[1] + 1)
+        return version
+
+    def _record(self, op: Dict[str, Any]) -> None:
+        self.version += 1
+        self._log.append((self.version, op))
+        if len(self._log) > self.log_size:
+            del self._log[:len(self._log) - self.log_size]
+        for listener in self._listeners:
+            listener(op)
+
+    def _upsert(self, service: str, node_id: str, attributes: Dict[str, Any], lease: float,
+                version: Version) -> ServiceEntry:
+        existing = self._entries.get((service, node_id))
+        if existing is not None:
+            self._unindex(existing)
+        entry = ServiceEntry(service, node_id, attributes, incarnation=version[0], revision=version[1])
+        self._entries[entry.key] = entry
+        self._by_service.setdefault(service, {})[node_id] = entry
+        self._by_node.setdefault(node_id, set()).add(service)
+        for model in attributes.get("models", ()):
+            self._by_model.setdefault(model, set()).add(entry.key)
+        if attributes.get("gpu"):
+            self._gpu.add(entry.key)
+        if "memory_gb" in attributes:
+            self._memory.add(float(attributes["memory_gb"]), entry.key)
+        if "reputation" in attributes:
+            self._reputation.add(float(attributes["reputation"]), entry.key)
+        self._extend(entry, lease)
+        return entry
+
+    def _extend(self, entry: ServiceEntry, lease: float) -> None:
+        entry.expires = self.clock() + lease
+        heapq.heappush(self._expiry, (entry.expires, entry.key))
+
+    def _heartbeat(self, node_id: str, load: Optional[float], lease: float, version: Version) -> int:
+        services = self._by_node.get(node_id)
+        if not services:
+            return 0
+        self._node_revisions[node_id] = version
+        now = self.clock()
+        count = 0
+        for service in list(services):
+            entry = self._entries[(service, node_id)]
+            # A heartbeat from before a restart must not keep newer entries alive.
+            if entry.expires <= now or entry.incarnation > version[0]:
+                continue
+            if load is not None:
+                entry.attributes["load"] = load
+            self._extend(entry, lease)
+            count += 1
+        return count
+
+    def _unindex(self, entry: ServiceEntry) -> None:
+        key = entry.key
+        for model in entry.attributes.get("models", ()):
+            holders = self._by_model.get(model)
+            if holders is not None:
+                holders.discard(key)
+                if not holders:
+                    del self._by_model[model]
+        self._gpu.discard(key)
+        if "memory_gb" in entry.attributes:
+            self._memory.remove(float(entry.attributes["memory_gb"]), key)
+        if "reputation" in entry.attributes:
+            self._reputation.remove(float(entry.attributes["reputation"]), key)
+
+    def _remove(self, entry: ServiceEntry) -> None:
+        self._unindex(entry)
+        del self._entries[entry.key]
+        providers = self._by_service[entry.service]
+        del providers[entry.node_id]
+        if not providers:
+            del self._by_service[entry.service]
+        services = self._by_node[entry.node_id]
+        services.discard(entry.service)
+        if not services:
+            del self._by_node[entry.node_id]
+            self._node_revisions.pop(entry.node_id, None)
+
+
+class ServiceRegistrySync:
+    """Keep the registries of a mesh in step by exchanging operations.
+
+    Local changes are batched for ``interval`` seconds and broadcast as a
+    ``registry_delta`` message.  Receivers apply what is newer than their
+    own state and pass exactly those operations on in their next batch, so
+    changes cross multi-hop meshes and stop once everyone has them.  A new
+    neighbour is sent a full snapshot.
+    """
+
+    def __init__(self, node, registry: ServiceRegistry, interval: float = 0.5):
+        self.node = node
+        self.registry = registry
+        self.interval = interval
+        self._pending: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        registry.subscribe(self._pending.append)
+        node.register_message_handler("registry_delta", self._handle_delta)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def send_snapshot(self, peer_id: str) -> None:
+        ops = self.registry.snapshot()
+        if ops:
+            await self.node.send_message(peer_id, "registry_delta", {"ops": ops})
+
+    async def flush(self) -> int:
+        """Broadcast pending operations now; returns how many were sent."""
+        ops, self._pending[:] = list(self._pending), []
+        if ops:
+            await self.node.broadcast_message("registry_delta", {"ops": ops})
+            self.node.metrics.inc("registry.ops_sent", len(ops))
+        return len(ops)
+
+    async def _handle_delta(self, message) -> None:
+        for op in message.payload.get("ops", []):
+            try:
+                if self.registry.apply(op):
+                    self._pending.append(op)
+                    self.node.metrics.inc("registry.ops_applied")
+            except (KeyError, ValueError) as exc:
+                logger.debug("Ignoring registry operation %r: %r", op, exc)
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.registry.expire()
+            try:
+                await self.flush()
+            except Exception as exc:  # keep syncing on transient errors
+                logger.debug("Registry flush failed: %r", exc)
@@ -1,26 +1,326 @@
 """Manage nodes and connections in the network topology."""
+import heapq
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+
+# Cost of a link nothing has been measured on; unmeasured meshes route by hop count.
+DEFAULT_RTT = 0.05
+# Bandwidth enters the cost as the time to send a message of this size.
+REFERENCE_BYTES = 64 * 1024
+INF = float("inf")
+
+
+@dataclass
+class LinkMetrics:
+    """Measured quality of a link: RTT in seconds, bandwidth in bytes/s, loss ratio."""
+
+    rtt: float | None = None
+    bandwidth: float | None = None
+    loss: float = 0.0
+
+
+def link_cost(metrics: LinkMetrics) -> float:
+    """Expected time to deliver a reference message over the link."""
+    cost = metrics.rtt if metrics.rtt is not None else DEFAULT_RTT
+    if metrics.bandwidth:
+        cost += REFERENCE_BYTES / metrics.bandwidth
+    # Each loss costs a retransmission.
+    return cost / max(1.0 - metrics.loss, 0.01)
+
+
+class _ShortestPathTree:
+    """Shortest paths from one source, repaired in place as links change."""
+
+    def __init__(self, links: dict, source: str):
+        self.links = links
+        self.source = source
+        self.dist = {source: 0.0}
+        self.parent = {}
+        self.first_hop = {}
+        self.children = {}
+        self._relax([(0.0, source)])
+
+    def _attach(self, node: str, parent: str, dist: float, heap: list) -> None:
+        old = self.parent.get(node)
+        if old is not None:
+            self.children[old].discard(node)
+        self.parent[node] = parent
+        self.children.setdefault(parent, set()).add(node)
+        self.dist[node] = dist
+        hop = node if parent == self.source else self.first_hop[parent]
+        if self.first_hop.get(node) != hop:
+            # Descendants only get re-relaxed if they get strictly closer,
+            # which rounding can hide, so hand them the new hop directly.
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                self.first_hop[current] = hop
+                stack.extend(self.children.get(current, ()))
+        heapq.heappush(heap, (dist, node))
+
+    def _relax(self, heap: list) -> None:
+        dist = self.dist
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist.get(node, INF):
+                continue
+            for peer, cost in self.links.get(node, {}).items():
+                candidate = d + cost
+                if candidate < dist.get(peer, INF):
+                    self._attach(peer, node, candidate, heap)
+
+    def link_improved(self, node_a: str, node_b: str, cost: float) -> None:
+        """Propagate a new or cheaper link; only nodes that get closer are visited."""
+        heap = []
+        for u, v in ((node_a, node_b), (node_b, node_a)):
+            if u in self.dist and self.dist[u] + cost < self.dist.get(v, INF):
+                self._attach(v, u, self.dist[u] + cost, heap)
+        self._relax(heap)
+
+    def link_degraded(self, node_a: str, node_b: str) -> None:
+        """Repair the tree after a link got dearer or went away.
+
+        Only the subtree hanging off the link can get further away; it is
+        detached and re-reached from its surviving neighbours.
+        """
+        if self.parent.get(node_b) == node_a:
+            root = node_b
+        elif self.parent.get(node_a) == node_b:
+            root = node_a
+        else:
+            return
+        self.children[self.parent[root]].discard(root)
+        affected = []
+        queue = deque([root])
+        while queue:
+            node = queue.popleft()
+            affected.append(node)
+            queue.extend(self.children.pop(node, ()))
+            del self.dist[node], self.parent[node], self.first_hop[node]
+        heap = []
+        for node in affected:
+            best, via = INF, None
+            for peer, cost in self.links.get(node, {}).items():
+                if peer in self.dist and self.dist[peer] + cost < best:
+                    best, via = self.dist[peer] + cost, peer
+            if via is not None:
+                self._attach(node, via, best, heap)
+        self._relax(heap)
+
 
 class TopologyManager:
-    def __init__(self):
+    """Weighted, undirected view of the mesh with cached next-hop tables.
+
+    Links carry :class:`LinkMetrics` and a cost derived from them by
+    ``cost`` (:func:`link_cost` by default).  :meth:`next_hop` keeps a
+    shortest-path tree per source and repairs the cached trees on every
+    link change instead of rebuilding them.
+    """
+
+    def __init__(self, cost: Callable[[LinkMetrics], float] = link_cost):
         self.nodes = {}
+        # node -> {peer: cost}
         self.links = {}
+        self.metrics = {}
+        self.cost = cost
+        self._trees = {}
+        self._components = None
 
     def add_node(self, node_id: str, info: dict | None = None) -> None:
         """Add a node to the topology."""
+        if self._components is not None and node_id not in self._components:
+            self._components[node_id] = {node_id}
         self.nodes[node_id] = info or {}
 
     def remove_node(self, node_id: str) -> None:
         """Remove a node and any associated links."""
+        for peer in list(self.links.get(node_id, ())):
+            self.disconnect(node_id, peer)
         self.nodes.pop(node_id, None)
         self.links.pop(node_id, None)
-        for peers in self.links.values():
-            peers.discard(node_id)
+        self._trees.pop(node_id, None)
+        self._components = None
 
-    def connect(self, node_a: str, node_b: str) -> None:
-        """Create a bidirectional link between ``node_a`` and ``node_b``."""
-        self.links.setdefault(node_a, set()).add(node_b)
-        self.links.setdefault(node_b, set()).add(node_a)
+    def connect(self, node_a: str, node_b: str, rtt: float | None = None, bandwidth: float | None = None,
+                loss: float | None = None) -> None:
+        """Create a bidirectional link between ``node_a`` and ``node_b``.
+
+        Connecting an existing link updates the given metrics only.
+        """
+        if node_a == node_b:
+            return
+        key = frozenset((node_a, node_b))
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            metrics = self.metrics[key] = LinkMetrics()
+        if rtt is not None:
+            metrics.rtt = rtt
+        if bandwidth is not None:
+            metrics.bandwidth = bandwidth
+        if loss is not None:
+            metrics.loss = loss
+        cost = self.cost(metrics)
+        old = self.links.get(node_a, {}).get(node_b)
+        if old == cost:
+            return
+        self.links.setdefault(node_a, {})[node_b] = cost
+        self.links.setdefault(node_b, {})[node_a] = cost
+        if old is None:
+            self._merge_components(node_a, node_b)
+        for tree in self._trees.values():
+            if old is None or cost < old:
+                tree.link_improved(node_a, node_b, cost)
+            else:
+                tree.link_degraded(node_a, node_b)
+
+    def update_link(self, node_a: str, node_b: str, **metrics) -> bool:
+        """Update the metrics of an existing link; ``False`` if there is no such link."""
+        if node_b not in self.links.get(node_a, {}):
+            return False
+        self.connect(node_a, node_b, **metrics)
+        return True
+
+    def disconnect(self, node_a: str, node_b: str) -> None:
+        """Remove the link between ``node_a`` and ``node_b`` if present."""
+        if node_b not in self.links.get(node_a, {}):
+            return
+        del self.links[node_a][node_b]
+        del self.links[node_b][node_a]
+        del self.metrics[frozenset((node_a, node_b))]
+        self._components = None
+        for tree in self._trees.values():
+            tree.link_degraded(node_a, node_b)
+
+    def set_neighbors(self, node_id: str, neighbors) -> None:
+        """Make ``neighbors`` the exact set of nodes linked to ``node_id``."""
+        neighbors = set(neighbors)
+        neighbors.discard(node_id)
+        current = set(self.links.get(node_id, ()))
+        for peer in current - neighbors:
+            self.disconnect(node_id, peer)
+        for peer in neighbors - current:
+            self.connect(node_id, peer)
 
     def neighbors(self, node_id: str) -> list[str]:
         """Return a list of neighbouring node identifiers."""
-        return list(self.links.get(node_id, set()))
+        return list(self.links.get(node_id, ()))
+
+    def link(self, node_a: str, node_b: str) -> LinkMetrics | None:
+        return self.metrics.get(frozenset((node_a, node_b)))
+
+    # -- routing ---------------------------------------------------------
+
+    def _tree(self, source: str) -> _ShortestPathTree:
+        tree = self._trees.get(source)
+        if tree is None:
+            tree = self._trees[source] = _ShortestPathTree(self.links, source)
+        return tree
+
+    def next_hop(self, source: str, destination: str) -> str | None:
+        """Return the neighbour of ``source`` on a cheapest path to ``destination``."""
+        return self._tree(source).first_hop.get(destination)
+
+    def distance(self, source: str, destination: str) -> float:
+        """Cost of the cheapest path, ``inf`` if unreachable."""
+        return self._tree(source).dist.get(destination, INF)
+
+    def shortest_path(self, source: str, destination: str) -> list[str] | None:
+        tree = self._tree(source)
+        if destination not in tree.dist:
+            return None
+        path = [destination]
+        while path[-1] != source:
+            path.append(tree.parent[path[-1]])
+        return path[::-1]
+
+    def _dijkstra(self, source: str, destination: str, banned_nodes: set,
+                  banned_links: set) -> tuple[float, list[str]] | None:
+        dist = {source: 0.0}
+        parent = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, node = heapq.heappop(heap)
+            if node == destination:
+                path = [node]
+                while path[-1] != source:
+                    path.append(parent[path[-1]])
+                return d, path[::-1]
+            if d > dist[node]:
+                continue
+            for peer, cost in self.links.get(node, {}).items():
+                if peer in banned_nodes or (node, peer) in banned_links:
+                    continue
+                if d + cost < dist.get(peer, INF):
+                    dist[peer] = d + cost
+                    parent[peer] = node
+                    heapq.heappush(heap, (d + cost, peer))
+        return None
+
+    def k_shortest_paths(self, source: str, destination: str, k: int) -> list[tuple[float, list[str]]]:
+        """Return up to ``k`` loopless paths as ``(cost, path)``, cheapest first (Yen's algorithm)."""
+        first = self._dijkstra(source, destination, set(), set())
+        if first is None:
+            return []
+        found = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        while len(found) < k:
+            last = found[-1][1]
+            for index in range(len(last) - 1):
+                spur, root = last[index], last[:index + 1]
+                banned_links = {(p[index], p[index + 1]) for _c, p in found if p[:index + 1] == root}
+                spur_result = self._dijkstra(spur, destination, set(root[:-1]), banned_links)
+                if spur_result is None:
+                    continue
+                root_cost = sum(self.links[a][b] for a, b in zip(root, root[1:]))
+                path = root[:-1] + spur_result[1]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur_result[0], path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates))
+        return found
+
+    # -- partitions ------------------------------------------------------
+
+    def _merge_components(self, node_a: str, node_b: str) -> None:
+        if self._components is None:
+            return
+        index = self._components
+        comp_a, comp_b = index.setdefault(node_a, {node_a}), index.setdefault(node_b, {node_b})
+        if comp_a is comp_b:
+            return
+        if len(comp_a) < len(comp_b):
+            comp_a, comp_b = comp_b, comp_a
+        comp_a |= comp_b
+        for node in comp_b:
+            index[node] = comp_a
+
+    def components(self) -> list[set[str]]:
+        """Return the connected components, largest first."""
+        if self._components is None:
+            index = {}
+            for start in set(self.nodes) | set(self.links):
+                if start in index:
+                    continue
+                component = {start}
+                queue = deque([start])
+                while queue:
+                    for peer in self.links.get(queue.popleft(), ()):
+                        if peer not in component:
+                            component.add(peer)
+                            queue.append(peer)
+                for node in component:
+                    index[node] = component
+            self._components = index
+        unique = {id(c): c for c in self._components.values()}
+        return sorted(unique.values(), key=len, reverse=True)
+
+    def component_of(self, node_id: str) -> set[str]:
+        self.components()
+        return self._components.get(node_id, {node_id})
+
+    def is_partitioned(self) -> bool:
+        return len(self.components()) > 1
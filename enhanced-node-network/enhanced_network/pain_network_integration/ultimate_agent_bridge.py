@@ -5,6 +5,7 @@ Integrates Web4ai mesh with Ultimate Agent's advanced P2P and blockchain systems
 """
 
 import asyncio
+import os
 import time
 import json
 import uuid
@@ -14,6 +15,8 @@ from dataclasses import dataclass, asdict
 
 # Import Web4ai base components
 from ..enhanced_network.core.mesh_node import MeshNode, NetworkMessage
+from ..enhanced_network.discovery.service_registry import ServiceEntry, attributes_from_capability
+from ..enhanced_network.coordination.task_queue import PriorityTaskQueue
 
 # Import Ultimate Agent components (adjust paths as needed)
 from ultimate_agent.network.p2p.distributed_ai import (
@@ -51,6 +54,16 @@ class UltimateAgentWeb4aiBridge:
         self.security_manager = getattr(ultimate_agent, 'security_manager', None)
         self.task_scheduler = getattr(ultimate_agent, 'task_scheduler', None)
         
+        # Local admission control in front of the task scheduler
+        cores = os.cpu_count() or 1
+        self.task_queue = PriorityTaskQueue(
+            concurrency=cores,
+            max_queued=4 * cores,
+            metrics=web4ai_node.metrics
+        )
+        # Longest a task may hold a queue slot, start and monitoring included
+        self.max_task_runtime = 3600.0
+        
         # Initialize P2P integration if available
         self.p2p_integration = None
         if hasattr(ultimate_agent, 'config_manager'):
@@ -140,8 +153,15 @@ class UltimateAgentWeb4aiBridge:
             'ultimate_governance_proposal': self._handle_ultimate_governance_proposal
         }
         
+        # Task execution and inference can take seconds; run them in a task
+        # pool so they do not stop the connection from being read.
+        pooled = {'ultimate_task_request', 'ultimate_inference_request'}
+        
         for message_type, handler in handlers.items():
-            self.web4ai_node.register_message_handler(message_type, handler)
+            if message_type in pooled:
+                self.web4ai_node.register_message_handler(message_type, handler, mode='task', concurrency=32)
+            else:
+                self.web4ai_node.register_message_handler(message_type, handler)
     
     async def announce_ultimate_capabilities(self):
         """Announce Ultimate Agent capabilities to Web4ai network"""
@@ -155,7 +175,22 @@ class UltimateAgentWeb4aiBridge:
         }
         
         await self.web4ai_node.broadcast_message('ultimate_capability_query', announcement)
+        services = getattr(self.web4ai_node, 'services', None)
+        if services is not None:
+            # Replicated to the rest of the mesh by the registry sync.
+            services.register('ultimate_agent', self.web4ai_node.node_id,
+                              attributes_from_capability(announcement['capability']))
         self.logger.info(f"Announced Ultimate Agent capabilities: {self.web4ai_domain}")
+
+    def find_ultimate_agents(self, model: Optional[str] = None, gpu: Optional[bool] = None,
+                             min_memory_gb: Optional[float] = None, min_reputation: Optional[float] = None,
+                             limit: Optional[int] = None) -> List[ServiceEntry]:
+        """Find Ultimate Agents in the node's service registry, least loaded first"""
+        services = getattr(self.web4ai_node, 'services', None)
+        if services is None:
+            return []
+        return services.query('ultimate_agent', model=model, gpu=gpu, min_memory_gb=min_memory_gb,
+                              min_reputation=min_reputation, limit=limit)
     
     def _get_feature_list(self) -> List[str]:
         """Get list of available Ultimate Agent features"""
@@ -180,7 +215,7 @@ class UltimateAgentWeb4aiBridge:
             task_data = message.payload
             
             if not self.task_scheduler:
-                await self.web4ai_node.send_message(message.sender_id, 'task_response', {
+                await self.web4ai_node.reply(message, 'task_response', {
                     'status': 'error',
                     'message': 'Task scheduler not available'
                 })
@@ -193,7 +228,7 @@ class UltimateAgentWeb4aiBridge:
                     'execute'
                 )
                 if not validation['valid']:
-                    await self.web4ai_node.send_message(message.sender_id, 'task_response', {
+                    await self.web4ai_node.reply(message, 'task_response', {
                         'status': 'error',
                         'message': 'Authentication failed'
                     })
@@ -202,7 +237,15 @@ class UltimateAgentWeb4aiBridge:
             # Execute task using Ultimate Agent's task scheduler
             task_id = await self._execute_ultimate_task(task_data, message.sender_id)
             
-            await self.web4ai_node.send_message(message.sender_id, 'task_response', {
+            if task_id is None:
+                await self.web4ai_node.reply(message, 'task_response', {
+                    'status': 'overloaded',
+                    'message': 'Task queue full, retry later',
+                    'queue_depth': len(self.task_queue)
+                })
+                return
+            
+            await self.web4ai_node.reply(message, 'task_response', {
                 'status': 'accepted',
                 'task_id': task_id,
                 'agent_type': 'ultimate_agent'
@@ -210,7 +253,7 @@ class UltimateAgentWeb4aiBridge:
             
         except Exception as e:
             self.logger.error(f"Ultimate task request failed: {e}")
-            await self.web4ai_node.send_message(message.sender_id, 'task_response', {
+            await self.web4ai_node.reply(message, 'task_response', {
                 'status': 'error',
                 'message': str(e)
             })
@@ -236,7 +279,7 @@ class UltimateAgentWeb4aiBridge:
             else:
                 result = {'success': False, 'error': 'No inference capability available'}
             
-            await self.web4ai_node.send_message(message.sender_id, 'inference_response', {
+            await self.web4ai_node.reply(message, 'inference_response', {
                 'request_id': request_data.get('request_id'),
                 'result': result,
                 'processed_by': 'ultimate_agent'
@@ -251,7 +294,7 @@ class UltimateAgentWeb4aiBridge:
             tx_data = message.payload
             
             if not self.blockchain_manager:
-                await self.web4ai_node.send_message(message.sender_id, 'blockchain_response', {
+                await self.web4ai_node.reply(message, 'blockchain_response', {
                     'status': 'error',
                     'message': 'Blockchain not available'
                 })
@@ -273,7 +316,7 @@ class UltimateAgentWeb4aiBridge:
             else:
                 result = {'success': False, 'error': 'Unknown transaction type'}
             
-            await self.web4ai_node.send_message(message.sender_id, 'blockchain_response', {
+            await self.web4ai_node.reply(message, 'blockchain_response', {
                 'transaction_id': tx_data.get('tx_id'),
                 'result': result
             })
@@ -287,7 +330,7 @@ class UltimateAgentWeb4aiBridge:
             auth_data = message.payload
             
             if not self.security_manager:
-                await self.web4ai_node.send_message(message.sender_id, 'auth_response', {
+                await self.web4ai_node.reply(message, 'auth_response', {
                     'status': 'error',
                     'message': 'Security manager not available'
                 })
@@ -308,7 +351,7 @@ class UltimateAgentWeb4aiBridge:
             else:
                 result = {'status': 'error', 'message': 'Unknown auth type'}
             
-            await self.web4ai_node.send_message(message.sender_id, 'auth_response', result)
+            await self.web4ai_node.reply(message, 'auth_response', result)
             
         except Exception as e:
             self.logger.error(f"Security auth request failed: {e}")
@@ -322,7 +365,7 @@ class UltimateAgentWeb4aiBridge:
             'status': self.get_ultimate_status()
         }
         
-        await self.web4ai_node.send_message(message.sender_id, 'capability_response', response)
+        await self.web4ai_node.reply(message, 'capability_response', response)
     
     async def _handle_ultimate_governance_proposal(self, message: NetworkMessage):
         """Handle governance proposals"""
@@ -342,13 +385,13 @@ class UltimateAgentWeb4aiBridge:
             else:
                 result = {'status': 'error', 'message': 'Unknown governance action'}
             
-            await self.web4ai_node.send_message(message.sender_id, 'governance_response', result)
+            await self.web4ai_node.reply(message, 'governance_response', result)
             
         except Exception as e:
             self.logger.error(f"Governance proposal failed: {e}")
     
-    async def _execute_ultimate_task(self, task_data: Dict[str, Any], requester_id: str) -> str:
-        """Execute task using Ultimate Agent's advanced capabilities"""
+    async def _execute_ultimate_task(self, task_data: Dict[str, Any], requester_id: str) -> Optional[str]:
+        """Queue task for Ultimate Agent's scheduler; returns None if it was shed"""
         task_id = f"ultimate-{uuid.uuid4().hex[:8]}"
         
         try:
@@ -361,19 +404,60 @@ class UltimateAgentWeb4aiBridge:
                 'priority': task_data.get('priority', 5)
             }
             
-            # Use Ultimate Agent's task scheduler
-            if hasattr(self.task_scheduler, 'start_task'):
-                ultimate_task_id = await self.task_scheduler.start_task(
-                    task_config['type'],
-                    task_config['config']
-                )
-                
-                # Monitor task progress and send updates
-                asyncio.create_task(self._monitor_task_progress(
-                    ultimate_task_id, 
-                    task_id, 
-                    requester_id
-                ))
+            # Deadlines arrive as Unix timestamps; the queue runs on its own clock
+            deadline = None
+            if task_data.get('deadline') is not None:
+                deadline = self.task_queue.clock() + float(task_data['deadline']) - time.time()
+            
+            # Use Ultimate Agent's task scheduler once the queue admits the task;
+            # the slot is held until the task completes, fails or times out
+            async def execute():
+                if hasattr(self.task_scheduler, 'start_task'):
+                    try:
+                        ultimate_task_id = await self.task_scheduler.start_task(
+                            task_config['type'],
+                            task_config['config']
+                        )
+                    except Exception as e:
+                        self.logger.error(f"Task execution failed: {e}")
+                        await self.web4ai_node.send_message(requester_id, 'task_error', {
+                            'task_id': task_id,
+                            'error': str(e),
+                            'processed_by': 'ultimate_agent'
+                        })
+                        return
+                    
+                    # Monitor task progress and send updates
+                    if hasattr(self.task_scheduler, 'get_task_status'):
+                        await self._monitor_task_progress(
+                            ultimate_task_id, 
+                            task_id, 
+                            requester_id
+                        )
+            
+            async def run():
+                try:
+                    await asyncio.wait_for(execute(), self.max_task_runtime)
+                except asyncio.TimeoutError:
+                    self.logger.warning(f"Task {task_id} exceeded {self.max_task_runtime}s")
+                    await self.web4ai_node.send_message(requester_id, 'task_error', {
+                        'task_id': task_id,
+                        'error': 'timed out',
+                        'processed_by': 'ultimate_agent'
+                    })
+            
+            async def dropped(reason):
+                try:
+                    await self.web4ai_node.send_message(requester_id, 'task_error', {
+                        'task_id': task_id,
+                        'error': 'deadline expired' if reason == 'expired' else 'shed by higher-priority work',
+                        'processed_by': 'ultimate_agent'
+                    })
+                except Exception as e:
+                    self.logger.debug(f"Could not report dropped task {task_id}: {e}")
+            
+            if not self.task_queue.submit(run, float(task_config['priority']), deadline, on_drop=dropped):
+                return None
                 
             return task_id
             
@@ -481,17 +565,17 @@ class UltimateAgentWeb4aiBridge:
     
     def _get_memory_gb(self) -> float:
         """Get available memory in GB"""
-        import psutil
         try:
+            import psutil
             return psutil.virtual_memory().total / (1024**3)
         except:
             return 8.0
     
     def _get_compute_resources(self) -> Dict[str, Any]:
         """Get compute resource information"""
-        import psutil
-        
         try:
+            import psutil
+            
             return {
                 'cpu_cores': psutil.cpu_count(logical=True),
                 'memory_gb': self._get_memory_gb(),
@@ -534,6 +618,7 @@ class UltimateAgentWeb4aiBridge:
         
         if self.task_scheduler:
             status['components_available']['task_scheduler'] = True
+            status['task_queue'] = self.task_queue.stats()
         
         if self.p2p_integration:
             status['p2p_integration'] = True
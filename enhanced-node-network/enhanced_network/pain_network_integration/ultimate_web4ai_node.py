@@ -4,6 +4,8 @@
 Enhanced Web4ai Node for Ultimate Agent Integration
 """
 
+from typing import Any, Dict
+
 from ..enhanced_network.core.mesh_node import MeshNode
 from .ultimate_agent_bridge import UltimateAgentWeb4aiBridge
 
@@ -84,6 +86,24 @@ class UltimateWeb4aiNode(MeshNode):
             model_name, input_data, **options
         )
     
+    async def query_capabilities(self, peer_id: str, timeout: float = 10.0) -> Dict[str, Any]:
+        """Ask ``peer_id`` for its Ultimate Agent capability profile"""
+        return await self.request(peer_id, 'ultimate_capability_query', {
+            'action': 'capability_query',
+            'web4ai_domain': self.ultimate_domain
+        }, timeout=timeout)
+    
+    async def remote_inference(self, peer_id: str, model_name: str, input_data: Any,
+                               timeout: float = 30.0, **options) -> Dict[str, Any]:
+        """Run inference on ``peer_id``; many calls may be in flight at once"""
+        response = await self.request(peer_id, 'ultimate_inference_request', {
+            'model': model_name,
+            'input': input_data,
+            'timeout': timeout,
+            **options
+        }, timeout=timeout)
+        return response.get('result', response)
+    
     async def execute_smart_contract(self, contract_type: str, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """Execute smart contract using Ultimate Agent's blockchain integration"""
         if not self.ultimate_bridge or not self.ultimate_bridge.blockchain_manager:
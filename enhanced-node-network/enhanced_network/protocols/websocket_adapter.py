@@ -17,7 +17,9 @@ class WebSocketAdapter(BaseAdapter):
         await super().start()
         host = self.config.get("host", "0.0.0.0")
         port = self.config.get("port", 9000)
-        self.server = await websockets.serve(self._handler, host, port)
+        # permessage-deflate; set ``compression`` to ``None`` to disable it.
+        compression = self.config.get("compression", "deflate")
+        self.server = await websockets.serve(self._handler, host, port, compression=compression)
 
     async def stop(self) -> None:
         await super().stop()
@@ -2,7 +2,9 @@
 
 from __future__ import annotations
 
-from typing import Dict, Any
+import hashlib
+import hmac
+from typing import Dict, Any, Optional
 
 
 class Authenticator:
@@ -13,3 +15,15 @@ class Authenticator:
 
     def authenticate(self, node_id: str, token: str) -> bool:
         return self.tokens.get(node_id) == token
+
+    def sign(self, node_id: str, message: bytes) -> Optional[str]:
+        """Return an HMAC-SHA256 of ``message`` keyed with ``node_id``'s token."""
+        token = self.tokens.get(node_id)
+        if token is None:
+            return None
+        return hmac.new(token.encode(), message, hashlib.sha256).hexdigest()
+
+    def verify(self, node_id: str, message: bytes, mac: str) -> bool:
+        """Check a MAC produced by :meth:`sign` for ``node_id``."""
+        expected = self.sign(node_id, message)
+        return expected is not None and hmac.compare_digest(expected, mac)
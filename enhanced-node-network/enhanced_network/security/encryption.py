@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
+
 from cryptography.fernet import Fernet
 
 
@@ -10,11 +12,16 @@ def generate_key() -> bytes:
     return Fernet.generate_key()
 
 
+@lru_cache(maxsize=256)
+def _fernet(key: bytes) -> Fernet:
+    return Fernet(key)
+
+
 def encrypt(key: bytes, data: bytes) -> bytes:
     """Encrypt ``data`` with ``key``."""
-    return Fernet(key).encrypt(data)
+    return _fernet(key).encrypt(data)
 
 
 def decrypt(key: bytes, token: bytes) -> bytes:
     """Decrypt ``token`` with ``key``."""
-    return Fernet(key).decrypt(token)
+    return _fernet(key).decrypt(token)
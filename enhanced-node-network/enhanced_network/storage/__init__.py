@@ -0,0 +1,5 @@
+"""Content-addressed storage and distribution of data chunks."""
+
+from .chunk_store import ChunkStore
+
+__all__ = ["ChunkStore"]
@@ -0,0 +1,186 @@
+"""Locate and fetch chunks from mesh peers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+from .chunk_store import ChunkStore
+
+logger = logging.getLogger("enhanced_network.chunk_exchange")
+
+
+def _read_and_remove(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    os.remove(path)
+    return data
+
+
+class ChunkExchange:
+    """Share a :class:`ChunkStore` with neighbours, BitTorrent style.
+
+    :meth:`fetch` skips chunks already held locally, asks every neighbour
+    which of the rest it has (``chunk_have``), then downloads the rarest
+    chunks first, spreading them over all holders with at most
+    ``per_peer`` transfers per peer and ``max_parallel`` in total.  A chunk
+    that fails to arrive is retried from another holder.  Transfers use
+    :class:`~enhanced_network.core.streaming.StreamManager`, and the digest
+    of every received chunk is checked before it is stored.  Concurrent
+    fetches of the same chunk share one transfer.
+    """
+
+    def __init__(self, node, store: ChunkStore, max_parallel: int = 8, per_peer: int = 2,
+                 fetch_timeout: float = 30.0):
+        self.node = node
+        self.store = store
+        self.max_parallel = max_parallel
+        self.per_peer = per_peer
+        self.fetch_timeout = fetch_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Chunks requested from a peer and not yet streamed: digest -> future.
+        self._waiting: Dict[str, asyncio.Future] = {}
+        node.register_request_handler("chunk_have", self._handle_have)
+        node.register_request_handler("chunk_get", self._handle_get)
+        node.register_stream_handler(self._on_stream)
+
+    async def locate(self, digests: Iterable[str], peers: Optional[Iterable[str]] = None,
+                     timeout: float = 5.0) -> Dict[str, List[str]]:
+        """Return, for each digest, the neighbours that hold it."""
+        digests = list(digests)
+        peers = list(peers if peers is not None else self.node.connections)
+        replies = await asyncio.gather(
+            *(self.node.request(peer, "chunk_have", {"digests": digests}, timeout=timeout) for peer in peers),
+            return_exceptions=True,
+        )
+        holders: Dict[str, List[str]] = {digest: [] for digest in digests}
+        for peer, reply in zip(peers, replies):
+            if isinstance(reply, BaseException):
+                continue
+            for digest in reply.get("have", []):
+                if digest in holders:
+                    holders[digest].append(peer)
+        return holders
+
+    async def fetch(self, digests: Iterable[str]) -> Dict[str, bytes]:
+        """Make every chunk in ``digests`` available locally and return their content.
+
+        Raises :class:`KeyError` for chunks no neighbour could provide.
+        """
+        digests = list(dict.fromkeys(digests))
+        missing = [d for d in digests if d not in self.store]
+        self.node.metrics.inc("chunks.local_hits", len(digests) - len(missing))
+        if missing:
+            await self._download(missing)
+        result = {}
+        for digest in digests:
+            data = self.store.get(digest)
+            if data is None:
+                raise KeyError(digest)
+            result[digest] = data
+        return result
+
+    async def fetch_blob(self, manifest: List[str]) -> bytes:
+        """Fetch the chunks of a manifest and return the reassembled blob."""
+        await self.fetch(manifest)
+        return self.store.read_blob(manifest)
+
+    async def _download(self, digests: List[str]) -> None:
+        shared = [self._inflight[d] for d in digests if d in self._inflight]
+        own = [d for d in digests if d not in self._inflight]
+        loop = asyncio.get_event_loop()
+        for digest in own:
+            self._inflight[digest] = loop.create_future()
+        try:
+            holders = await self.locate(own) if own else {}
+            # Rarest first, as the scarce chunks are the ones most likely lost.
+            order = sorted(own, key=lambda d: len(holders[d]))
+            total = asyncio.Semaphore(self.max_parallel)
+            per_peer = {peer: asyncio.Semaphore(self.per_peer)
+                        for peers in holders.values() for peer in peers}
+            load = {peer: 0 for peer in per_peer}
+            await asyncio.gather(*(self._download_one(d, holders[d], total, per_peer, load) for d in order))
+        finally:
+            for digest in own:
+                future = self._inflight.pop(digest)
+                if not future.done():
+                    future.set_result(digest in self.store)
+        if shared:
+            await asyncio.gather(*shared)
+
+    async def _download_one(self, digest: str, holders: List[str], total: asyncio.Semaphore,
+                            per_peer: Dict[str, asyncio.Semaphore], load: Dict[str, int]) -> None:
+        candidates = list(holders)
+        while candidates and digest not in self.store:
+            # Least loaded holder first spreads chunks across peers.
+            peer = min(candidates, key=lambda p: load[p])
+            candidates.remove(peer)
+            load[peer] += 1
+            try:
+                async with per_peer[peer], total:
+                    await self._request_chunk(peer, digest)
+                self.node.metrics.inc(f"chunks.fetched_from.{peer}")
+            except (asyncio.TimeoutError, ConnectionError, ValueError) as exc:
+                self.node.metrics.inc("chunks.fetch_failures")
+                logger.debug("Fetching %s from %s failed: %r", digest, peer, exc)
+            finally:
+                load[peer] -= 1
+
+    async def _request_chunk(self, peer: str, digest: str) -> None:
+        future = self._waiting.get(digest)
+        if future is None or future.done():
+            future = self._waiting[digest] = asyncio.get_event_loop().create_future()
+        try:
+            reply = await self.node.request(peer, "chunk_get", {"digest": digest})
+            if not reply.get("ok"):
+                raise ValueError(f"{peer} no longer has {digest}")
+            await asyncio.wait_for(asyncio.shield(future), self.fetch_timeout)
+        finally:
+            if self._waiting.get(digest) is future:
+                del self._waiting[digest]
+
+    async def _handle_have(self, message) -> Dict[str, List[str]]:
+        return {"have": [d for d in message.payload.get("digests", []) if d in self.store]}
+
+    async def _handle_get(self, message) -> Dict[str, bool]:
+        digest = message.payload.get("digest", "")
+        if digest not in self.store:
+            return {"ok": False}
+        asyncio.ensure_future(self._serve(message.sender_id, digest))
+        return {"ok": True}
+
+    async def _serve(self, peer: str, digest: str) -> None:
+        with self.store.view(digest) as view:
+            if view is None:
+                logger.debug("Chunk %s went away before it was served", digest)
+                return
+            try:
+                await self.node.send_stream(peer, view, {"chunk": digest}, stream_id=digest[:32])
+                self.node.metrics.inc("chunks.served")
+            except (asyncio.TimeoutError, ConnectionError, ValueError) as exc:
+                logger.debug("Serving %s to %s failed: %r", digest, peer, exc)
+
+    async def _on_stream(self, stream) -> None:
+        digest = stream.metadata.get("chunk")
+        if not digest:
+            return
+        error = None
+        try:
+            if stream.data is not None:
+                await self.store.put_async(stream.data, digest)
+            else:
+                data = await asyncio.get_event_loop().run_in_executor(None, _read_and_remove, stream.path)
+                await self.store.put_async(data, digest)
+        except ValueError as exc:
+            self.node.metrics.inc("chunks.corrupt")
+            error = exc
+        finally:
+            self.node.streams.forget(stream.stream_id)
+        future = self._waiting.get(digest)
+        if future is not None and not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
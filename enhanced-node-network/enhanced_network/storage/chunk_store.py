@@ -0,0 +1,200 @@
+"""Content-addressed chunk store on local disk."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+from typing import Iterable, Iterator, List, Optional, Union
+
+from ..utils.metrics import Metrics
+
+Data = Union[bytes, bytearray, memoryview]
+
+
+def chunk_digest(data: Data) -> str:
+    """Return the address of ``data``: its hex SHA-256."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkStore:
+    """Immutable chunks on disk, keyed by the SHA-256 of their content.
+
+    Storing the same content twice keeps one copy.  :meth:`get` returns a
+    copy of a chunk; :meth:`view` memory-maps the chunk file for the length
+    of a ``with`` block, so large chunks can be read from the page cache
+    without a private copy.  When the stored bytes exceed ``max_bytes``
+    the least recently used chunks are deleted.  Blobs larger than
+    ``chunk_size`` are split into chunks and described by a manifest, the
+    list of their digests in order.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3, chunk_size: int = 1024 * 1024,
+                 metrics: Optional[Metrics] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.metrics = metrics or Metrics()
+        self.size = 0
+        # digest -> size, least recently used first.
+        self._chunks: "OrderedDict[str, int]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _load(self) -> None:
+        found = []
+        for prefix in os.listdir(self.directory):
+            subdir = os.path.join(self.directory, prefix)
+            if len(prefix) != 2 or not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if name.startswith("."):
+                    continue
+                stat = os.stat(os.path.join(subdir, name))
+                found.append((stat.st_atime, name, stat.st_size))
+        for _atime, digest, size in sorted(found):
+            self._chunks[digest] = size
+            self.size += size
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._chunks
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def digests(self) -> List[str]:
+        return list(self._chunks)
+
+    def put(self, data: Data, digest: Optional[str] = None) -> str:
+        """Store ``data`` and return its digest.
+
+        If ``digest`` is given the content is checked against it and a
+        :class:`ValueError` raised on mismatch.
+        """
+        actual = self._verify(data, digest)
+        if not self._deduplicate(actual, len(data)):
+            self._write(actual, data)
+            self._add(actual, len(data))
+        return actual
+
+    async def put_async(self, data: Data, digest: Optional[str] = None) -> str:
+        """Like :meth:`put`, but hash and write ``data`` in the default executor."""
+        loop = asyncio.get_event_loop()
+        actual = await loop.run_in_executor(None, self._verify, data, digest)
+        if not self._deduplicate(actual, len(data)):
+            await loop.run_in_executor(None, self._write, actual, data)
+            if actual not in self._chunks:  # unless a concurrent put got there first
+                self._add(actual, len(data))
+        return actual
+
+    @staticmethod
+    def _verify(data: Data, digest: Optional[str]) -> str:
+        actual = chunk_digest(data)
+        if digest is not None and digest != actual:
+            raise ValueError(f"chunk content does not match digest {digest}")
+        return actual
+
+    def _deduplicate(self, digest: str, size: int) -> bool:
+        if digest not in self._chunks:
+            return False
+        self._chunks.move_to_end(digest)
+        self.metrics.inc("chunk_store.dedup_hits")
+        self.metrics.inc("chunk_store.bytes_deduplicated", size)
+        return True
+
+    def _write(self, digest: str, data: Data) -> None:
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _add(self, digest: str, size: int) -> None:
+        self._chunks[digest] = size
+        self.size += size
+        self.metrics.inc("chunk_store.bytes_written", size)
+        self._evict(keep=digest)
+
+    def get(self, digest: str) -> Optional[bytes]:
+        """Return the content of the chunk, or ``None`` if absent."""
+        with self.view(digest) as view:
+            return None if view is None else bytes(view)
+
+    @contextlib.contextmanager
+    def view(self, digest: str) -> Iterator[Optional[memoryview]]:
+        """Memory-map the chunk for the ``with`` block; ``None`` if absent.
+
+        The view and the mapping are released when the block exits, so
+        slices of the view must not outlive it.
+        """
+        if digest not in self._chunks:
+            yield None
+            return
+        self._chunks.move_to_end(digest)
+        if self._chunks[digest] == 0:
+            yield memoryview(b"")
+            return
+        try:
+            with open(self._path(digest), "rb") as fh:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            self.size -= self._chunks.pop(digest)
+            yield None
+            return
+        view = memoryview(mapped)
+        try:
+            yield view
+        finally:
+            view.release()
+            mapped.close()
+
+    def delete(self, digest: str) -> None:
+        size = self._chunks.pop(digest, None)
+        if size is None:
+            return
+        self.size -= size
+        try:
+            os.remove(self._path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str) -> None:
+        for digest in list(self._chunks):
+            if self.size <= self.max_bytes:
+                break
+            if digest != keep:
+                self.delete(digest)
+                self.metrics.inc("chunk_store.evictions")
+
+    def put_blob(self, data: Data) -> List[str]:
+        """Split ``data`` into chunks, store them and return the manifest."""
+        view = memoryview(data).cast("B")
+        return [self.put(view[offset:offset + self.chunk_size])
+                for offset in range(0, len(view), self.chunk_size)] or [self.put(b"")]
+
+    def put_file(self, path: str) -> List[str]:
+        """Store the file at ``path`` in chunks without reading it into memory."""
+        with open(path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                return [self.put(b"")]
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return self.put_blob(mapped)
+
+    def read_blob(self, manifest: Iterable[str]) -> bytes:
+        """Reassemble a blob from its manifest; ``KeyError`` if a chunk is missing."""
+        with contextlib.ExitStack() as stack:
+            parts = []
+            for digest in manifest:
+                view = stack.enter_context(self.view(digest))
+                if view is None:
+                    raise KeyError(digest)
+                parts.append(view)
+            return b"".join(parts)
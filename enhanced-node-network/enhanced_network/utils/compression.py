@@ -0,0 +1,185 @@
+"""Per-record compression for mesh frames.
+
+Compression is applied to the body of a length-prefixed record (see
+:mod:`enhanced_network.utils.serialization`) and signalled in the low bits
+of its ``flags`` byte.  Both ends must agree on the compressor and, when one
+is used, on the shared dictionary; :meth:`Compressor.descriptor` is what
+peers compare during the handshake.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+from .metrics import Metrics
+
+# Values stored in the low bits of a record's flags byte.
+COMPRESSION_MASK = 0x03
+NONE = 0
+ZLIB = 1
+ZSTD = 2
+
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+
+class Compressor:
+    """Base class for record compressors."""
+
+    name = ""
+    flag = NONE
+
+    def __init__(self, dictionary: Optional[bytes] = None):
+        self.dictionary = dictionary or b""
+        self.dictionary_id = hashlib.sha256(self.dictionary).hexdigest()[:16] if self.dictionary else ""
+
+    def descriptor(self) -> Dict[str, str]:
+        return {"name": self.name, "dictionary": self.dictionary_id}
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCompressor(Compressor):
+    """Raw deflate with an optional preset dictionary."""
+
+    name = "zlib"
+    flag = ZLIB
+
+    def __init__(self, level: int = 6, dictionary: Optional[bytes] = None):
+        super().__init__(dictionary)
+        self.level = level
+        # Priming a compressor with the dictionary is the expensive part, so
+        # keep one around and copy it for every record.
+        self._template = self._compressobj()
+
+    def _compressobj(self):
+        if self.dictionary:
+            return zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=self.dictionary)
+        return zlib.compressobj(self.level, zlib.DEFLATED, -15)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self._template.copy()
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data) -> bytes:
+        if self.dictionary:
+            decompressor = zlib.decompressobj(-15, zdict=self.dictionary)
+        else:
+            decompressor = zlib.decompressobj(-15)
+        out = decompressor.decompress(data, MAX_DECOMPRESSED_SIZE)
+        if decompressor.unconsumed_tail:
+            raise ValueError("decompressed record exceeds size limit")
+        return out
+
+
+class ZstdCompressor(Compressor):
+    """Zstandard with an optional trained dictionary (needs :mod:`zstandard`)."""
+
+    name = "zstd"
+    flag = ZSTD
+
+    def __init__(self, level: int = 3, dictionary: Optional[bytes] = None):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        super().__init__(dictionary)
+        self.level = level
+        dict_data = zstandard.ZstdCompressionDict(self.dictionary) if self.dictionary else None
+        self._compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data) -> bytes:
+        return self._decompressor.decompress(bytes(data), max_output_size=MAX_DECOMPRESSED_SIZE)
+
+
+def available_compressors() -> List[str]:
+    names = [ZlibCompressor.name]
+    if zstandard is not None:
+        names.insert(0, ZstdCompressor.name)
+    return names
+
+
+def create_compressor(name: str, level: Optional[int] = None, dictionary: Optional[bytes] = None) -> Compressor:
+    """Instantiate the compressor called ``name``."""
+    if name == ZlibCompressor.name:
+        return ZlibCompressor(6 if level is None else level, dictionary)
+    if name == ZstdCompressor.name:
+        return ZstdCompressor(3 if level is None else level, dictionary)
+    raise ValueError(f"unknown compressor {name!r}")
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 16 * 1024, method: str = "zlib") -> bytes:
+    """Build a shared dictionary from representative payloads.
+
+    ``zstd`` uses the zstandard trainer.  For ``zlib`` the dictionary is the
+    most common samples concatenated, most frequent last because deflate
+    finds matches near the end of the window more cheaply.
+    """
+
+    samples = [bytes(s) for s in samples]
+    if method == ZstdCompressor.name:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        return zstandard.train_dictionary(size, samples).as_bytes()
+    counts: Dict[bytes, int] = {}
+    for sample in samples:
+        counts[sample] = counts.get(sample, 0) + 1
+    ranked = sorted(counts, key=lambda s: counts[s])
+    dictionary = b""
+    for sample in reversed(ranked):
+        if len(dictionary) + len(sample) > size:
+            continue
+        dictionary = sample + dictionary
+    return dictionary
+
+
+class CompressionPolicy:
+    """Decide per record whether to compress and account for the effect.
+
+    Bodies shorter than ``threshold`` bytes are sent as is, as are bodies
+    that do not get smaller.  Counters for bytes before and after, bytes
+    saved, skipped records and CPU time spent go to ``metrics`` under the
+    ``compression.`` prefix.
+    """
+
+    def __init__(self, compressor: Compressor, threshold: int = 256, metrics: Optional[Metrics] = None):
+        self.compressor = compressor
+        self.threshold = threshold
+        self.metrics = metrics or Metrics()
+
+    def compress(self, body: bytes) -> tuple:
+        """Return ``(flag, body)`` for a record body."""
+        if len(body) < self.threshold:
+            self.metrics.inc("compression.skipped")
+            return NONE, body
+        started = time.process_time()
+        compressed = self.compressor.compress(body)
+        self.metrics.inc("compression.cpu_us", int((time.process_time() - started) * 1e6))
+        if len(compressed) >= len(body):
+            self.metrics.inc("compression.skipped")
+            return NONE, body
+        self.metrics.inc("compression.bytes_in", len(body))
+        self.metrics.inc("compression.bytes_out", len(compressed))
+        self.metrics.inc("compression.bytes_saved", len(body) - len(compressed))
+        return self.compressor.flag, compressed
+
+    def decompress(self, flag: int, body: Any) -> bytes:
+        if flag != self.compressor.flag:
+            raise ValueError(f"record compressed with unexpected method {flag}")
+        started = time.process_time()
+        data = self.compressor.decompress(body)
+        self.metrics.inc("compression.cpu_us", int((time.process_time() - started) * 1e6))
+        return data
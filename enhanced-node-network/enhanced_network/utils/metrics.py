@@ -1,8 +1,84 @@
-"""Metrics collection stubs."""
+"""In-process counters, gauges and latency histograms, with snapshots for reporting."""
+import bisect
+import math
+
+
+class Histogram:
+    """Fixed-bucket histogram with constant memory.
+
+    Buckets grow geometrically from ``start`` by ``factor`` which keeps the
+    relative error of :meth:`percentile` bounded regardless of the scale.
+    """
+
+    def __init__(self, start: float = 1e-5, factor: float = 1.5, buckets: int = 48):
+        self.bounds = [start * factor ** i for i in range(buckets)]
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Return the upper bound of the bucket holding the ``q``-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100.0))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if index >= len(self.bounds):
+                    return self.max
+                return min(self.bounds[index], self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'min': self.min if self.count else 0.0,
+            'max': self.max if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
 
 class Metrics:
     def __init__(self):
         self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name: str, value: float):
+        """Record the current ``value`` of gauge ``name``."""
+        self.gauges[name] = value
+
+    def discard(self, name: str):
+        """Forget gauge ``name``, e.g. when the thing it measured went away."""
+        self.gauges.pop(name, None)
+
+    def observe(self, name: str, value: float):
+        """Add ``value`` to histogram ``name``."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
 
-    def inc(self, name: str):
-        self.counters[name] = self.counters.get(name, 0) + 1
+    def snapshot(self) -> dict:
+        """Return a copy of all recorded values."""
+        return {
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'histograms': {name: h.summary() for name, h in self.histograms.items()},
+        }
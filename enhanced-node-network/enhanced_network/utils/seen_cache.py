@@ -0,0 +1,48 @@
+"""Bounded, time-expiring cache of recently seen identifiers."""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+class SeenCache:
+    """Remember up to ``max_size`` identifiers for at most ``ttl`` seconds.
+
+    Used to drop duplicate messages.  Memory is bounded by ``max_size``; the
+    least recently added entry is evicted first and expired entries are
+    purged as new ones arrive, so every operation is amortised O(1).
+    """
+
+    def __init__(self, max_size: int = 65536, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        added = self._entries.get(key)
+        return added is not None and self._clock() - added < self.ttl
+
+    def add(self, key: Hashable) -> bool:
+        """Record ``key`` and return ``True`` if it had not been seen."""
+        now = self._clock()
+        self._expire(now)
+        if key in self._entries:
+            return False
+        self._entries[key] = now
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            key, added = next(iter(entries.items()))
+            if now - added < self.ttl:
+                break
+            del entries[key]
@@ -1,9 +1,201 @@
-"""Data serialization helpers."""
+"""Data serialization helpers.
+
+Besides the plain JSON helpers this module provides the wire codecs used by
+:class:`~enhanced_network.core.mesh_node.MeshNode`.  A codec turns a message
+dictionary into bytes and back.  Binary websocket frames carry one or more
+length-prefixed records so several messages can share a single frame::
+
+    +----------+---------+------------------+--------+
+    | codec id | flags   | length (u32, BE) | body   |
+    +----------+---------+------------------+--------+
+
+The low bits of ``flags`` name the compression applied to the body, see
+:mod:`enhanced_network.utils.compression`.  Text frames are always a single
+JSON document, which keeps nodes that only speak JSON able to talk to
+everyone else.
+"""
 import json
-from typing import Any
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+from .compression import COMPRESSION_MASK, CompressionPolicy
+
+RECORD_HEADER = struct.Struct("!BBI")
+
+Frame = Union[str, bytes]
+
 
 def serialize(data: Any) -> str:
     return json.dumps(data)
 
 def deserialize(data: str) -> Any:
     return json.loads(data)
+
+
+class Codec:
+    """Base class for wire codecs.
+
+    ``binary`` codecs are sent as length-prefixed records inside binary
+    frames, text codecs are sent as websocket text frames.
+    """
+
+    name = ""
+    codec_id = 0
+    binary = True
+
+    def encode(self, obj: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        raise NotImplementedError
+
+
+class JSONCodec(Codec):
+    """Compact JSON codec, also used as the fallback for every peer."""
+
+    name = "json"
+    codec_id = 0
+    binary = False
+
+    def encode(self, obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        return json.loads(bytes(data))
+
+
+class MsgpackCodec(Codec):
+    """MessagePack codec, available when :mod:`msgpack` is installed."""
+
+    name = "msgpack"
+    codec_id = 1
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, data: Union[bytes, memoryview]) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+_CODECS_BY_NAME: Dict[str, Codec] = {}
+_CODECS_BY_ID: Dict[int, Codec] = {}
+# Codec names ordered from most to least preferred.
+_PREFERENCE: List[str] = []
+
+
+def register_codec(codec: Codec, preferred: bool = False, negotiable: bool = True) -> None:
+    """Make ``codec`` available for negotiation.
+
+    ``preferred`` codecs are placed in front of the already registered ones.
+    Codecs that are not ``negotiable`` can only be decoded; they are used for
+    special-purpose records such as stream chunks.
+    """
+
+    existing = _CODECS_BY_ID.get(codec.codec_id)
+    if existing is not None and existing.name != codec.name:
+        raise ValueError(f"codec id {codec.codec_id} already used by {existing.name}")
+    _CODECS_BY_NAME[codec.name] = codec
+    _CODECS_BY_ID[codec.codec_id] = codec
+    if codec.name in _PREFERENCE:
+        _PREFERENCE.remove(codec.name)
+    if not negotiable:
+        return
+    if preferred:
+        _PREFERENCE.insert(0, codec.name)
+    else:
+        _PREFERENCE.append(codec.name)
+
+
+def get_codec(name: str) -> Codec:
+    """Return the registered codec called ``name``."""
+    try:
+        return _CODECS_BY_NAME[name]
+    except KeyError:
+        raise ValueError(f"unknown codec {name!r}") from None
+
+
+def available_codecs() -> List[str]:
+    """Return registered codec names, most preferred first."""
+    return list(_PREFERENCE)
+
+
+def negotiate_codec(offered: Iterable[str], supported: Optional[Iterable[str]] = None) -> str:
+    """Pick the codec to use for a connection.
+
+    The first entry of ``supported`` (defaulting to :func:`available_codecs`)
+    that the remote side also ``offered`` wins.  JSON is the fallback when
+    there is no overlap.
+    """
+
+    offered = set(offered)
+    for name in supported if supported is not None else _PREFERENCE:
+        if name in offered and name in _CODECS_BY_NAME:
+            return name
+    return JSONCodec.name
+
+
+def encode_record(codec: Codec, obj: Any, flags: int = 0, compression: Optional[CompressionPolicy] = None) -> bytes:
+    """Encode ``obj`` as a single length-prefixed record."""
+    body = codec.encode(obj)
+    if compression is not None:
+        method, body = compression.compress(body)
+        flags |= method
+    return RECORD_HEADER.pack(codec.codec_id, flags, len(body)) + body
+
+
+def encode_frame(codec: Codec, obj: Any, compression: Optional[CompressionPolicy] = None) -> Frame:
+    """Encode ``obj`` as a websocket frame for a peer using ``codec``.
+
+    Compressed messages always use binary records, even with a text codec.
+    """
+    if codec.binary or compression is not None:
+        return encode_record(codec, obj, compression=compression)
+    return codec.encode(obj).decode("utf-8")
+
+
+def iter_records(data: Union[bytes, memoryview]) -> Iterator[tuple]:
+    """Yield ``(codec, flags, body)`` for every record in a binary frame.
+
+    ``body`` is a :class:`memoryview` into ``data`` so no copies are made.
+    """
+
+    view = memoryview(data)
+    offset = 0
+    end = len(view)
+    header_size = RECORD_HEADER.size
+    while offset < end:
+        if end - offset < header_size:
+            raise ValueError("truncated record header")
+        codec_id, flags, length = RECORD_HEADER.unpack_from(view, offset)
+        offset += header_size
+        if end - offset < length:
+            raise ValueError("truncated record body")
+        codec = _CODECS_BY_ID.get(codec_id)
+        if codec is None:
+            raise ValueError(f"unknown codec id {codec_id}")
+        yield codec, flags, view[offset:offset + length]
+        offset += length
+
+
+def decode_frame(data: Frame, compression: Optional[CompressionPolicy] = None) -> Iterator[Any]:
+    """Yield every message contained in a websocket frame."""
+    if isinstance(data, str):
+        yield json.loads(data)
+        return
+    for codec, flags, body in iter_records(data):
+        method = flags & COMPRESSION_MASK
+        if method:
+            if compression is None:
+                raise ValueError("compressed record on a link without compression")
+            body = compression.decompress(method, body)
+        yield codec.decode(body)
+
+
+register_codec(JSONCodec())
+if msgpack is not None:
+    register_codec(MsgpackCodec(), preferred=True)
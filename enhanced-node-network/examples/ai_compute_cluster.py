@@ -1,14 +1,21 @@
 """Example AI compute cluster starter."""
 
 import asyncio
+import tempfile
+
 from enhanced_network.core.mesh_node import MeshNode
 
 
 async def main() -> None:
-    node = MeshNode({})
-    await node.start()
-    print(f"Compute node {node.node_id} running on port {node.listen_port}")
-    await node.stop()
+    # Model weights and inputs are cached by content and shared with peers,
+    # so a node pulls each chunk from the cluster at most once.
+    with tempfile.TemporaryDirectory(prefix="compute-chunks-") as cache_dir:
+        node = MeshNode({"chunk_store": {"directory": cache_dir, "max_bytes": 8 * 1024 ** 3}})
+        await node.start()
+        print(f"Compute node {node.node_id} running on port {node.listen_port}")
+        manifest = node.chunks.store.put_blob(b"\0" * (4 * 1024 * 1024))
+        print(f"Cached {len(manifest)} chunks in {cache_dir}")
+        await node.stop()
 
 
 if __name__ == "__main__":
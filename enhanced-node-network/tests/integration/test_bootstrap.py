@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.discovery.bootstrap import Bootstrapper, websocket_probe
+
+
+@pytest.mark.asyncio
+async def test_cold_bootstrap_probes_and_warm_restart_uses_peer_book(tmp_path):
+    seeds = [MeshNode({"listen_port": 9300 + i}) for i in range(3)]
+    for seed in seeds:
+        await seed.start()
+    book = str(tmp_path / "peers.json")
+    sources = ["localhost:9300", "localhost:9301", "localhost:9302", "localhost:9309"]
+    probed = []
+
+    async def probe(address, timeout):
+        probed.append(address)
+        return await websocket_probe(address, timeout)
+
+    node = MeshNode({"listen_port": 9303})
+    await node.start()
+    connected = await Bootstrapper(node, sources, peer_book=book, want=2, deadline=1.0, probe=probe).run()
+    assert len(connected) == 2
+    assert sorted(probed) == sorted(sources)
+    await node.stop()
+
+    probed.clear()
+    node = MeshNode({"listen_port": 9303})
+    await node.start()
+    connected = await Bootstrapper(node, sources, peer_book=book, want=2, deadline=1.0, probe=probe).run()
+    assert len(connected) == 2
+    assert probed == []
+    assert node.metrics.counters["bootstrap.warm_connects"] == 2
+    await node.stop()
+    for seed in seeds:
+        await seed.stop()
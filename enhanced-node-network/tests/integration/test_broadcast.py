@@ -0,0 +1,33 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import BROADCAST, MeshNode
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_peer_with_one_message_id():
+    hub = MeshNode({"listen_port": 9206})
+    leaves = [MeshNode({"listen_port": port}) for port in (9207, 9208, 9209)]
+    received = []
+    done = asyncio.Event()
+
+    async def handler(message):
+        received.append(message)
+        if len(received) == len(leaves):
+            done.set()
+
+    for leaf in leaves:
+        leaf.register_message_handler("announce", handler)
+    await asyncio.gather(hub.start(), *(leaf.start() for leaf in leaves))
+    for leaf in leaves:
+        await hub.connect_to_peer(f"localhost:{leaf.listen_port}")
+
+    delivered = await hub.broadcast_message("announce", {"height": 42})
+    assert delivered == len(leaves)
+    await asyncio.wait_for(done.wait(), 2)
+    assert len({m.message_id for m in received}) == 1
+    assert all(m.recipient_id == BROADCAST for m in received)
+    await asyncio.gather(hub.stop(), *(leaf.stop() for leaf in leaves))
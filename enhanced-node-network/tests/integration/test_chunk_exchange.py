@@ -0,0 +1,91 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+def _node(port, directory):
+    return MeshNode({"listen_port": port, "chunk_store": {"directory": str(directory), "chunk_size": 64 * 1024}})
+
+
+@pytest.mark.asyncio
+async def test_fetch_chunks_from_several_peers(tmp_path):
+    seeds = [_node(9280, tmp_path / "a"), _node(9281, tmp_path / "b")]
+    leecher = _node(9282, tmp_path / "c")
+    await asyncio.gather(*(n.start() for n in seeds + [leecher]))
+    blob = os.urandom(1024 * 1024)
+    manifest = seeds[0].chunks.store.put_blob(blob)
+    assert seeds[1].chunks.store.put_blob(blob) == manifest
+    for port in (9280, 9281):
+        await leecher.connect_to_peer(f"localhost:{port}")
+    await asyncio.sleep(0.05)
+
+    holders = await leecher.chunks.locate(manifest[:1])
+    assert sorted(holders[manifest[0]]) == sorted(n.node_id for n in seeds)
+
+    assert await leecher.chunks.fetch_blob(manifest) == blob
+    counters = leecher.metrics.counters
+    for seed in seeds:
+        assert counters[f"chunks.fetched_from.{seed.node_id}"] > 0
+
+    served = sum(s.metrics.counters.get("chunks.served", 0) for s in seeds)
+    await leecher.chunks.fetch(manifest)
+    assert sum(s.metrics.counters.get("chunks.served", 0) for s in seeds) == served
+    assert counters["chunks.local_hits"] == len(manifest)
+    await asyncio.gather(*(n.stop() for n in seeds + [leecher]))
+
+
+@pytest.mark.asyncio
+async def test_missing_chunk_raises_key_error(tmp_path):
+    node1 = _node(9283, tmp_path / "a")
+    node2 = _node(9284, tmp_path / "b")
+    await asyncio.gather(node1.start(), node2.start())
+    await node1.connect_to_peer("localhost:9284")
+    with pytest.raises(KeyError):
+        await node1.chunks.fetch(["f" * 64])
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_fetch_resumes_from_another_holder_when_one_dies(tmp_path):
+    def node(port, name):
+        return MeshNode({"listen_port": port, "chunk_store": {"directory": str(tmp_path / name)},
+                         "chunk_exchange": {"fetch_timeout": 0.5},
+                         "streams": {"chunk_size": 16 * 1024, "window": 4}})
+
+    first, second, leecher = node(9332, "a"), node(9333, "b"), node(9334, "c")
+    await asyncio.gather(first.start(), second.start(), leecher.start())
+    blob = os.urandom(512 * 1024)
+    (digest,) = first.chunks.store.put_blob(blob)
+    second.chunks.store.put_blob(blob)
+    for port in (9332, 9333):
+        await leecher.connect_to_peer(f"localhost:{port}")
+    enqueue = first._enqueue
+    sent = 0
+
+    async def die_partway(peer, frame):
+        nonlocal sent
+        sent += 1
+        if sent == 8:
+            asyncio.ensure_future(first.stop())
+            return False
+        return await enqueue(peer, frame)
+
+    first._enqueue = die_partway
+    # Ask the doomed holder first.
+    leecher.chunks.locate = _holders_in_order([first.node_id, second.node_id])
+    assert await asyncio.wait_for(leecher.chunks.fetch_blob([digest]), 10) == blob
+    assert leecher.metrics.counters["chunks.fetch_failures"] == 1
+    assert leecher.metrics.counters[f"chunks.fetched_from.{second.node_id}"] == 1
+    assert second.metrics.counters["streams.resumed"] == 1
+    await asyncio.gather(second.stop(), leecher.stop())
+
+
+def _holders_in_order(peers):
+    async def locate(digests, *args, **kwargs):
+        return {digest: list(peers) for digest in digests}
+    return locate
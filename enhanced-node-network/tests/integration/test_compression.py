@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.utils.serialization import encode_record
+
+
+@pytest.mark.asyncio
+async def test_nodes_compress_records_when_dictionaries_match():
+    dictionary = b'{"model_name":"llama-7b","input_ids":[' * 8
+    config = {"compression": {"method": "zlib", "threshold": 64, "dictionary": dictionary}}
+    node1 = MeshNode(dict(config, listen_port=9242))
+    node2 = MeshNode(dict(config, listen_port=9243))
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node2.register_message_handler("inference_request", handler)
+    await asyncio.gather(node1.start(), node2.start())
+    peer_id = await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    assert peer_id in node1.peer_compression
+    # Records are compressed already, so the link stops deflating them.
+    assert node1.connections[peer_id].extensions == []
+    assert node2.connections[node1.node_id].extensions == []
+
+    payload = {"model_name": "llama-7b", "input_ids": [7] * 2000}
+    await node1.send_message(peer_id, "inference_request", payload)
+    message = await asyncio.wait_for(received, 2)
+    assert message.payload == payload
+    assert node1.compression_stats()["bytes_saved"] > 1000
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_mismatched_dictionary_disables_compression():
+    node1 = MeshNode({"listen_port": 9244, "compression": {"dictionary": b"one" * 10}})
+    node2 = MeshNode({"listen_port": 9245, "compression": {"dictionary": b"two" * 10}})
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node2.register_message_handler("greeting", handler)
+    await asyncio.gather(node1.start(), node2.start())
+    peer_id = await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    assert peer_id not in node1.peer_compression
+    # Without record compression the link keeps permessage-deflate.
+    assert [e.name for e in node1.connections[peer_id].extensions] == ["permessage-deflate"]
+    await node1.send_message(peer_id, "greeting", {"text": "z" * 1000})
+    message = await asyncio.wait_for(received, 2)
+    assert message.payload["text"] == "z" * 1000
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_corrupt_compressed_record_is_dropped_not_fatal():
+    config = {"compression": {"method": "zlib", "threshold": 16}}
+    node1 = MeshNode(dict(config, listen_port=9322))
+    node2 = MeshNode(dict(config, listen_port=9323))
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node2.register_message_handler("greeting", handler)
+    await asyncio.gather(node1.start(), node2.start())
+    peer_id = await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    codec = node1.peer_codecs[peer_id]
+    record = bytearray(encode_record(codec, {"type": "x" * 200}, compression=node1.compression))
+    record[-8:] = b"garbage!"
+    await node1.connections[peer_id].send(bytes(record))
+    await node1.send_message(peer_id, "greeting", {"text": "still here"})
+    message = await asyncio.wait_for(received, 2)
+    assert message.payload == {"text": "still here"}
+    assert node2.metrics.counters["frames.rejected"] == 1
+    await asyncio.gather(node1.stop(), node2.stop())
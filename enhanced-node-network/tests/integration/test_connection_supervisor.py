@@ -0,0 +1,97 @@
+import asyncio
+import json
+import random
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+from enhanced_network.core.connection_supervisor import ConnectionSupervisor
+from enhanced_network.core.mesh_node import MeshNode
+
+FAST = {"base_delay": 0.05, "max_delay": 0.2, "check_interval": 0.02, "heartbeat_interval": 0.05,
+        "heartbeat_timeout": 0.05, "max_missed": 2}
+
+
+def test_backoff_is_jittered_and_capped():
+    supervisor = ConnectionSupervisor(MeshNode({}), base_delay=1.0, max_delay=8.0, rng=random.Random(3))
+    delays = [supervisor.backoff(failures) for failures in range(10) for _ in range(20)]
+    assert all(0 <= delay <= 8.0 for delay in delays)
+    assert len(set(delays)) > 100
+    # Days of failures must not overflow the exponent.
+    assert 0 <= supervisor.backoff(5000) <= 8.0
+
+
+async def _wait_for(predicate, timeout=3.0):
+    for _ in range(int(timeout / 0.02)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return predicate()
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_dials_in_flight():
+    node = MeshNode({})
+    dialling, connected = asyncio.Event(), []
+
+    async def slow_connect(address):
+        dialling.set()
+        await asyncio.sleep(0.2)
+        connected.append(address)
+        return "node-x"
+
+    node.connect_to_peer = slow_connect
+    supervisor = ConnectionSupervisor(node, ["localhost:1"], **FAST)
+    supervisor.start()
+    await asyncio.wait_for(dialling.wait(), 1)
+    await supervisor.stop()
+    await asyncio.sleep(0.3)
+    assert connected == []
+    assert not supervisor.targets["localhost:1"].connecting
+
+
+@pytest.mark.asyncio
+async def test_supervisor_reconnects_after_peer_restart():
+    server = MeshNode({"node_id": "node-s", "listen_port": 9238})
+    client = MeshNode({"node_id": "node-c", "listen_port": 9239, "peers": ["localhost:9238"], "supervisor": FAST})
+    await client.start()
+    await asyncio.sleep(0.1)
+    assert "node-s" not in client.connections
+
+    await server.start()
+    assert await _wait_for(lambda: "node-s" in client.connections)
+    assert await _wait_for(lambda: "node-s" in client.supervisor.rtt)
+
+    await server.stop()
+    assert await _wait_for(lambda: "node-s" not in client.connections)
+    server = MeshNode({"node_id": "node-s", "listen_port": 9238})
+    await server.start()
+    assert await _wait_for(lambda: "node-s" in client.connections)
+    await asyncio.gather(client.stop(), server.stop())
+
+
+@pytest.mark.asyncio
+async def test_unresponsive_peer_is_evicted():
+    server = MeshNode({"node_id": "node-s", "listen_port": 9240})
+    client = MeshNode({"node_id": "node-c", "listen_port": 9241, "supervisor": FAST})
+    server.message_handlers.pop("heartbeat")
+    await asyncio.gather(server.start(), client.start())
+    await client.connect_to_peer("localhost:9240")
+
+    assert await _wait_for(lambda: "node-s" not in client.connections)
+    assert client.metrics.counters["supervisor.evictions"] == 1
+    await asyncio.gather(client.stop(), server.stop())
+
+
+@pytest.mark.asyncio
+async def test_legacy_peers_are_not_heartbeated_or_evicted():
+    server = MeshNode({"node_id": "node-s", "listen_port": 9321, "supervisor": FAST})
+    await server.start()
+    async with websockets.connect("ws://localhost:9321") as legacy:
+        await legacy.send(json.dumps({"type": "hello"}))
+        assert await _wait_for(lambda: len(server.connections) == 1)
+        await asyncio.sleep(0.3)
+        assert len(server.connections) == 1
+        assert "supervisor.missed_heartbeats" not in server.metrics.counters
+    await server.stop()
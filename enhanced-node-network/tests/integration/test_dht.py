@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+async def test_dht_locates_services_across_the_mesh():
+    nodes = [MeshNode({"listen_port": 9285 + i, "dht": {"k": 4}}) for i in range(4)]
+    await asyncio.gather(*(n.start() for n in nodes))
+    # A line a-b-c-d: a and d only reach each other through the mesh.
+    for left, right in zip(nodes, nodes[1:]):
+        await left.connect_to_peer(f"localhost:{right.listen_port}")
+    await asyncio.sleep(0.3)
+
+    replicas = await nodes[3].dht.put("service:inference", {"node": nodes[3].node_id})
+    assert replicas >= 1
+    assert await nodes[0].dht.get("service:inference") == {"node": nodes[3].node_id}
+    info = await nodes[0].dht.locate_node(nodes[3].node_id)
+    assert info["node_id"] == nodes[3].node_id
+    await asyncio.gather(*(n.stop() for n in nodes))
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+pytest.importorskip("cryptography")
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.security.authentication import Authenticator
+
+TOKENS = {"alpha": "alpha-secret", "beta": "beta-secret"}
+
+
+def _node(node_id, port, **encryption):
+    return MeshNode({"node_id": node_id, "listen_port": port, "encryption": encryption})
+
+
+def _signing_key() -> str:
+    return Ed25519PrivateKey.generate().private_bytes(
+        serialization.Encoding.Raw, serialization.PrivateFormat.Raw, serialization.NoEncryption()).hex()
+
+
+async def _exchange(node1, node2, payload):
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node2.register_message_handler("secret", handler)
+    peer_id = await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    await node1.send_message(peer_id, "secret", payload)
+    return peer_id, await asyncio.wait_for(received, 2)
+
+
+@pytest.mark.asyncio
+async def test_token_authenticated_link_is_encrypted():
+    node1 = _node("alpha", 9246, authenticator=Authenticator(TOKENS), required=True, offload_threshold=1024)
+    node2 = _node("beta", 9247, authenticator=Authenticator(TOKENS), required=True, offload_threshold=1024)
+    await asyncio.gather(node1.start(), node2.start())
+    payload = {"blob": "x" * 5000}
+    peer_id, message = await _exchange(node1, node2, payload)
+    assert peer_id == "beta"
+    assert message.payload == payload
+    assert "beta" in node1.peer_ciphers and "alpha" in node2.peer_ciphers
+    assert node1.metrics.counters["encryption.offloaded"] >= 1
+    reply = await node2.request("alpha", "heartbeat", {})
+    assert "time" in reply
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_wrong_token_is_rejected():
+    node1 = _node("alpha", 9248, authenticator=Authenticator({"alpha": "forged", "beta": "beta-secret"}))
+    node2 = _node("beta", 9249, authenticator=Authenticator(TOKENS))
+    await asyncio.gather(node1.start(), node2.start())
+    await node1.connect_to_peer("localhost:9249")
+    await asyncio.sleep(0.1)
+    assert "alpha" not in node2.connections
+    assert node2.metrics.counters["encryption.auth_failures"] == 1
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+def _public_key(signing_key: str) -> str:
+    return Ed25519PrivateKey.from_private_bytes(bytes.fromhex(signing_key)).public_key().public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex()
+
+
+@pytest.mark.asyncio
+async def test_node_keys_authenticate_and_plaintext_peer_is_refused():
+    alpha_key, beta_key = _signing_key(), _signing_key()
+    trusted = {"alpha": _public_key(alpha_key), "beta": _public_key(beta_key)}
+    node1 = _node("alpha", 9254, signing_key=alpha_key, trusted_keys=trusted, required=True)
+    node2 = _node("beta", 9255, signing_key=beta_key, trusted_keys=trusted, required=True)
+    plain = MeshNode({"node_id": "gamma", "listen_port": 9256})
+    await asyncio.gather(node1.start(), node2.start(), plain.start())
+    _, message = await _exchange(node1, node2, {"n": 1})
+    assert message.payload == {"n": 1}
+    assert node1.peers["beta"].public_key == node2.link_security.public_key
+
+    with pytest.raises(ConnectionError):
+        await node1.connect_to_peer("localhost:9256")
+    with pytest.raises(ConnectionError):
+        await plain.connect_to_peer("localhost:9255")
+    assert "gamma" not in node2.connections
+    await asyncio.gather(node1.stop(), node2.stop(), plain.stop())
+
+
+def test_signed_links_need_pinned_keys_or_explicit_tofu():
+    with pytest.raises(ValueError):
+        _node("alpha", 9324, signing_key=_signing_key())
+
+
+@pytest.mark.asyncio
+async def test_trust_on_first_use_pins_the_first_key_seen():
+    node1 = _node("alpha", 9324, signing_key=_signing_key(), trust_on_first_use=True)
+    node2 = _node("beta", 9325, signing_key=_signing_key(), trust_on_first_use=True)
+    await asyncio.gather(node1.start(), node2.start())
+    _, message = await _exchange(node1, node2, {"n": 1})
+    assert message.payload == {"n": 1}
+    assert node2.link_security.trusted_keys["alpha"] == node1.link_security.public_key
+    await node1.stop()
+
+    # Someone else claiming to be alpha with a fresh key is refused.
+    impostor = _node("alpha", 9326, signing_key=_signing_key(), trust_on_first_use=True)
+    await impostor.start()
+    await impostor.connect_to_peer("localhost:9325")
+    await asyncio.sleep(0.1)
+    assert "alpha" not in node2.connections
+    assert node2.metrics.counters["encryption.auth_failures"] == 1
+    await asyncio.gather(node2.stop(), impostor.stop())
@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.coordination.blockchain_sync import BlockchainSync
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+async def test_gossip_broadcast_reaches_nodes_beyond_neighbours():
+    ports = range(9231, 9237)
+    nodes = [
+        MeshNode({"node_id": f"node-{i}", "listen_port": port, "broadcast_mode": "gossip",
+                  "gossip": {"fanout": 2, "interval": 0.05}})
+        for i, port in enumerate(ports)
+    ]
+    received = {node.node_id: [] for node in nodes}
+    for node in nodes:
+        node.register_message_handler(
+            "block_announce", lambda message, node_id=node.node_id: received[node_id].append(message.payload)
+        )
+    await asyncio.gather(*(n.start() for n in nodes))
+    # A ring: most nodes are not neighbours of node-0.
+    for i, node in enumerate(nodes):
+        await node.connect_to_peer(f"localhost:{nodes[(i + 1) % len(nodes)].listen_port}")
+    await asyncio.sleep(0.1)
+
+    await BlockchainSync(nodes[0]).broadcast_block({"height": 1})
+    for _ in range(40):
+        if all(received[n.node_id] for n in nodes[1:]):
+            break
+        await asyncio.sleep(0.05)
+    assert all(received[n.node_id] == [{"height": 1}] for n in nodes[1:])
+    assert received["node-0"] == []
+    await asyncio.gather(*(n.stop() for n in nodes))
+
+
+@pytest.mark.asyncio
+async def test_anti_entropy_sends_bodies_only_for_unseen_ids():
+    a = MeshNode({"node_id": "a", "listen_port": 9319, "broadcast_mode": "gossip",
+                  "gossip": {"interval": 0, "digest_size": 8}})
+    b = MeshNode({"node_id": "b", "listen_port": 9320, "broadcast_mode": "gossip",
+                  "gossip": {"interval": 0, "digest_size": 2}})
+    await asyncio.gather(a.start(), b.start())
+    await a.connect_to_peer("localhost:9320")
+    for height in range(8):
+        await a.gossip.publish("block_announce", {"height": height})
+    await asyncio.sleep(0.1)
+    assert len(b.gossip.seen) == 8
+    # b's digest is shorter than a's, but everything a lists has been seen.
+    await b.gossip.exchange("a")
+    await a.gossip.exchange("b")
+    assert a.metrics.counters.get("gossip.repaired", 0) == 0
+    assert b.metrics.counters.get("gossip.repaired", 0) == 0
+
+    # Messages b never saw are pulled by id.
+    await b.close_connection("a")
+    await a.gossip.publish("block_announce", {"height": 8})
+    await a.connect_to_peer("localhost:9320")
+    await asyncio.sleep(0.05)
+    await b.gossip.exchange("a")
+    assert b.metrics.counters["gossip.repaired"] == 1
+    await asyncio.gather(a.stop(), b.stop())
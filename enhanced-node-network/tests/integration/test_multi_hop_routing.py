@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+async def _line(ports):
+    nodes = [MeshNode({"node_id": f"node-{i}", "listen_port": port}) for i, port in enumerate(ports)]
+    await asyncio.gather(*(n.start() for n in nodes))
+    for left, right in zip(nodes, nodes[1:]):
+        await left.connect_to_peer(f"localhost:{right.listen_port}")
+    await asyncio.sleep(0.2)
+    return nodes
+
+
+@pytest.mark.asyncio
+async def test_messages_reach_non_neighbours():
+    nodes = await _line([9224, 9225, 9226, 9227])
+    first, last = nodes[0], nodes[-1]
+    assert last.node_id not in first.connections
+    assert first.topology.next_hop(first.node_id, last.node_id) == "node-1"
+
+    last.register_request_handler("whoami", lambda message: {"node": "node-3", "ttl": message.ttl})
+    reply = await first.request(last.node_id, "whoami", {}, timeout=2)
+    assert reply["node"] == "node-3"
+    assert reply["ttl"] == first.max_hops - 2
+    assert nodes[1].metrics.counters["routing.forwarded"] >= 1
+    await asyncio.gather(*(n.stop() for n in nodes))
+
+
+@pytest.mark.asyncio
+async def test_hop_limit_stops_forwarding():
+    nodes = await _line([9228, 9229, 9230])
+    received = []
+    nodes[2].register_message_handler("probe", lambda message: received.append(message))
+    nodes[0].max_hops = 1
+    await nodes[0].send_message("node-2", "probe", {})
+    await asyncio.sleep(0.1)
+    assert received == []
+    assert nodes[1].metrics.counters["routing.ttl_expired"] == 1
+    await asyncio.gather(*(n.stop() for n in nodes))
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.core.peer_discovery import PeerDiscovery
+from enhanced_network.discovery.multicast import MulticastDiscovery
+
+LOOPBACK = {"interface": "127.0.0.1", "port": 47791, "interval": 0.2, "min_interval": 0.05}
+
+
+async def _start_or_skip(backend):
+    try:
+        await backend.start()
+    except OSError as exc:
+        pytest.skip(f"multicast unavailable: {exc}")
+
+
+@pytest.mark.asyncio
+async def test_beacons_merge_into_discover_and_expire():
+    backends = [MulticastDiscovery(f"n{i}", f"localhost:{9310 + i}", **LOOPBACK) for i in range(3)]
+    for backend in backends:
+        await _start_or_skip(backend)
+    discovery = PeerDiscovery({"bootstrap_nodes": ["seed:9000"]}, backends[0])
+    deadline = asyncio.get_event_loop().time() + 3
+    while len(await discovery.discover()) < 3:
+        assert asyncio.get_event_loop().time() < deadline
+        await asyncio.sleep(0.05)
+    assert sorted(await discovery.discover()) == ["localhost:9311", "localhost:9312", "seed:9000"]
+
+    await backends[2].stop()
+    deadline = asyncio.get_event_loop().time() + 3
+    while "localhost:9312" in await discovery.discover():
+        assert asyncio.get_event_loop().time() < deadline
+        await asyncio.sleep(0.05)
+    # Beacons are rate limited however often they are asked for.
+    backends[0].min_interval = 60
+    sent = backends[0].beacons_sent
+    for _ in range(5):
+        backends[0].beacon()
+    assert backends[0].beacons_sent <= sent + 1
+    for backend in backends[:2]:
+        await backend.stop()
+
+
+@pytest.mark.asyncio
+async def test_overlay_connects_to_lan_peers_without_bootstrap_nodes():
+    config = lambda port: {  # noqa: E731
+        "listen_port": port,
+        "endpoints": [f"localhost:{port}"],
+        "multicast": dict(LOOPBACK, port=47792),
+        "overlay": {"min_degree": 1, "max_degree": 2, "interval": 0.1},
+    }
+    nodes = [MeshNode(config(9313 + i)) for i in range(2)]
+    try:
+        await nodes[0].discovery.local.start()
+    except OSError as exc:
+        pytest.skip(f"multicast unavailable: {exc}")
+    await nodes[0].discovery.local.stop()
+    await asyncio.gather(*(n.start() for n in nodes))
+    deadline = asyncio.get_event_loop().time() + 5
+    while nodes[1].node_id not in nodes[0].connections:
+        assert asyncio.get_event_loop().time() < deadline
+        await asyncio.sleep(0.05)
+    await asyncio.gather(*(n.stop() for n in nodes))
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+def _config(port, bootstrap):
+    return {
+        "listen_port": port,
+        "endpoints": [f"localhost:{port}"],
+        "bootstrap_nodes": bootstrap,
+        "overlay": {"min_degree": 2, "max_degree": 3, "interval": 0.1, "cooldown": 2.0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_overlay_keeps_degrees_in_band_and_drains_bootstrap():
+    bootstrap = MeshNode(_config(9292, []))
+    await bootstrap.start()
+    nodes = [MeshNode(_config(9293 + i, ["localhost:9292"])) for i in range(7)]
+    await asyncio.gather(*(n.start() for n in nodes))
+
+    def settled():
+        if len(bootstrap.connections) > 3:
+            return False
+        if any(not 2 <= len(n.connections) <= 3 for n in nodes):
+            return False
+        return not nodes[0].topology.is_partitioned()
+
+    deadline = asyncio.get_event_loop().time() + 10
+    while not settled():
+        assert asyncio.get_event_loop().time() < deadline, (
+            len(bootstrap.connections), [len(n.connections) for n in nodes], nodes[0].topology.components())
+        await asyncio.sleep(0.1)
+    # Joined nodes drain away from the bootstrap node, or it sheds them itself.
+    assert (sum(n.metrics.counters.get("overlay.bootstrap_drained", 0) for n in nodes)
+            + bootstrap.metrics.counters.get("overlay.dropped", 0)) > 0
+    await asyncio.gather(*(n.stop() for n in nodes + [bootstrap]))
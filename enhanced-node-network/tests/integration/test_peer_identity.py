@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+websockets = pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+async def test_connections_are_indexed_by_node_id():
+    node1 = MeshNode({"node_id": "node-a", "listen_port": 9218, "capabilities": ["gpu"]})
+    node2 = MeshNode({"node_id": "node-b", "listen_port": 9219})
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node1.register_message_handler("hello", handler)
+    await asyncio.gather(node1.start(), node2.start())
+    assert await node1.connect_to_peer(f"localhost:{node2.listen_port}") == "node-b"
+    await asyncio.sleep(0.05)
+
+    assert list(node1.connections) == ["node-b"]
+    assert list(node2.connections) == ["node-a"]
+    assert node2.peers["node-a"].capabilities == ["gpu"]
+
+    before = node2.peers["node-a"].last_seen
+    await node2.send_message("node-a", "hello", {})
+    message = await asyncio.wait_for(received, 2)
+    assert message.sender_id == "node-b"
+    await node1.send_message("node-b", "ping", {})
+    await asyncio.sleep(0.05)
+    assert node2.peers["node-a"].last_seen > before
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_duplicate_links_collapse_to_one():
+    node1 = MeshNode({"node_id": "node-a", "listen_port": 9220})
+    node2 = MeshNode({"node_id": "node-b", "listen_port": 9221})
+    await asyncio.gather(node1.start(), node2.start())
+    await asyncio.gather(
+        node1.connect_to_peer(f"localhost:{node2.listen_port}"),
+        node2.connect_to_peer(f"localhost:{node1.listen_port}"),
+        node1.connect_to_peer(f"localhost:{node2.listen_port}"),
+    )
+    await asyncio.sleep(0.1)
+
+    assert list(node1.connections) == ["node-b"]
+    assert list(node2.connections) == ["node-a"]
+    # Both ends kept the link dialed by the node with the smaller id.
+    assert node1._outbound["node-b"] is True
+    assert node2._outbound["node-a"] is False
+    await asyncio.gather(node1.stop(), node2.stop())
+
+
+@pytest.mark.asyncio
+async def test_peer_marked_offline_after_disconnect():
+    node1 = MeshNode({"node_id": "node-a", "listen_port": 9222})
+    node2 = MeshNode({"node_id": "node-b", "listen_port": 9223})
+    await asyncio.gather(node1.start(), node2.start())
+    await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    await node2.stop()
+    await asyncio.sleep(0.05)
+    assert "node-b" not in node1.connections
+    assert node1.peers["node-b"].status == "offline"
+    await node1.stop()
+
+
+@pytest.mark.asyncio
+async def test_malformed_handshake_reply_is_a_connection_error():
+    replies = iter([b"", "not json", b"\x01\x00\x00\x00\x00\x05[1,2]", '{"type": "handshake_ack"}'])
+    closed = []
+
+    async def server(websocket, path=None):
+        await websocket.recv()
+        await websocket.send(next(replies))
+        await websocket.wait_closed()
+        closed.append(True)
+
+    node = MeshNode({"listen_port": 9335})
+    async with websockets.serve(server, "localhost", 9336):
+        for _ in range(4):
+            with pytest.raises(ConnectionError):
+                await node.connect_to_peer("localhost:9336")
+        await asyncio.sleep(0.05)
+    assert len(closed) == 4
+    assert node.connections == {}
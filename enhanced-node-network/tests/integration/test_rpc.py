@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.coordination.blockchain_sync import BlockchainSync
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_get_their_own_replies():
+    client = MeshNode({"listen_port": 9210})
+    server = MeshNode({"listen_port": 9211})
+
+    async def echo(message):
+        await asyncio.sleep(0.001 * (message.payload["n"] % 5))
+        return {"n": message.payload["n"]}
+
+    server.register_request_handler("echo", echo, mode="task", concurrency=256)
+    await asyncio.gather(client.start(), server.start())
+    peer_id = await client.connect_to_peer(f"localhost:{server.listen_port}")
+
+    replies = await asyncio.gather(*(client.request(peer_id, "echo", {"n": n}, timeout=5) for n in range(1000)))
+    assert [r["n"] for r in replies] == list(range(1000))
+    stats = client.rpc_stats()
+    assert stats["in_flight"] == 0
+    assert stats["latency"]["echo"]["count"] == 1000
+    await asyncio.gather(client.stop(), server.stop())
+
+
+@pytest.mark.asyncio
+async def test_request_times_out_and_cleans_up():
+    client = MeshNode({"listen_port": 9212})
+    server = MeshNode({"listen_port": 9213})
+    await asyncio.gather(client.start(), server.start())
+    peer_id = await client.connect_to_peer(f"localhost:{server.listen_port}")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await client.request(peer_id, "unanswered", {}, timeout=0.05)
+    assert client.rpc_stats()["in_flight"] == 0
+    assert client.rpc_stats()["timeouts"] == 1
+    await asyncio.gather(client.stop(), server.stop())
+
+
+@pytest.mark.asyncio
+async def test_pending_requests_fail_on_disconnect():
+    client = MeshNode({"listen_port": 9214})
+    server = MeshNode({"listen_port": 9215})
+    await asyncio.gather(client.start(), server.start())
+    peer_id = await client.connect_to_peer(f"localhost:{server.listen_port}")
+
+    pending = asyncio.ensure_future(client.request(peer_id, "unanswered", {}, timeout=5))
+    await asyncio.sleep(0.05)
+    await server.stop()
+    with pytest.raises(ConnectionError):
+        await asyncio.wait_for(pending, 2)
+    assert client.rpc_stats()["in_flight"] == 0
+    await client.stop()
+
+
+@pytest.mark.asyncio
+async def test_blockchain_sync_requests_do_not_interfere():
+    client = MeshNode({"listen_port": 9216})
+    server = MeshNode({"listen_port": 9217})
+    BlockchainSync(server, latest_block=lambda: {"height": 7})
+    sync = BlockchainSync(client)
+    await asyncio.gather(client.start(), server.start())
+    peer_id = await client.connect_to_peer(f"localhost:{server.listen_port}")
+
+    blocks = await asyncio.gather(*(sync.request_latest_block(peer_id) for _ in range(20)))
+    assert blocks == [{"height": 7}] * 20
+    await asyncio.gather(client.stop(), server.stop())
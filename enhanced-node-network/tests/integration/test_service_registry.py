@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+async def _wait_for(predicate, timeout=3.0):
+    deadline = asyncio.get_event_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_event_loop().time() < deadline
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_registry_changes_reach_every_node():
+    nodes = [MeshNode({"listen_port": 9289 + i, "service_registry": {"sync_interval": 0.05}}) for i in range(3)]
+    await asyncio.gather(*(n.start() for n in nodes))
+    nodes[0].services.register("ai", nodes[0].node_id, {"models": ["llama"], "gpu": True, "memory_gb": 32})
+    # A line a-b-c; c joins after the registration and gets a snapshot.
+    for left, right in zip(nodes, nodes[1:]):
+        await left.connect_to_peer(f"localhost:{right.listen_port}")
+
+    await _wait_for(lambda: nodes[2].services.query(model="llama", min_memory_gb=16))
+    nodes[0].services.heartbeat(nodes[0].node_id, load=0.7)
+    await _wait_for(lambda: nodes[2].services.get("ai", nodes[0].node_id).load == 0.7)
+    nodes[0].services.unregister("ai", nodes[0].node_id)
+    await _wait_for(lambda: not nodes[2].services.lookup("ai"))
+    await asyncio.gather(*(n.stop() for n in nodes))
@@ -0,0 +1,159 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.core.streaming import StreamChunkCodec
+
+
+async def _pair(port, **streams):
+    sender = MeshNode({"listen_port": port, "streams": streams})
+    receiver = MeshNode({"listen_port": port + 1, "streams": streams})
+    await asyncio.gather(sender.start(), receiver.start())
+    peer_id = await sender.connect_to_peer(f"localhost:{port + 1}")
+    return sender, receiver, peer_id
+
+
+def _is_chunk(frame, index=None):
+    return isinstance(frame, bytes) and frame[0] == StreamChunkCodec.codec_id and (
+        index is None or int.from_bytes(frame[22:26], "big") == index)
+
+
+@pytest.mark.asyncio
+async def test_stream_bytes_to_memory_sink():
+    sender, receiver, peer_id = await _pair(9270, chunk_size=64 * 1024, window=4)
+    completed = []
+    receiver.register_stream_handler(completed.append)
+    payload = os.urandom(3 * 1024 * 1024 + 123)
+
+    stream_id = await sender.send_stream(peer_id, memoryview(payload), {"name": "shard-0"})
+    assert len(completed) == 1
+    stream = completed[0]
+    assert stream.stream_id == stream_id
+    assert stream.metadata == {"name": "shard-0"}
+    assert bytes(stream.data) == payload
+    assert sender.metrics.counters["streams.bytes_sent"] > len(payload)
+    await asyncio.gather(sender.stop(), receiver.stop())
+
+
+@pytest.mark.asyncio
+async def test_stream_file_to_directory(tmp_path):
+    sender, receiver, peer_id = await _pair(9272, chunk_size=32 * 1024, window=8,
+                                             directory=str(tmp_path / "in"))
+    os.makedirs(tmp_path / "in")
+    source = tmp_path / "weights.bin"
+    source.write_bytes(os.urandom(1024 * 1024))
+
+    stream_id = await sender.send_stream(peer_id, str(source))
+    received = tmp_path / "in" / stream_id
+    assert received.read_bytes() == source.read_bytes()
+    assert os.listdir(tmp_path / "in") == [stream_id]
+    await asyncio.gather(sender.stop(), receiver.stop())
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_after_reconnect():
+    sender, receiver, peer_id = await _pair(9274, chunk_size=16 * 1024, window=8)
+    payload = os.urandom(512 * 1024)
+    enqueue = sender._enqueue
+    chunks = 0
+
+    async def flaky(peer, frame):
+        nonlocal chunks
+        if _is_chunk(frame):
+            chunks += 1
+            if chunks == 6:
+                for _ in range(100):
+                    streams = list(receiver.streams.incoming.values())
+                    if streams and streams[0].next_index >= 3:
+                        break
+                    await asyncio.sleep(0.01)
+                await sender.close_connection(peer)
+                return False
+        return await enqueue(peer, frame)
+
+    sender._enqueue = flaky
+    with pytest.raises(ConnectionError):
+        await sender.send_stream(peer_id, payload)
+    sender._enqueue = enqueue
+    await asyncio.sleep(0.05)
+    peer_id = await sender.connect_to_peer("localhost:9275")
+
+    stream_id = await sender.send_stream(peer_id, payload)
+    assert sender.metrics.counters["streams.resumed"] == 1
+    assert bytes(receiver.streams.incoming[stream_id].data) == payload
+    await asyncio.gather(sender.stop(), receiver.stop())
+
+
+@pytest.mark.asyncio
+async def test_another_peer_resumes_a_stalled_stream():
+    sender, receiver, peer_id = await _pair(9329, chunk_size=16 * 1024, window=8)
+    other = MeshNode({"listen_port": 9331, "streams": {"chunk_size": 16 * 1024, "window": 8}})
+    await other.start()
+    payload = os.urandom(256 * 1024)
+    enqueue = sender._enqueue
+    chunks = 0
+
+    async def stall(peer, frame):
+        nonlocal chunks
+        if _is_chunk(frame):
+            chunks += 1
+            if chunks > 4:
+                await asyncio.sleep(10)
+        return await enqueue(peer, frame)
+
+    sender._enqueue = stall
+    first = asyncio.ensure_future(sender.send_stream(peer_id, payload))
+    for _ in range(100):
+        streams = list(receiver.streams.incoming.values())
+        if streams and streams[0].next_index >= 4:
+            break
+        await asyncio.sleep(0.01)
+
+    other_id = await other.connect_to_peer("localhost:9330")
+    stream_id = await asyncio.wait_for(other.send_stream(other_id, payload), 5)
+    assert other.metrics.counters["streams.resumed"] == 1
+    assert receiver.streams.incoming[stream_id].sender_id == other.node_id
+    assert bytes(receiver.streams.incoming[stream_id].data) == payload
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    await asyncio.gather(sender.stop(), receiver.stop(), other.stop())
+
+
+@pytest.mark.asyncio
+async def test_corrupt_chunk_is_resent():
+    sender, receiver, peer_id = await _pair(9276, chunk_size=16 * 1024, window=4)
+    payload = os.urandom(200 * 1024)
+    enqueue = sender._enqueue
+    corrupted = False
+
+    async def tamper(peer, frame):
+        nonlocal corrupted
+        if not corrupted and _is_chunk(frame, index=2):
+            corrupted = True
+            frame = frame[:-1] + bytes([frame[-1] ^ 0xFF])
+        return await enqueue(peer, frame)
+
+    sender._enqueue = tamper
+    stream_id = await sender.send_stream(peer_id, payload)
+    assert receiver.metrics.counters["streams.corrupt_chunks"] == 1
+    assert bytes(receiver.streams.incoming[stream_id].data) == payload
+    await asyncio.gather(sender.stop(), receiver.stop())
+
+
+@pytest.mark.asyncio
+async def test_stream_open_rejects_bad_ids_and_sizes(tmp_path):
+    sender, receiver, peer_id = await _pair(9327, directory=str(tmp_path), max_stream_size=1024)
+    base = {"size": 10, "chunk_size": 4, "digest": "0" * 64}
+    for stream_id in ("../../etc/passwd", "A" * 32, "0" * 31):
+        reply = await sender.request(peer_id, "stream_open", {**base, "stream_id": stream_id})
+        assert reply == {"error": "invalid stream id"}
+    reply = await sender.request(peer_id, "stream_open", {**base, "stream_id": "0" * 32, "size": 1025})
+    assert reply == {"error": "stream too large"}
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(ValueError):
+        await sender.send_stream(peer_id, b"data", stream_id="../weights")
+    await asyncio.gather(sender.stop(), receiver.stop())
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+async def test_nodes_negotiate_codec_and_exchange_messages():
+    node1 = MeshNode({"listen_port": 9204})
+    node2 = MeshNode({"listen_port": 9205})
+    received = asyncio.get_event_loop().create_future()
+
+    async def handler(message):
+        received.set_result(message)
+
+    node2.register_message_handler("greeting", handler)
+    await asyncio.gather(node1.start(), node2.start())
+    peer_id = await node1.connect_to_peer(f"localhost:{node2.listen_port}")
+    assert node1.peer_codecs[peer_id].name == node1.codecs[0]
+
+    await node1.send_message(peer_id, "greeting", {"text": "hello"})
+    message = await asyncio.wait_for(received, 2)
+    assert message.payload == {"text": "hello"}
+    assert message.sender_id == node1.node_id
+    await asyncio.gather(node1.stop(), node2.stop())
@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.coordination.work_stealing import WorkStealingScheduler
+from enhanced_network.core.mesh_node import MeshNode
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("victim", ["random", "most_loaded"])
+async def test_idle_nodes_steal_from_a_backlogged_node(victim):
+    nodes = [MeshNode({"listen_port": 9316 + i, "endpoints": [f"localhost:{9316 + i}"]}) for i in range(3)]
+    await asyncio.gather(*(n.start() for n in nodes))
+    await nodes[0].connect_to_peer("localhost:9317")
+    await nodes[0].connect_to_peer("localhost:9318")
+    ran = {n.node_id: 0 for n in nodes}
+
+    def runner(node):
+        async def run_task(task):
+            ran[node.node_id] += 1
+            await asyncio.sleep(0.005)
+            if task == "boom":
+                raise ValueError(task)
+            return task * 2
+        return run_task
+
+    schedulers = [WorkStealingScheduler(n, runner(n), steal_batch=8, victim=victim, load_interval=0.05)
+                  for n in nodes]
+    for scheduler in schedulers:
+        scheduler.start()
+    futures = [schedulers[0].submit(i) for i in range(120)]
+    failing = schedulers[0].submit("boom")
+    assert await asyncio.wait_for(asyncio.gather(*futures), 10) == [i * 2 for i in range(120)]
+    with pytest.raises(RuntimeError, match="boom"):
+        await asyncio.wait_for(failing, 5)
+    assert sum(ran.values()) == 121
+    assert all(count > 0 for count in ran.values()), ran
+    assert nodes[0].metrics.counters.get("steal.tasks_out", 0) > 0
+    for scheduler in schedulers:
+        await scheduler.stop()
+    await asyncio.gather(*(n.stop() for n in nodes))
@@ -0,0 +1,15 @@
+from enhanced_network.coordination.load_balancer import STRATEGIES, simulate_balancer
+
+
+def test_balancer_tail_latency_report():
+    """Replay a heavy-tailed task stream on six laptops and two GPU boxes (8x faster)."""
+
+    speeds = {f"laptop-{i}": 1.0 for i in range(6)}
+    speeds.update({f"gpu-{i}": 8.0 for i in range(2)})
+    results = {name: simulate_balancer(name, speeds, tasks=20000, utilization=0.7) for name in STRATEGIES}
+    print()
+    for name, stats in results.items():
+        print(f"{name:>22}: mean {stats['mean']:8.2f}  p50 {stats['p50']:8.2f}  "
+              f"p95 {stats['p95']:8.2f}  p99 {stats['p99']:8.2f}")
+    for name in ("weighted_round_robin", "least_outstanding", "power_of_two", "peak_ewma"):
+        assert results[name]["p99"] < results["round_robin"]["p99"] / 10
@@ -0,0 +1,62 @@
+import json
+import time
+from dataclasses import asdict
+from datetime import datetime
+
+from enhanced_network.core.mesh_node import NetworkMessage, message_to_dict
+from enhanced_network.utils.serialization import available_codecs, decode_frame, encode_frame, get_codec
+
+MESSAGES = 5000
+
+
+def _sample_message() -> NetworkMessage:
+    return NetworkMessage(
+        message_id="5f0c6c8e-0e0b-4c38-9d3f-3c1f1a2b9e77",
+        sender_id="node-0123456789ab",
+        recipient_id="node-ba9876543210",
+        message_type="ultimate_task_request",
+        payload={
+            "type": "ai_training",
+            "config": {"model": "transformer", "epochs": 5, "dataset": "sentiment_data"},
+            "priority": 8,
+            "timeout": 300,
+            "input_ids": list(range(100, 164)),
+        },
+        timestamp=datetime.now(),
+    )
+
+
+def _measure(codec_name: str) -> tuple:
+    codec = get_codec(codec_name)
+    msg = _sample_message()
+    start = time.perf_counter()
+    size = 0
+    for _ in range(MESSAGES):
+        frame = encode_frame(codec, {"type": "network_message", "message": message_to_dict(msg)})
+        size = len(frame)
+        for _data in decode_frame(frame):
+            pass
+    elapsed = time.perf_counter() - start
+    return MESSAGES / elapsed, size
+
+
+def test_codec_throughput_report():
+    """Compare messages/sec and bytes/message for every available codec."""
+
+    msg = _sample_message()
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        text = json.dumps({"type": "network_message", "message": asdict(msg)}, default=str)
+        NetworkMessage(**json.loads(text)["message"])
+    legacy_rate = MESSAGES / (time.perf_counter() - start)
+    print(f"\nlegacy asdict+json: {legacy_rate:,.0f} msg/s, {len(text)} B/msg")
+
+    results = {}
+    for name in available_codecs():
+        rate, size = _measure(name)
+        results[name] = (rate, size)
+        print(f"{name:>8}: {rate:,.0f} msg/s, {size} B/msg")
+
+    assert results["json"][0] > 0
+    if "msgpack" in results:
+        assert results["msgpack"][1] < results["json"][1]
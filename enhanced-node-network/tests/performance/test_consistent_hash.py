@@ -0,0 +1,38 @@
+import random
+import statistics
+from collections import Counter
+
+from enhanced_network.coordination.load_balancer import ConsistentHashBalancer
+
+
+def test_consistent_hash_remap_and_skew_report():
+    """Report keys moved on membership changes and load skew with and without bounded loads."""
+
+    keys = [f"key-{i}" for i in range(100_000)]
+    print()
+    for vnodes in (10, 100, 400):
+        ring = ConsistentHashBalancer([f"n{i}" for i in range(20)], vnodes=vnodes, load_factor=None)
+        before = {key: ring.lookup(key) for key in keys}
+        counts = Counter(before.values())
+        skew = max(counts.values()) / statistics.mean(counts.values())
+        ring.add_node("n20")
+        added = sum(ring.lookup(key) != before[key] for key in keys) / len(keys)
+        ring.remove_node("n20")
+        ring.remove_node("n0")
+        removed = sum(ring.lookup(key) != before[key] for key in keys) / len(keys)
+        print(f"vnodes {vnodes:>3}: max/mean load {skew:.2f}, moved on add {added:.3f}, "
+              f"on remove {removed:.3f} (ideal {1 / 21:.3f} / {1 / 20:.3f})")
+        assert added < 2 / 21 and removed < 2 / 20
+
+    # Zipf-distributed hot keys, all in flight at once.
+    rng = random.Random(5)
+    weights = [1 / (rank + 1) for rank in range(1000)]
+    stream = rng.choices(range(1000), weights, k=20_000)
+    for load_factor in (None, 1.25):
+        ring = ConsistentHashBalancer([f"n{i}" for i in range(20)], load_factor=load_factor)
+        for key in stream:
+            ring.on_dispatch(ring.choose(f"model-{key}"))
+        skew = max(ring.outstanding.values()) / statistics.mean(ring.outstanding.values())
+        print(f"zipf keys, load_factor {load_factor}: max/mean in-flight {skew:.2f}")
+        if load_factor is not None:
+            assert skew <= load_factor + 0.01
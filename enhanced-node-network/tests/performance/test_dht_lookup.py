@@ -0,0 +1,14 @@
+from enhanced_network.discovery.dht import simulate_lookups
+
+
+def test_dht_lookup_scaling_report():
+    """Report lookup hops and latency from 10 to 10,000 virtual nodes."""
+
+    print()
+    for size, lookups in ((10, 100), (100, 100), (1000, 100), (10000, 50)):
+        stats = simulate_lookups(size, lookups=lookups)
+        print(f"{size:>6} nodes: hops mean {stats['mean_hops']:.2f} max {stats['max_hops']}, "
+              f"queries {stats['mean_queries']:.1f}, latency p50 {stats['p50_latency'] * 1e3:.1f} ms "
+              f"p99 {stats['p99_latency'] * 1e3:.1f} ms")
+        assert stats["success_rate"] == 1.0
+        assert stats["max_hops"] <= max(1, stats["log2_nodes"])
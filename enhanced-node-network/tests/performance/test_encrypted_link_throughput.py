@@ -0,0 +1,57 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+pytest.importorskip("websockets")
+pytest.importorskip("cryptography")
+
+from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.security.authentication import Authenticator
+
+MESSAGES = 300
+SIZES = [256, 16 * 1024, 256 * 1024]
+
+
+async def _throughput(base_port: int, size: int, encryption) -> float:
+    # Same transport settings on both runs so only the sealing differs.
+    config = {"websocket_compression": None, "encryption": encryption}
+    sender = MeshNode(dict(config, node_id="sender", listen_port=base_port))
+    receiver = MeshNode(dict(config, node_id="receiver", listen_port=base_port + 1))
+    done = asyncio.get_event_loop().create_future()
+    count = 0
+
+    async def handler(message):
+        nonlocal count
+        count += 1
+        if count == MESSAGES and not done.done():
+            done.set_result(None)
+
+    receiver.register_message_handler("bulk", handler)
+    await asyncio.gather(sender.start(), receiver.start())
+    peer_id = await sender.connect_to_peer(f"localhost:{base_port + 1}")
+    payload = {"blob": os.urandom(size // 2).hex()}
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        await sender.send_message(peer_id, "bulk", payload)
+    await asyncio.wait_for(done, 30)
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(sender.stop(), receiver.stop())
+    return MESSAGES * size / elapsed
+
+
+@pytest.mark.asyncio
+async def test_encrypted_link_throughput_report():
+    """Compare MB/s over a plaintext and an encrypted link."""
+
+    encryption = {"authenticator": Authenticator({"sender": "s", "receiver": "r"}), "required": True}
+    print()
+    port = 9260
+    for size in SIZES:
+        plain = await _throughput(port, size, None)
+        sealed = await _throughput(port + 2, size, encryption)
+        port += 4
+        print(f"{size:>7} B: plaintext {plain / 1e6:7.1f} MB/s, encrypted {sealed / 1e6:7.1f} MB/s "
+              f"({sealed / plain:.0%})")
+        assert sealed > 0
@@ -0,0 +1,22 @@
+import math
+
+from enhanced_network.core.gossip import simulate_gossip
+
+
+def test_gossip_coverage_report():
+    """Report coverage vs rounds vs bytes for a 1,000 node overlay."""
+
+    nodes = 1000
+    print()
+    for fanout, anti_entropy in ((3, False), (4, True)):
+        history = simulate_gossip(num_nodes=nodes, degree=8, fanout=fanout, anti_entropy=anti_entropy, seed=1)
+        print(f"fanout={fanout} anti_entropy={anti_entropy}")
+        for entry in history:
+            print(f"  round {entry['round']:>2}: coverage {entry['coverage']:6.1%}, "
+                  f"{entry['messages']:>5} messages, {entry['bytes_sent'] / 1024:8.1f} KiB")
+
+    history = simulate_gossip(num_nodes=nodes, degree=8, fanout=4, anti_entropy=True, seed=1)
+    assert history[-1]["coverage"] == 1.0
+    # O(log N) rounds and at most ``fanout`` pushes per node.
+    assert len(history) <= 3 * math.ceil(math.log2(nodes))
+    assert history[-1]["messages"] <= nodes * 5
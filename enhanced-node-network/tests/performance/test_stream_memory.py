@@ -0,0 +1,40 @@
+import asyncio
+import os
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from enhanced_network.core.mesh_node import MeshNode
+
+SIZE = 32 * 1024 * 1024
+
+
+@pytest.mark.asyncio
+async def test_stream_peak_memory_report(tmp_path):
+    """Stream a file larger than the window and report throughput and peak memory."""
+
+    streams = {"chunk_size": 256 * 1024, "window": 8, "directory": str(tmp_path)}
+    sender = MeshNode({"listen_port": 9278, "streams": streams})
+    receiver = MeshNode({"listen_port": 9279, "streams": streams})
+    await asyncio.gather(sender.start(), receiver.start())
+    peer_id = await sender.connect_to_peer("localhost:9279")
+    source = tmp_path / "blob.bin"
+    with open(source, "wb") as fh:
+        for _ in range(SIZE // (1024 * 1024)):
+            fh.write(os.urandom(1024 * 1024))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    stream_id = await sender.send_stream(peer_id, str(source))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"\nstreamed {SIZE / 2**20:.0f} MiB in {elapsed:.2f}s ({SIZE / elapsed / 1e6:.0f} MB/s), "
+          f"peak traced memory {peak / 2**20:.1f} MiB")
+
+    assert os.path.getsize(tmp_path / stream_id) == SIZE
+    assert peak < SIZE / 2
+    await asyncio.gather(sender.stop(), receiver.stop())
@@ -0,0 +1,60 @@
+import random
+import time
+
+from enhanced_network.discovery.topology_manager import TopologyManager, _ShortestPathTree
+
+
+def _random_mesh(size, degree, rng):
+    tm = TopologyManager()
+    names = [f"n{i}" for i in range(size)]
+    # A ring keeps the graph connected; random chords give it mesh-like diameter.
+    for index in range(size):
+        tm.connect(names[index], names[(index + 1) % size], rtt=rng.uniform(0.001, 0.1))
+    for _ in range(size * (degree - 2) // 2):
+        tm.connect(*rng.sample(names, 2), rtt=rng.uniform(0.001, 0.1))
+    return tm, names
+
+
+def test_topology_update_and_query_cost_report():
+    """Compare incremental next-hop repair with a full rebuild on a 10,000-node mesh."""
+
+    rng = random.Random(42)
+    tm, names = _random_mesh(10_000, 6, rng)
+    started = time.perf_counter()
+    tm.next_hop(names[0], names[1])
+    build = time.perf_counter() - started
+
+    updates = 200
+    started = time.perf_counter()
+    for _ in range(updates):
+        a, b = rng.sample(names, 2)
+        if rng.random() < 0.5 and tm.neighbors(a):
+            tm.disconnect(a, rng.choice(tm.neighbors(a)))
+        else:
+            tm.connect(a, b, rtt=rng.uniform(0.001, 0.1))
+    update = (time.perf_counter() - started) / updates
+
+    queries = 100_000
+    targets = [rng.choice(names) for _ in range(queries)]
+    started = time.perf_counter()
+    for target in targets:
+        tm.next_hop(names[0], target)
+    query = (time.perf_counter() - started) / queries
+
+    started = time.perf_counter()
+    components = tm.components()
+    partition = time.perf_counter() - started
+
+    started = time.perf_counter()
+    paths = tm.k_shortest_paths(names[0], names[5000], 4)
+    multipath = time.perf_counter() - started
+
+    fresh = _ShortestPathTree(tm.links, names[0])
+    assert fresh.dist.keys() == tm._trees[names[0]].dist.keys()
+
+    print()
+    print(f"10000 nodes: full build {build * 1e3:.1f} ms, incremental update {update * 1e3:.3f} ms "
+          f"({build / update:.0f}x cheaper), next_hop {query * 1e6:.2f} us, "
+          f"components {partition * 1e3:.1f} ms ({len(components)}), 4 paths {multipath * 1e3:.1f} ms")
+    assert update < build
+    assert len(paths) == 4
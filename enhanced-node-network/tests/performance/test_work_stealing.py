@@ -0,0 +1,29 @@
+from enhanced_network.coordination.work_stealing import simulate_work_stealing
+
+
+def test_work_stealing_makespan_report():
+    """Deal 5000 Pareto-sized tasks round robin to six laptops and two GPU boxes (4x faster)."""
+
+    speeds = {f"laptop-{i}": 1.0 for i in range(6)}
+    speeds.update({f"gpu-{i}": 4.0 for i in range(2)})
+    results = {
+        "round_robin": simulate_work_stealing(speeds, steal=False),
+        "steal_random": simulate_work_stealing(speeds, victim="random"),
+        "steal_most_loaded": simulate_work_stealing(speeds, victim="most_loaded"),
+    }
+    print()
+    for name, stats in results.items():
+        print(f"{name:>18}: makespan {stats['makespan']:8.1f}  utilization {stats['utilization']:.1%}  "
+              f"steals {stats['steals']:4d}  migrated {stats['migrated']:5d}")
+    baseline = results["round_robin"]
+    for name in ("steal_random", "steal_most_loaded"):
+        assert results[name]["makespan"] < 0.6 * baseline["makespan"]
+        assert results[name]["utilization"] > 0.95 > baseline["utilization"]
+
+
+def test_work_stealing_helps_identical_nodes_with_skewed_tasks():
+    speeds = {f"node-{i}": 1.0 for i in range(8)}
+    baseline = simulate_work_stealing(speeds, steal=False)
+    stealing = simulate_work_stealing(speeds, victim="most_loaded")
+    assert stealing["makespan"] < baseline["makespan"]
+    assert stealing["utilization"] > baseline["utilization"]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from enhanced_network.discovery.bootstrap import PeerBook, load_bootstrap_peers, normalize_address, probe_peers
+
+
+def test_normalize_address():
+    assert normalize_address(" Example.COM:9000 ") == "example.com:9000"
+    assert normalize_address("ws://10.0.0.1:80/") == "10.0.0.1:80"
+    assert normalize_address("[::1]:9000") == "[::1]:9000"
+    for bad in ("example.com", "host:0", "host:70000", "bad host:1", "[nope]:1", "-x:1"):
+        assert normalize_address(bad) is None
+
+
+def test_load_bootstrap_peers_validates_and_dedupes(tmp_path):
+    listing = tmp_path / "peers.txt"
+    listing.write_text("# seeds\nhost-a:9000\n\nnot an address\nhost-b:9001  # backup\nhost-a:9000\n")
+    peers = load_bootstrap_peers(["host-c:1", str(listing), str(tmp_path / "missing.txt")])
+    assert peers == ["host-c:1", "host-a:9000", "host-b:9001"]
+
+
+def test_peer_book_ranks_and_persists(tmp_path):
+    now = [1000.0]
+    path = str(tmp_path / "book" / "peers.json")
+    book = PeerBook(path, max_entries=2, clock=lambda: now[0])
+    book.record_success("slow:1", 0.5, "n-slow")
+    book.record_success("fast:1", 0.01, "n-fast")
+    book.record_success("flaky:1", 0.001)
+    for _ in range(5):
+        book.record_failure("flaky:1")
+    assert [r.address for r in book.best()] == ["fast:1", "flaky:1", "slow:1"]
+    book.save()
+
+    reloaded = PeerBook(path, clock=lambda: now[0])
+    assert [r.address for r in reloaded.best()] == ["fast:1", "flaky:1"]
+    assert reloaded.records["fast:1"].node_id == "n-fast"
+    now[0] += 30 * 24 * 3600
+    assert PeerBook(path, clock=lambda: now[0]).records == {}
+
+
+def test_peer_book_ignores_corrupt_file(tmp_path):
+    path = tmp_path / "peers.json"
+    path.write_text("{not json")
+    assert PeerBook(str(path)).records == {}
+
+
+@pytest.mark.asyncio
+async def test_probe_peers_ranks_by_latency_within_deadline():
+    delays = {"a:1": 0.03, "b:1": 0.01, "slow:1": 5.0}
+
+    async def probe(address, timeout):
+        if address == "dead:1":
+            raise ConnectionRefusedError(address)
+        await asyncio.sleep(delays[address])
+        return delays[address]
+
+    started = asyncio.get_event_loop().time()
+    reachable, failed = await probe_peers(["a:1", "b:1", "slow:1", "dead:1"], deadline=0.2, probe=probe)
+    assert asyncio.get_event_loop().time() - started < 1.0
+    assert [address for address, _latency in reachable] == ["b:1", "a:1"]
+    assert sorted(failed) == ["dead:1", "slow:1"]
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from enhanced_network.storage.chunk_store import ChunkStore, chunk_digest
+
+
+def test_put_get_and_dedup(tmp_path):
+    store = ChunkStore(str(tmp_path), chunk_size=4)
+    digest = store.put(b"weights")
+    assert digest == chunk_digest(b"weights")
+    assert bytes(store.get(digest)) == b"weights"
+    assert store.put(b"weights") == digest
+    assert len(store) == 1 and store.size == 7
+    assert store.metrics.counters["chunk_store.dedup_hits"] == 1
+    assert store.get("0" * 64) is None
+
+
+def test_blob_manifest_shares_identical_chunks(tmp_path):
+    store = ChunkStore(str(tmp_path), chunk_size=4)
+    manifest = store.put_blob(b"abcdabcdxyz")
+    assert manifest[0] == manifest[1]
+    assert len(store) == 2
+    assert store.read_blob(manifest) == b"abcdabcdxyz"
+    source = tmp_path / "file.bin"
+    source.write_bytes(b"abcdabcdxyz")
+    assert store.put_file(str(source)) == manifest
+
+
+def test_lru_eviction_and_reload(tmp_path):
+    store = ChunkStore(str(tmp_path), max_bytes=10)
+    first = store.put(b"a" * 4)
+    second = store.put(b"b" * 4)
+    store.get(first)
+    third = store.put(b"c" * 4)
+    assert first in store and third in store and second not in store
+    assert not os.path.exists(os.path.join(str(tmp_path), second[:2], second))
+
+    reopened = ChunkStore(str(tmp_path), max_bytes=10)
+    assert set(reopened.digests()) == {first, third}
+    assert reopened.size == 8
+
+
+def test_view_unmaps_the_chunk_on_exit(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    digest = store.put(b"weights")
+    assert isinstance(store.get(digest), bytes)
+    with store.view(digest) as view:
+        assert view[:3] == b"wei"
+    with pytest.raises(ValueError):
+        view.tobytes()
+    with store.view("0" * 64) as missing:
+        assert missing is None
+
+
+@pytest.mark.asyncio
+async def test_put_async_matches_put(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    digest = await store.put_async(b"weights")
+    assert digest == chunk_digest(b"weights") and store.get(digest) == b"weights"
+    assert await store.put_async(bytearray(b"weights"), digest) == digest
+    assert len(store) == 1 and store.size == 7
+    with pytest.raises(ValueError):
+        await store.put_async(b"other", digest)
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from enhanced_network.utils.compression import (
+    NONE,
+    ZLIB,
+    CompressionPolicy,
+    ZlibCompressor,
+    create_compressor,
+    train_dictionary,
+)
+from enhanced_network.utils.serialization import decode_frame, encode_frame, get_codec
+
+
+def _sample(i):
+    return json.dumps({
+        "message_type": "inference_request",
+        "payload": {"model_name": "llama-7b", "input_ids": list(range(i, i + 32))},
+    }).encode()
+
+
+def test_zlib_roundtrip_with_dictionary():
+    dictionary = train_dictionary(_sample(i) for i in range(50))
+    plain = ZlibCompressor()
+    primed = ZlibCompressor(dictionary=dictionary)
+    body = _sample(1000)
+    assert primed.decompress(primed.compress(body)) == body
+    assert len(primed.compress(body)) < len(plain.compress(body))
+    assert primed.descriptor()["dictionary"] != plain.descriptor()["dictionary"]
+
+
+def test_policy_skips_small_and_incompressible_bodies():
+    policy = CompressionPolicy(create_compressor("zlib"), threshold=64)
+    assert policy.compress(b"x" * 10) == (NONE, b"x" * 10)
+    random_bytes = bytes(range(256))
+    assert policy.compress(random_bytes)[0] == NONE
+    flag, body = policy.compress(b"a" * 1000)
+    assert flag == ZLIB
+    assert policy.decompress(flag, body) == b"a" * 1000
+    counters = policy.metrics.counters
+    assert counters["compression.skipped"] == 2
+    assert counters["compression.bytes_saved"] == 1000 - len(body)
+
+
+def test_compressed_frames_use_records_even_for_json():
+    policy = CompressionPolicy(create_compressor("zlib"), threshold=0)
+    message = {"payload": "y" * 500}
+    frame = encode_frame(get_codec("json"), message, policy)
+    assert isinstance(frame, bytes) and len(frame) < 100
+    assert list(decode_frame(frame, policy)) == [message]
+    with pytest.raises(ValueError):
+        list(decode_frame(frame))
@@ -0,0 +1,73 @@
+import pytest
+
+pytest.importorskip("cryptography")
+
+from cryptography.exceptions import InvalidTag
+
+from enhanced_network.core import crypto_utils
+from enhanced_network.core.crypto_utils import SessionCipher, SessionCipherCache, generate_key
+
+
+def _pair(**kwargs):
+    a, b = generate_key(), generate_key()
+    return SessionCipher(a, b, **kwargs), SessionCipher(b, a, **kwargs)
+
+
+def test_session_roundtrip_and_rekey():
+    alice, bob = _pair(rekey_after=4)
+    for i in range(10):
+        assert bob.decrypt(alice.encrypt(b"m%d" % i, b"ad"), b"ad") == b"m%d" % i
+    assert alice.send_epoch == 2
+    assert bob.recv_epoch == 2
+    assert alice.decrypt(bob.encrypt(b"back")) == b"back"
+
+
+def test_encrypt_into_preallocated_buffers():
+    alice, bob = _pair()
+    out = bytearray(1024)
+    plain = bytearray(1024)
+    n = alice.encrypt_into(b"payload", out)
+    assert n == len(b"payload") + SessionCipher.overhead
+    assert bob.decrypt_into(bytes(out[:n]), plain) == 7
+    assert plain[:7] == b"payload"
+    with pytest.raises(ValueError):
+        alice.encrypt_into(b"x" * 2000, out)
+
+
+def test_into_methods_fall_back_on_older_cryptography(monkeypatch):
+    monkeypatch.setattr(crypto_utils, "_AEAD_INTO", False)
+    alice, bob = _pair()
+    out, plain = bytearray(64), bytearray(64)
+    n = alice.encrypt_into(b"payload", out)
+    assert bob.decrypt(bytes(out[:n])) == b"payload"
+    assert bob.decrypt_into(alice.encrypt(b"again"), plain) == 5
+    assert plain[:5] == b"again"
+
+
+def test_replayed_and_tampered_tokens_are_rejected():
+    alice, bob = _pair()
+    token = alice.encrypt(b"once")
+    bob.decrypt(token)
+    with pytest.raises(InvalidTag):
+        bob.decrypt(token)
+    forged = bytearray(alice.encrypt(b"twice"))
+    forged[-1] ^= 1
+    with pytest.raises(InvalidTag):
+        bob.decrypt(bytes(forged))
+
+
+def test_cipher_cache_evicts_least_recently_used():
+    cache = SessionCipherCache(max_peers=2)
+    for peer in ("a", "b"):
+        cache.set(peer, SessionCipher(generate_key(), generate_key()))
+    cache.get("a")
+    cache.set("c", SessionCipher(generate_key(), generate_key()))
+    assert "a" in cache and "c" in cache and "b" not in cache
+
+
+def test_session_refuses_one_key_for_both_directions():
+    key = generate_key()
+    with pytest.raises((TypeError, ValueError)):
+        SessionCipher(key)
+    with pytest.raises(ValueError):
+        SessionCipher(key, key)
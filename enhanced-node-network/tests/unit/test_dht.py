@@ -0,0 +1,90 @@
+import pytest
+
+from enhanced_network.discovery.dht import KademliaNode, RoutingTable, SimpleDHT, dht_id, simulate_lookups
+
+
+def test_simple_dht_still_works():
+    dht = SimpleDHT()
+    dht.put("a", 1)
+    assert dht.get("a") == 1
+
+
+def test_routing_table_buckets_are_bounded():
+    table = RoutingTable("me", k=2)
+    for index in range(200):
+        table.update(f"peer-{index}")
+    assert all(len(bucket) <= 2 for bucket in table.buckets)
+    assert all(len(cache) <= 2 for cache in table.replacements)
+    target = dht_id("peer-7")
+    closest = table.closest(target, 3)
+    assert closest == sorted(closest, key=lambda name: dht_id(name) ^ target)
+
+    victim = next(name for bucket in table.buckets for name in bucket)
+    table.remove(victim)
+    assert victim not in table
+
+
+def _network(size, **options):
+    nodes = {}
+
+    def transport_for(origin):
+        async def transport(target, method, payload):
+            if target not in nodes:
+                raise ConnectionError(target)
+            return nodes[target].handle(origin, method, payload)
+        return transport
+
+    for index in range(size):
+        name = f"n{index}"
+        nodes[name] = KademliaNode(name, transport_for(name), **options)
+    return nodes
+
+
+@pytest.mark.asyncio
+async def test_values_replicate_and_expire():
+    now = [0.0]
+    nodes = _network(30, k=4, alpha=2, clock=lambda: now[0])
+    names = list(nodes)
+    for name in names[1:]:
+        await nodes[name].bootstrap([names[0]])
+
+    replicas = await nodes["n5"].put("service:gpu", {"port": 9000}, ttl=60)
+    assert replicas == 4
+    assert await nodes["n17"].get("service:gpu") == {"port": 9000}
+
+    now[0] = 61
+    assert await nodes["n17"].get("service:gpu") is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_skips_failed_contacts_and_republishes():
+    now = [0.0]
+    nodes = _network(20, k=3, republish_interval=10, clock=lambda: now[0])
+    names = list(nodes)
+    for name in names[1:]:
+        await nodes[name].bootstrap([names[0]])
+    await nodes["n3"].put("model:llama", "n3", ttl=100)
+    holders = [name for name, node in nodes.items() if "model:llama" in node.values and name != "n3"]
+    del nodes[holders[0]]
+
+    now[0] = 11
+    assert await nodes["n3"].republish() == 1
+    assert await nodes["n9"].get("model:llama") == "n3"
+
+
+def test_remote_stores_cap_ttl_and_protect_node_records():
+    node = KademliaNode("me", None, ttl=60, clock=lambda: 0.0)
+    assert node.handle("peer", "store", {"key": "service:gpu", "value": 1, "ttl": 1e9}) == {"stored": True}
+    assert node.values["service:gpu"].expires == 60
+    assert node.handle("peer", "store", {"key": "x", "value": 1, "ttl": float("nan")}) == {"stored": False}
+    assert node.handle("mallory", "store", {"key": "node:alice", "value": {"address": "evil"}, "ttl": 60}) == {
+        "stored": False}
+    assert node.handle("alice", "store", {"key": "node:alice", "value": {"address": "ok"}, "ttl": 60}) == {
+        "stored": True}
+    assert node.values["node:alice"].value == {"address": "ok"}
+
+
+def test_simulated_lookups_use_few_hops():
+    stats = simulate_lookups(200, lookups=20, max_latency=0.001)
+    assert stats["success_rate"] == 1.0
+    assert stats["max_hops"] <= stats["log2_nodes"]
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+
+import pytest
+
+from enhanced_network.core.dispatcher import DispatchPolicy, MessageDispatcher
+
+
+@pytest.mark.asyncio
+async def test_task_mode_does_not_block_dispatch():
+    dispatcher = MessageDispatcher()
+    dispatcher.configure("slow", DispatchPolicy("task", concurrency=4))
+    release = asyncio.Event()
+    finished = []
+
+    async def slow(msg):
+        await release.wait()
+        finished.append(msg)
+
+    await asyncio.wait_for(dispatcher.dispatch("slow", slow, ("a",)), 1)
+    await asyncio.wait_for(dispatcher.dispatch("slow", slow, ("b",)), 1)
+    assert finished == []
+    release.set()
+    await asyncio.sleep(0.01)
+    assert sorted(finished) == ["a", "b"]
+    assert dispatcher.metrics.histograms["dispatch.latency.slow"].count == 2
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_sender_ordering_is_preserved():
+    dispatcher = MessageDispatcher()
+    dispatcher.configure("t", DispatchPolicy("task", concurrency=8, ordering="sender"))
+    order = []
+
+    async def handler(sender, n):
+        await asyncio.sleep(0.01 if n == 0 else 0)
+        order.append((sender, n))
+
+    for n in range(3):
+        await dispatcher.dispatch("t", handler, ("x", n), "x")
+    await asyncio.sleep(0.05)
+    assert order == [("x", 0), ("x", 1), ("x", 2)]
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_thread_mode_runs_off_the_event_loop():
+    dispatcher = MessageDispatcher()
+    dispatcher.configure("cpu", DispatchPolicy("thread"))
+    threads = []
+    await dispatcher.dispatch("cpu", lambda: threads.append(threading.current_thread()), ())
+    await asyncio.sleep(0.05)
+    assert threads and threads[0] is not threading.main_thread()
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_handler_errors_are_counted():
+    dispatcher = MessageDispatcher()
+
+    async def broken():
+        raise RuntimeError("boom")
+
+    await dispatcher.dispatch("bad", broken, ())
+    assert dispatcher.metrics.counters["dispatch.errors.bad"] == 1
+
+
+def test_invalid_policy_is_rejected():
+    with pytest.raises(ValueError):
+        DispatchPolicy("fibers")
@@ -0,0 +1,146 @@
+import random
+from collections import Counter
+
+import pytest
+
+from enhanced_network.coordination.load_balancer import (
+    ConsistentHashBalancer,
+    LeastOutstandingBalancer,
+    PeakEwmaBalancer,
+    PowerOfTwoBalancer,
+    RoundRobinBalancer,
+    WeightedRoundRobinBalancer,
+    create_balancer,
+)
+from enhanced_network.coordination.task_distributor import TaskDistributor, task_key
+
+
+def test_round_robin_cycles_and_removes_in_place():
+    rr = RoundRobinBalancer(["a", "b", "c"])
+    assert [rr.choose() for _ in range(3)] == ["a", "b", "c"]
+    rr.remove_node("a")
+    assert sorted(rr.choose() for _ in range(4)) == ["b", "b", "c", "c"]
+    rr.remove_node("b")
+    rr.remove_node("c")
+    assert rr.choose() is None
+
+
+def test_weighted_round_robin_is_proportional_and_smooth():
+    wrr = create_balancer("weighted_round_robin", {"big": 3, "small": 1})
+    assert isinstance(wrr, WeightedRoundRobinBalancer)
+    picks = [wrr.choose() for _ in range(8)]
+    assert Counter(picks) == {"big": 6, "small": 2}
+    # Interleaved, not "big, big, big, small".
+    assert "small" in picks[:4] and "small" in picks[4:]
+    wrr.remove_node("big")
+    assert {wrr.choose() for _ in range(3)} == {"small"}
+
+
+def test_least_outstanding_follows_in_flight_work():
+    lo = LeastOutstandingBalancer()
+    lo.add_node("a")
+    lo.add_node("b", weight=2)
+    for _ in range(3):
+        lo.on_dispatch(lo.choose())
+    assert lo.outstanding == {"a": 1, "b": 2}
+    lo.on_complete("b")
+    lo.on_complete("b")
+    assert lo.choose() == "b"
+    lo.remove_node("b")
+    assert lo.choose() == "a"
+
+
+def test_power_of_two_samples_by_weight_and_prefers_less_loaded():
+    p2c = PowerOfTwoBalancer(rng=random.Random(3))
+    for index in range(10):
+        p2c.add_node(f"n{index}", weight=100 if index == 0 else 1)
+    for index in range(1, 10, 2):
+        p2c.remove_node(f"n{index}")
+    counts = Counter(p2c.choose() for _ in range(2000))
+    assert counts["n0"] > 1500
+    assert not any(f"n{index}" in counts for index in range(1, 10, 2))
+
+    live = {"x": 5.0, "y": 1.0}
+    p2c = PowerOfTwoBalancer(["x", "y"], load=live.get)
+    assert {p2c.choose() for _ in range(20)} == {"y"}
+
+
+def test_peak_ewma_reacts_to_slow_nodes_at_once():
+    now = [0.0]
+    ewma = PeakEwmaBalancer(["fast", "slow"], decay=1.0, clock=lambda: now[0])
+    ewma.on_complete("fast", 0.01)
+    ewma.on_complete("slow", 1.0)
+    assert ewma.latency("slow") == 1.0
+    assert {ewma.choose() for _ in range(20)} == {"fast"}
+    now[0] = 10.0
+    ewma.on_complete("slow", 0.01)
+    assert ewma.latency("slow") == pytest.approx(0.01, rel=0.01)
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        create_balancer("random")
+
+
+@pytest.mark.asyncio
+async def test_task_distributor_reports_load_to_the_balancer():
+    balancer = LeastOutstandingBalancer()
+    distributor = TaskDistributor(balancer)
+    distributor.register_node("a")
+    distributor.register_node("b")
+    sent = []
+
+    async def send(node_id, task):
+        assert balancer.outstanding[node_id] == 1
+        sent.append(node_id)
+
+    for index in range(4):
+        await distributor.distribute({"id": index}, send)
+    assert len(sent) == 4
+    assert balancer.outstanding == {"a": 0, "b": 0}
+
+
+def test_consistent_hash_is_sticky_and_moves_few_keys():
+    ring = ConsistentHashBalancer([f"n{i}" for i in range(10)], load_factor=None)
+    keys = [f"model-{i}" for i in range(5000)]
+    before = {key: ring.choose(key) for key in keys}
+    assert all(ring.choose(key) == owner for key, owner in before.items())
+    ring.add_node("n10")
+    moved = sum(ring.lookup(key) != owner for key, owner in before.items())
+    assert moved / len(keys) < 0.2
+    assert all(ring.lookup(key) in (owner, "n10") for key, owner in before.items())
+    ring.remove_node("n3")
+    assert "n3" not in {ring.lookup(key) for key in keys}
+
+
+def test_bounded_load_spills_hot_keys():
+    ring = ConsistentHashBalancer([f"n{i}" for i in range(4)], load_factor=1.25)
+    owners = Counter()
+    for _ in range(100):
+        node = ring.choose("hot-model")
+        ring.on_dispatch(node)
+        owners[node] += 1
+    assert len(owners) == 4
+    assert max(owners.values()) <= 32
+    for node, count in owners.items():
+        for _ in range(count):
+            ring.on_complete(node)
+    assert ring.choose("hot-model") == ring.lookup("hot-model")
+
+
+@pytest.mark.asyncio
+async def test_task_distributor_routes_by_task_key():
+    distributor = TaskDistributor(ConsistentHashBalancer(load_factor=None))
+    for index in range(5):
+        distributor.register_node(f"n{index}")
+    sent = []
+
+    async def send(node_id, task):
+        sent.append((task["model"], node_id))
+
+    for _ in range(3):
+        for model in ("llama", "mistral"):
+            await distributor.distribute({"type": "inference", "model": model}, send)
+    assert len({node for model, node in sent if model == "llama"}) == 1
+    assert task_key({"key": 7, "model": "x"}) == "7"
+    assert task_key({}) is None
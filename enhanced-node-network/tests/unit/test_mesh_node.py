@@ -1,10 +1,11 @@
 import asyncio
+from datetime import datetime
 
 import pytest
 
 pytest.importorskip("websockets")
 
-from enhanced_network.core.mesh_node import MeshNode
+from enhanced_network.core.mesh_node import MeshNode, NodeInfo, message_to_dict
 
 
 @pytest.mark.asyncio
@@ -14,3 +15,22 @@ async def test_start_and_stop_mesh_node():
     assert node.running
     await node.stop()
     assert not node.running
+
+
+@pytest.mark.asyncio
+async def test_messages_for_unknown_nodes_are_not_handled_locally():
+    node = MeshNode({"listen_port": 9101})
+    handled = []
+
+    async def handler(message):
+        handled.append(message.recipient_id)
+
+    node.register_message_handler("ping", handler)
+    node.peers["neighbour"] = NodeInfo("neighbour", "enhanced_node", "", [], [], {}, datetime.now())
+    for recipient in ("somebody-else", node.node_id):
+        msg = node._new_message(recipient, "ping", {})
+        msg.sender_id = "neighbour"
+        await node._handle_message({"type": "network_message", "message": message_to_dict(msg)}, "neighbour")
+    await asyncio.sleep(0.01)
+    assert handled == [node.node_id]
+    assert node.metrics.counters["routing.unroutable"] == 1
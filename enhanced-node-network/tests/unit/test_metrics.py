@@ -0,0 +1,21 @@
+from enhanced_network.utils.metrics import Histogram, Metrics
+
+
+def test_histogram_percentiles_are_bounded_by_bucket_error():
+    histogram = Histogram()
+    for i in range(1, 1001):
+        histogram.observe(i / 1000.0)
+    assert histogram.count == 1000
+    assert 0.5 <= histogram.percentile(50) <= 0.75
+    assert 0.99 <= histogram.percentile(99) <= 1.0
+
+
+def test_metrics_snapshot_includes_all_kinds():
+    metrics = Metrics()
+    metrics.inc("sent", 2)
+    metrics.set("depth", 3)
+    metrics.observe("latency", 0.01)
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"sent": 2}
+    assert snapshot["gauges"] == {"depth": 3}
+    assert snapshot["histograms"]["latency"]["count"] == 1
@@ -0,0 +1,25 @@
+from enhanced_network.utils.seen_cache import SeenCache
+
+
+def test_duplicates_are_detected():
+    cache = SeenCache(max_size=10, ttl=60)
+    assert cache.add("m1")
+    assert not cache.add("m1")
+    assert "m1" in cache
+
+
+def test_size_is_bounded():
+    cache = SeenCache(max_size=3, ttl=60)
+    for i in range(10):
+        cache.add(i)
+    assert len(cache) == 3
+    assert 0 not in cache and 9 in cache
+
+
+def test_entries_expire():
+    now = [0.0]
+    cache = SeenCache(max_size=10, ttl=5, clock=lambda: now[0])
+    cache.add("m1")
+    now[0] = 6.0
+    assert "m1" not in cache
+    assert cache.add("m1")
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from enhanced_network.core.send_queue import PeerSendQueue
+from enhanced_network.utils.metrics import Metrics
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send(self, frame):
+        await self.gate.wait()
+        self.sent.append(frame)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_small_binary_frames_are_coalesced():
+    ws = FakeWebSocket()
+    queue = PeerSendQueue("p", ws, max_batch_bytes=8)
+    queue.start()
+    for frame in (b"aa", b"bb", b"cc", b"dddddd", "text"):
+        await queue.put(frame)
+    await asyncio.sleep(0.01)
+    assert ws.sent == [b"aabbcc", b"dddddd", "text"]
+    assert queue.stats()["frames_sent"] == 5
+    await queue.close()
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_policy_counts_drops():
+    metrics = Metrics()
+    ws = FakeWebSocket()
+    queue = PeerSendQueue("p", ws, max_size=2, overflow="drop_oldest", metrics=metrics)
+    for frame in (b"1", b"2", b"3"):
+        assert await queue.put(frame)
+    assert queue.depth == 2
+    assert queue.dropped == 1
+    assert metrics.counters["send_queue.dropped"] == 1
+    assert metrics.gauges["send_queue.depth.p"] == 2
+
+
+@pytest.mark.asyncio
+async def test_disconnect_policy_closes_connection():
+    ws = FakeWebSocket()
+    queue = PeerSendQueue("p", ws, max_size=1, overflow="disconnect")
+    assert await queue.put(b"1")
+    assert not await queue.put(b"2")
+    assert ws.closed and queue.closed
+
+
+@pytest.mark.asyncio
+async def test_block_policy_waits_for_writer():
+    ws = FakeWebSocket()
+    ws.gate.clear()
+    queue = PeerSendQueue("p", ws, max_size=1)
+    queue.start()
+    await queue.put(b"1")
+    await asyncio.sleep(0)
+    await queue.put(b"2")
+    blocked = asyncio.create_task(queue.put(b"3"))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    ws.gate.set()
+    assert await asyncio.wait_for(blocked, 1)
+    await queue.close()
@@ -0,0 +1,43 @@
+import pytest
+
+from enhanced_network.utils import serialization
+from enhanced_network.utils.serialization import (
+    JSONCodec,
+    decode_frame,
+    encode_frame,
+    encode_record,
+    get_codec,
+    negotiate_codec,
+)
+
+
+def test_json_codec_uses_text_frames():
+    frame = encode_frame(JSONCodec(), {"type": "ping", "n": 1})
+    assert isinstance(frame, str)
+    assert list(decode_frame(frame)) == [{"type": "ping", "n": 1}]
+
+
+def test_binary_frame_holds_several_records():
+    json_codec = get_codec("json")
+    frame = encode_record(json_codec, {"a": 1}) + encode_record(json_codec, {"b": 2})
+    assert list(decode_frame(frame)) == [{"a": 1}, {"b": 2}]
+
+
+def test_truncated_frame_is_rejected():
+    frame = encode_record(get_codec("json"), {"a": 1})
+    with pytest.raises(ValueError):
+        list(decode_frame(frame[:-1]))
+
+
+def test_negotiation_falls_back_to_json():
+    assert negotiate_codec(["cbor"], ["msgpack", "json"]) == "json"
+    assert negotiate_codec(["json", "msgpack"], ["msgpack", "json"]) in serialization.available_codecs()
+
+
+def test_msgpack_roundtrip():
+    pytest.importorskip("msgpack")
+    codec = get_codec("msgpack")
+    message = {"type": "network_message", "message": {"payload": {"data": [1, 2, 3]}}}
+    frame = encode_frame(codec, message)
+    assert isinstance(frame, bytes)
+    assert list(decode_frame(frame)) == [message]
@@ -0,0 +1,165 @@
+import pytest
+
+from enhanced_network.discovery.service_registry import ServiceRegistry, attributes_from_capability
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _gpu_node(memory, load, models=("llama",), reputation=1.0):
+    return {"models": list(models), "gpu": True, "memory_gb": memory, "reputation": reputation, "load": load}
+
+
+def test_register_and_lookup_keep_their_old_behaviour():
+    registry = ServiceRegistry()
+    registry.register("compute", "a")
+    registry.register("compute", "a")
+    registry.register("compute", "b")
+    assert sorted(registry.lookup("compute")) == ["a", "b"]
+    assert registry.lookup("missing") == []
+
+
+def test_query_filters_and_ranks_by_load():
+    registry = ServiceRegistry()
+    registry.register("ai", "small", _gpu_node(8, 0.1))
+    registry.register("ai", "busy", _gpu_node(32, 0.9))
+    registry.register("ai", "idle", _gpu_node(24, 0.2))
+    registry.register("ai", "other", _gpu_node(64, 0.0, models=("mistral",)))
+    registry.register("ai", "cpu", {"models": ["llama"], "gpu": False, "memory_gb": 128, "load": 0.0})
+
+    found = registry.query("ai", model="llama", gpu=True, min_memory_gb=16)
+    assert [e.node_id for e in found] == ["idle", "busy"]
+    assert [e.node_id for e in registry.query(model="llama", gpu=False)] == ["cpu"]
+    assert len(registry.query("ai", limit=2)) == 2
+
+
+def test_updates_reindex_the_entry():
+    registry = ServiceRegistry()
+    registry.register("ai", "a", _gpu_node(8, 0.5))
+    registry.register("ai", "a", _gpu_node(48, 0.5, models=("mistral",)))
+    assert registry.query(model="llama") == []
+    assert [e.node_id for e in registry.query(model="mistral", min_memory_gb=32)] == ["a"]
+    assert len(registry) == 1
+
+
+def test_leases_expire_unless_renewed():
+    clock = Clock()
+    registry = ServiceRegistry(lease=10, clock=clock)
+    registry.register("ai", "a", _gpu_node(16, 0.5))
+    registry.register("ai", "b", _gpu_node(16, 0.5))
+    clock.now = 8
+    assert registry.heartbeat("a", load=0.1) == 1
+    clock.now = 12
+    assert registry.lookup("ai") == ["a"]
+    assert registry.get("ai", "a").load == 0.1
+    assert not registry.renew("ai", "b")
+    clock.now = 30
+    assert registry.query(model="llama") == []
+
+
+def test_changes_replicate_incrementally_and_idempotently():
+    clock = Clock()
+    source = ServiceRegistry(lease=10, clock=clock)
+    replica = ServiceRegistry(lease=10, clock=clock)
+    source.register("ai", "a", _gpu_node(16, 0.5))
+    source.register("ai", "b", _gpu_node(16, 0.5))
+    for op in source.snapshot():
+        assert replica.apply(op)
+    version = source.version
+
+    source.register("ai", "a", _gpu_node(32, 0.2))
+    source.unregister("ai", "b")
+    source.heartbeat("a", load=0.3)
+    changes = source.changes_since(version)
+    assert len(changes) == 3
+    assert all(replica.apply(op) for op in changes)
+    assert not any(replica.apply(op) for op in changes)
+    assert [(e.node_id, e.attributes["memory_gb"], e.load) for e in replica.query("ai")] == [("a", 32, 0.3)]
+
+    # A stale upsert does not roll the replica back.
+    assert not replica.apply({"op": "upsert", "service": "ai", "node_id": "a",
+                              "attributes": _gpu_node(8, 0.0), "lease": 10, "revision": 1})
+
+
+def test_restarted_node_supersedes_its_old_entries():
+    clock = Clock()
+    replica = ServiceRegistry(lease=10, clock=clock)
+    before = ServiceRegistry(lease=10, clock=clock, incarnation=1)
+    for memory in (8, 16, 24):
+        before.register("ai", "a", _gpu_node(memory, 0.5))
+    for _ in range(5):
+        before.heartbeat("a")
+    for op in before.changes_since(0):
+        replica.apply(op)
+
+    # Revisions start again at 1 after the restart but the incarnation is newer.
+    after = ServiceRegistry(lease=10, clock=clock, incarnation=2)
+    after.register("ai", "a", _gpu_node(48, 0.1))
+    after.heartbeat("a", load=0.2)
+    assert all(replica.apply(op) for op in after.changes_since(0))
+    assert replica.get("ai", "a").attributes["memory_gb"] == 48
+    assert replica.get("ai", "a").load == 0.2
+    assert not any(replica.apply(op) for op in before.changes_since(0))
+
+
+def test_reregistering_after_unregister_supersedes_a_missed_remove():
+    clock = Clock()
+    source = ServiceRegistry(lease=10, clock=clock)
+    replica = ServiceRegistry(lease=10, clock=clock)
+    source.register("ai", "a", {"models": ["x"]})
+    source.register("ai", "a", {"models": ["y"]})
+    source.heartbeat("a")
+    for op in source.snapshot():
+        replica.apply(op)
+    replica.apply(source.changes_since(0)[-1])
+
+    # The replica misses the remove and only sees the snapshot taken afterwards.
+    source.unregister("ai", "a")
+    source.register("ai", "a", {"models": ["z"]})
+    source.heartbeat("a", load=0.4)
+    for op in source.snapshot():
+        assert replica.apply(op)
+    assert replica.get("ai", "a").attributes["models"] == ["z"]
+    assert replica.apply(source.changes_since(source.version - 1)[0])
+    assert replica.get("ai", "a").load == 0.4
+
+
+def test_node_revisions_are_pruned_with_the_last_entry():
+    clock = Clock()
+    registry = ServiceRegistry(lease=10, clock=clock)
+    registry.register("ai", "a")
+    registry.register("db", "a")
+    registry.heartbeat("a")
+    registry.unregister("ai", "a")
+    assert "a" in registry._node_revisions
+    clock.now = 11
+    registry.expire()
+    assert registry._node_revisions == {}
+
+
+def test_changes_since_reports_truncated_log():
+    registry = ServiceRegistry(log_size=2)
+    for name in "abcd":
+        registry.register("ai", name)
+    assert registry.changes_since(0) is None
+    assert [op["node_id"] for op in registry.changes_since(2)] == ["c", "d"]
+    assert registry.changes_since(registry.version) == []
+
+
+def test_attributes_from_capability():
+    attributes = attributes_from_capability({
+        "models_available": ["llama"],
+        "compute_resources": {"cpu_cores": 8, "memory_gb": 32, "gpu_available": True},
+        "reputation_score": 0.9,
+    })
+    assert attributes == {"models": ["llama"], "gpu": True, "memory_gb": 32.0, "reputation": 0.9, "load": 0.0}
+
+
+def test_unknown_operation_is_rejected():
+    with pytest.raises(ValueError):
+        ServiceRegistry().apply({"op": "bogus", "service": "ai", "node_id": "a"})
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from enhanced_network.coordination.task_distributor import TaskDistributor
+
+
+async def _collect(iterator):
+    return [result async for result in iterator]
+
+
+@pytest.mark.asyncio
+async def test_distribute_many_batches_per_node_and_limits_in_flight():
+    distributor = TaskDistributor()
+    for node in ("a", "b"):
+        distributor.register_node(node)
+    batches, in_flight, peak = [], [0], [0]
+
+    async def send_batch(node_id, tasks):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.001)
+        in_flight[0] -= 1
+        batches.append((node_id, len(tasks)))
+        return [task["n"] * 2 for task in tasks]
+
+    results = await _collect(distributor.distribute_many(
+        ({"n": i} for i in range(1000)), send_batch, batch_size=50, max_in_flight=3))
+    assert sorted(r.result for r in results) == [i * 2 for i in range(1000)]
+    assert all(r.ok and r.attempts == 1 for r in results)
+    assert {size for _node, size in batches} == {50}
+    assert peak[0] <= 3
+    assert distributor.stats.tasks == 1000 and distributor.stats.batches == 20
+    assert distributor.stats.completed == 1000
+    assert distributor.stats.throughput > 0
+
+
+@pytest.mark.asyncio
+async def test_distribute_many_retries_elsewhere_and_reports_failures():
+    distributor = TaskDistributor()
+    for node in ("bad", "good"):
+        distributor.register_node(node)
+
+    async def send_batch(node_id, tasks):
+        if node_id == "bad":
+            raise ConnectionError(node_id)
+        return ["done"] * len(tasks)
+
+    results = await _collect(distributor.distribute_many([{"n": i} for i in range(10)], send_batch, batch_size=5))
+    assert all(r.ok and r.node_id == "good" for r in results)
+    assert distributor.stats.retries >= 1
+
+    async def always_fail(node_id, tasks):
+        raise ConnectionError(node_id)
+
+    results = await _collect(distributor.distribute_many([{"n": 1}], always_fail, max_attempts=2))
+    assert len(results) == 1 and isinstance(results[0].error, ConnectionError)
+    assert results[0].attempts == 2 and distributor.stats.failures == 1
+    assert distributor.stats.completed == 0 and distributor.stats.throughput == 0
+
+
+@pytest.mark.asyncio
+async def test_distribute_many_flushes_slow_async_sources():
+    distributor = TaskDistributor()
+    distributor.register_node("a")
+
+    async def source():
+        yield {"n": 0}
+        await asyncio.sleep(0.2)
+        yield {"n": 1}
+
+    async def send_batch(node_id, tasks):
+        return [task["n"] for task in tasks]
+
+    iterator = distributor.distribute_many(source(), send_batch, batch_size=10, linger=0.02)
+    first = await asyncio.wait_for(iterator.__anext__(), 0.15)
+    assert first.result == 0
+    assert [r.result for r in await _collect(iterator)] == [1]
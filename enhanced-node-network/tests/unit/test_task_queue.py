@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from enhanced_network.coordination.task_queue import PriorityTaskQueue
+
+
+def _job(log, name, hold=None):
+    async def run():
+        log.append(name)
+        if hold is not None:
+            await hold.wait()
+    return run
+
+
+@pytest.mark.asyncio
+async def test_runs_by_priority_then_earliest_deadline():
+    queue = PriorityTaskQueue(concurrency=1)
+    log, hold = [], asyncio.Event()
+    queue.submit(_job(log, "blocker", hold))
+    queue.submit(_job(log, "low"), priority=1)
+    queue.submit(_job(log, "late"), priority=9, deadline=queue.clock() + 60)
+    queue.submit(_job(log, "soon"), priority=9, deadline=queue.clock() + 30)
+    queue.submit(_job(log, "whenever"), priority=9)
+    hold.set()
+    await asyncio.wait_for(queue.join(), 1)
+    assert log == ["blocker", "soon", "late", "whenever", "low"]
+    stats = queue.stats()
+    assert stats["wait"]["count"] == 5 and stats["run"]["count"] == 5
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap_is_respected():
+    queue = PriorityTaskQueue(concurrency=3)
+    active, peak = [0], [0]
+
+    async def job():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.001)
+        active[0] -= 1
+
+    for _ in range(20):
+        assert queue.submit(job)
+    await asyncio.wait_for(queue.join(), 1)
+    assert peak[0] == 3
+
+
+@pytest.mark.asyncio
+async def test_sheds_least_urgent_when_full_and_drops_expired():
+    now = [0.0]
+    queue = PriorityTaskQueue(concurrency=1, max_queued=2, clock=lambda: now[0])
+    log, dropped, hold = [], [], asyncio.Event()
+    queue.submit(_job(log, "blocker", hold))
+    assert queue.submit(_job(log, "a"), priority=5, on_drop=lambda reason: dropped.append(("a", reason)))
+    assert queue.submit(_job(log, "b"), priority=3, deadline=1.0,
+                        on_drop=lambda reason: dropped.append(("b", reason)))
+    # Full: an equal or lower priority is refused, a higher one displaces "b".
+    assert not queue.submit(_job(log, "c"), priority=3)
+    assert queue.submit(_job(log, "d"), priority=7, deadline=5.0)
+    assert dropped == [("b", "shed")]
+    assert queue.submit(_job(log, "e"), priority=6, deadline=2.0,
+                        on_drop=lambda reason: dropped.append(("e", reason)))
+    assert dropped[-1] == ("a", "shed")
+    now[0] = 3.0
+    hold.set()
+    await asyncio.wait_for(queue.join(), 1)
+    assert log == ["blocker", "d"]
+    assert dropped[-1] == ("e", "expired")
+    assert queue.metrics.counters["task_queue.shed"] == 3
+    assert queue.metrics.counters["task_queue.expired"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_expired_jobs_before_shedding():
+    now = [0.0]
+    queue = PriorityTaskQueue(concurrency=1, max_queued=2, clock=lambda: now[0])
+    log, dropped, hold = [], [], asyncio.Event()
+    queue.submit(_job(log, "blocker", hold))
+    for name in ("a", "b"):
+        assert queue.submit(_job(log, name), priority=9, deadline=1.0,
+                            on_drop=lambda reason, name=name: dropped.append((name, reason)))
+    now[0] = 2.0
+    assert queue.submit(_job(log, "late"), priority=1)
+    assert sorted(dropped) == [("a", "expired"), ("b", "expired")]
+    assert "task_queue.shed" not in queue.metrics.counters
+    hold.set()
+    await asyncio.wait_for(queue.join(), 1)
+    assert log == ["blocker", "late"]
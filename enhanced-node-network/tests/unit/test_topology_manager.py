@@ -0,0 +1,102 @@
+import random
+
+from enhanced_network.discovery.topology_manager import TopologyManager, _ShortestPathTree
+
+
+def _ring(size):
+    tm = TopologyManager()
+    for index in range(size):
+        tm.connect(f"n{index}", f"n{(index + 1) % size}")
+    return tm
+
+
+def test_next_hop_prefers_low_rtt_links():
+    tm = TopologyManager()
+    tm.connect("a", "b", rtt=0.2)
+    tm.connect("a", "c", rtt=0.01)
+    tm.connect("c", "d", rtt=0.01)
+    tm.connect("d", "b", rtt=0.01)
+    assert tm.next_hop("a", "b") == "c"
+    assert tm.shortest_path("a", "b") == ["a", "c", "d", "b"]
+    tm.update_link("c", "d", loss=0.99)
+    assert tm.next_hop("a", "b") == "b"
+    assert tm.link("c", "d").loss == 0.99
+    assert not tm.update_link("a", "d", rtt=0.001)
+
+
+def test_incremental_updates_match_a_fresh_computation():
+    rng = random.Random(7)
+    tm = TopologyManager()
+    names = [f"n{i}" for i in range(60)]
+    for _ in range(150):
+        tm.connect(*rng.sample(names, 2), rtt=rng.uniform(0.001, 0.1))
+    tm.next_hop("n0", "n1")
+    for _ in range(300):
+        a, b = rng.sample(names, 2)
+        action = rng.random()
+        if action < 0.4:
+            tm.disconnect(a, b)
+        elif action < 0.9:
+            tm.connect(a, b, rtt=rng.uniform(0.001, 0.1))
+        elif a != "n0":
+            tm.remove_node(a)
+        fresh = _ShortestPathTree(tm.links, "n0")
+        cached = tm._trees["n0"]
+        assert cached.dist.keys() == fresh.dist.keys()
+        assert all(abs(cached.dist[n] - fresh.dist[n]) < 1e-9 for n in fresh.dist)
+
+
+def test_k_shortest_paths_are_loopless_and_ordered():
+    tm = _ring(6)
+    tm.connect("n0", "n3", rtt=0.5)
+    paths = tm.k_shortest_paths("n0", "n3", 5)
+    assert [p for _c, p in paths] == [
+        ["n0", "n1", "n2", "n3"],
+        ["n0", "n5", "n4", "n3"],
+        ["n0", "n3"],
+    ]
+    costs = [c for c, _p in paths]
+    assert costs == sorted(costs)
+    assert tm.k_shortest_paths("n0", "missing", 3) == []
+
+
+def test_components_detect_partitions():
+    tm = _ring(4)
+    tm.add_node("lonely")
+    assert [len(c) for c in tm.components()] == [4, 1]
+    tm.disconnect("n0", "n1")
+    assert len(tm.components()) == 2
+    tm.disconnect("n2", "n3")
+    assert sorted(map(sorted, tm.components())) == [["lonely"], ["n0", "n3"], ["n1", "n2"]]
+    tm.connect("n3", "lonely")
+    assert tm.component_of("lonely") == {"n0", "n3", "lonely"}
+    assert tm.next_hop("n0", "n1") is None
+
+
+def test_next_hops_stay_consistent_under_churn():
+    # Sums of these costs round differently depending on the order they are
+    # added in, so some paths get shorter by less than a later link rounds away.
+    rng = random.Random(3)
+    costs = [0.1, 0.2, 0.3, 0.7, 1.1]
+    tm = TopologyManager(cost=lambda metrics: metrics.rtt)
+    names = [f"n{i}" for i in range(30)]
+    for _ in range(60):
+        tm.connect(*rng.sample(names, 2), rtt=rng.choice(costs))
+    sources = names[:4]
+    for source in sources:
+        tm.next_hop(source, names[-1])
+    for _ in range(300):
+        a, b = rng.sample(names, 2)
+        if rng.random() < 0.4:
+            tm.disconnect(a, b)
+        else:
+            tm.connect(a, b, rtt=rng.choice(costs))
+        for source in sources:
+            fresh = _ShortestPathTree(tm.links, source)
+            cached = tm._trees[source]
+            assert cached.first_hop.keys() == fresh.first_hop.keys()
+            for destination in fresh.first_hop:
+                hop = cached.first_hop[destination]
+                assert hop in tm.links[source]
+                assert hop == tm.shortest_path(source, destination)[1]
+                assert abs(cached.dist[destination] - fresh.dist[destination]) < 1e-9
@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+from enhanced_network.coordination.work_stealing import choose_victim, simulate_work_stealing
+
+
+def test_choose_victim_skips_empty_peers_and_prefers_the_busiest():
+    rng = random.Random(3)
+    loads = {"a": 0, "b": 5, "c": -1, "d": 9}
+    assert choose_victim(loads, "most_loaded", rng) == "d"
+    assert {choose_victim(loads, "random", rng) for _ in range(50)} == {"b", "c", "d"}
+    assert choose_victim({"a": 0, "c": -1}, "most_loaded", rng) == "c"
+    assert choose_victim({"a": 0}, "random", rng) is None
+    with pytest.raises(ValueError):
+        choose_victim(loads, "nearest", rng)
+
+
+def test_simulation_moves_work_to_the_faster_node():
+    speeds = {"slow": 1.0, "fast": 3.0}
+    baseline = simulate_work_stealing(speeds, tasks=400, steal=False)
+    stealing = simulate_work_stealing(speeds, tasks=400)
+    # Tasks stolen by the fast node take less busy time in total.
+    work = baseline["utilization"] * 2 * baseline["makespan"]
+    assert stealing["utilization"] * 2 * stealing["makespan"] < work
+    assert stealing["makespan"] < baseline["makespan"]
+    assert stealing["migrated"] > 0 and baseline["steals"] == 0